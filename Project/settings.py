@@ -159,6 +159,28 @@ DATABASES = {
 #   }
 #}
 
+# Versioned caches (home payload, store catalog...) are invalidated by bumping a
+# version key, so with several workers the backend must be shared: set REDIS_URL
+# (or CACHE_BACKEND/CACHE_LOCATION for memcached).
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.redis.RedisCache' if REDIS_URL
+            else 'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', REDIS_URL),
+    }
+}
+# A per-process cache never sees the other workers' bumps: its version keys
+# expire instead, which bounds how long a worker can serve stale content.
+CONTENT_VERSION_TIMEOUT = 300 if 'locmem' in CACHES['default']['BACKEND'].lower() else None
+
+# Visits and view counters are written by background threads (core.utils.buffer_utils);
+# the tests override this to write them synchronously, inside the test transaction
+BUFFERED_WRITES_SYNC = False
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
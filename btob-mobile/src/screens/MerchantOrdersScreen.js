@@ -36,23 +36,22 @@ export default function MerchantOrdersScreen({ route, navigation }) {
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
   const [activeFilter, setActiveFilter] = useState(initialFilter || null);
-  const [page, setPage] = useState(1);
-  const [totalPages, setTotalPages] = useState(1);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loadingMore, setLoadingMore] = useState(false);
 
-  const fetchOrders = useCallback(async (filterSlug, pageNum = 1, append = false) => {
+  const fetchOrders = useCallback(async (filterSlug, cursor = null, append = false) => {
     if (!resolvedMerchantId) return;
-    if (pageNum === 1) setLoading(true);
+    if (!cursor) setLoading(true);
     else setLoadingMore(true);
 
     try {
-      let url = `/merchant/orders/?merchant_id=${resolvedMerchantId}&page=${pageNum}`;
+      let url = `/merchant/orders/?merchant_id=${resolvedMerchantId}`;
+      if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
       if (filterSlug) url += `&status=${filterSlug}`;
       const res = await client.get(url);
       if (res.data.success) {
         setOrders(prev => append ? [...prev, ...res.data.results] : res.data.results);
-        setTotalPages(res.data.num_pages);
-        setPage(pageNum);
+        setNextCursor(res.data.next_cursor);
       }
     } catch (err) {
       console.error('MerchantOrders fetch error', err);
@@ -64,17 +63,17 @@ export default function MerchantOrdersScreen({ route, navigation }) {
   }, [resolvedMerchantId]);
 
   useEffect(() => {
-    fetchOrders(activeFilter, 1, false);
+    fetchOrders(activeFilter, null, false);
   }, [activeFilter]);
 
   const onRefresh = () => {
     setRefreshing(true);
-    fetchOrders(activeFilter, 1, false);
+    fetchOrders(activeFilter, null, false);
   };
 
   const loadMore = () => {
-    if (!loadingMore && page < totalPages) {
-      fetchOrders(activeFilter, page + 1, true);
+    if (!loadingMore && nextCursor) {
+      fetchOrders(activeFilter, nextCursor, true);
     }
   };
 
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import *
+from .utils.stock_utils import adjust_stock
 import json
 # Register your models here.
 admin.site.register(Category)
@@ -28,13 +29,19 @@ class ProductImageInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'supplier', 'category', 'price', 'stock', 'is_new', 'views_count')
+    list_display = ('name', 'supplier', 'category', 'price', 'stock', 'reserved', 'is_new', 'views_count')
     list_filter = ('supplier', 'category', 'is_new')
     search_fields = ('name', 'description')
     inlines = [ProductImageInline]
     
     fields = ('supplier', 'category', 'name', 'description', 'price', 'stock', 'image', 'video', 'is_new', 'is_active')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Applied to the locked row, so orders placed since the form was opened are kept
+        if change and 'stock' in form.changed_data:
+            adjust_stock(obj.pk, form.cleaned_data['stock'], user=request.user, note='تعديل المنتج')
+
 
 class OrderStatusAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug', 'is_terminal')
@@ -338,25 +345,19 @@ class WebsiteStatisticAdmin(admin.ModelAdmin):
     device_type_badge.admin_order_field = 'device_type'
 
     def changelist_view(self, request, extra_context=None):
-        """Add summary statistics to the top of the change list."""
+        """Add summary statistics (read from the daily rollups) to the top of the change list."""
         from django.utils import timezone
-        from django.db.models import Count, Q
+        from core.utils.visit_rollup_utils import get_visit_summary
 
         extra_context = extra_context or {}
         today = timezone.now().date()
 
-        today_qs = WebsiteStatistic.objects.filter(visited_at__date=today)
-        total_today = today_qs.count()
-        unique_ips_today = today_qs.values('ip_address').distinct().count()
-        device_breakdown = dict(
-            today_qs.values_list('device_type')
-            .annotate(count=Count('id'))
-            .values_list('device_type', 'count')
-        )
+        summary = get_visit_summary(today)
+        device_breakdown = summary['devices']
 
         extra_context['visit_summary'] = {
-            'total_today': total_today,
-            'unique_ips_today': unique_ips_today,
+            'total_today': summary['visits'],
+            'unique_ips_today': summary['unique_ips'],
             'mobile_today': device_breakdown.get('mobile', 0),
             'desktop_today': device_breakdown.get('desktop', 0),
             'tablet_today': device_breakdown.get('tablet', 0),
@@ -365,6 +366,32 @@ class WebsiteStatisticAdmin(admin.ModelAdmin):
         return super().changelist_view(request, extra_context=extra_context)
 
 
+@admin.register(DailyVisitTotal)
+class DailyVisitTotalAdmin(admin.ModelAdmin):
+    """Daily visit totals per store (empty store = whole site), built by `rollup_visit_statistics`."""
+
+    list_display = ('date', 'supplier', 'visits', 'unique_sessions', 'unique_ips')
+    list_filter = ('date', 'supplier')
+    date_hierarchy = 'date'
+    list_select_related = ('supplier',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DailyVisitRollup)
+class DailyVisitRollupAdmin(admin.ModelAdmin):
+    """Daily visits broken down by store, page type and client."""
+
+    list_display = ('date', 'supplier', 'page_type', 'device_type', 'browser', 'operating_system', 'visits', 'unique_sessions', 'unique_ips')
+    list_filter = ('date', 'page_type', 'device_type', 'supplier')
+    date_hierarchy = 'date'
+    list_select_related = ('supplier',)
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(WhatsAppInquiryClick)
 class WhatsAppInquiryClickAdmin(admin.ModelAdmin):
     """Analytics for WhatsApp inquiry button clicks on product pages."""
@@ -380,3 +407,57 @@ class WhatsAppInquiryClickAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         """Clicks are created automatically; disable manual creation."""
         return False
+
+
+@admin.register(WhatsAppOutboxMessage)
+class WhatsAppOutboxMessageAdmin(admin.ModelAdmin):
+    """Outbound WhatsApp queue; dead-lettered messages can be requeued."""
+
+    list_display = ('created_at', 'phone', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('phone', 'message')
+    readonly_fields = ('phone', 'message', 'attempts', 'last_error', 'created_at', 'sent_at')
+    list_per_page = 50
+    date_hierarchy = 'created_at'
+    actions = ['requeue_messages']
+
+    def has_add_permission(self, request):
+        """Messages are queued by the application only."""
+        return False
+
+    @admin.action(description="إعادة إرسال الرسائل المحددة")
+    def requeue_messages(self, request, queryset):
+        from django.db import transaction
+        from django.utils import timezone
+        from core.utils.whatsapp_outbox_utils import wake_outbox_workers
+
+        # Redacted bodies can't be sent again
+        updated = queryset.exclude(status=WhatsAppOutboxMessage.STATUS_SENT).exclude(
+            sensitive=True, status=WhatsAppOutboxMessage.STATUS_DEAD,
+        ).update(
+            status=WhatsAppOutboxMessage.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        transaction.on_commit(wake_outbox_workers)
+        self.message_user(request, f"تمت إعادة {updated} رسالة إلى قائمة الإرسال.")
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """Stock ledger, read only: balances change through core.utils.stock_utils."""
+
+    list_display = ('created_at', 'product', 'kind', 'stock_delta', 'reserved_delta', 'order', 'created_by')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name', 'order__id', 'note')
+    list_select_related = ('product', 'order', 'created_by')
+    raw_id_fields = ('product', 'order', 'created_by')
+    list_per_page = 50
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,14 @@
-from .models import SystemSettings, Supplier
-from django.urls import resolve
-from core.utils.merchant_utils import get_active_supplier
+from core.utils.merchant_utils import get_active_supplier, get_supplier_membership
+from core.utils.settings_utils import get_system_settings
+
+STOREFRONT_VIEWS = frozenset([
+    'product-list', 'product_list_category', 'product_list_subcategory',
+    'store_home', 'store_catalog', 'product_canonical',
+    'store_cart', 'store_checkout', 'store_order_track',
+    'store_category', 'store_subcategory',
+    'add_to_cart', 'sub_to_cart', 'remove_item',
+    'product_detail'
+])
 
 
 def system_settings(request):
@@ -8,10 +16,23 @@ def system_settings(request):
     Context processor to make system settings and navigation state available in all templates.
     """
     try:
-        settings = SystemSettings.objects.first()
+        settings = get_system_settings(request)
     except Exception:
         settings = None
 
+    # Navigation state is computed once per request, however many templates render
+    nav = request.__dict__.get('_nav_context')
+    if nav is None:
+        nav = request._nav_context = _navigation_context(request)
+
+    return {
+        'system_settings': settings,
+        'css_version': '9.2.5', # Bump version for Meta Pixel integration
+        **nav,
+    }
+
+
+def _navigation_context(request):
     # --- Adaptive Navigation State Logic ---
     user = request.user
     nav_state = 'visitor' # Default
@@ -22,10 +43,8 @@ def system_settings(request):
         # Use our new utility to get the active context
         active_store = get_active_supplier(request)
         
-        # Calculate how many stores this user is involved in
-        owned_count = 1 if hasattr(user, 'supplier') and user.supplier else 0
-        managed_count = user.managed_suppliers.count()
-        user_stores_count = owned_count + managed_count
+        # How many stores this user is involved in, from the validated session membership
+        user_stores_count = len(get_supplier_membership(request)['ids'])
         
         if user_stores_count > 0:
             if user_stores_count > 1:
@@ -38,28 +57,14 @@ def system_settings(request):
              
         # --- Context Override for Storefront Views ---
         # If a merchant is viewing a store page (buying mode), force visitor state
-        try:
-            if request.resolver_match:
-                view_name = request.resolver_match.url_name
-                storefront_views = [
-                    'product-list', 'product_list_category', 'product_list_subcategory',
-                    'store_home', 'store_catalog', 'product_canonical', 
-                    'store_cart', 'store_checkout', 'store_order_track',
-                    'store_category', 'store_subcategory',
-                    'add_to_cart', 'sub_to_cart', 'remove_item',
-                    'product_detail'
-                ]
-                if view_name in storefront_views:
-                    nav_state = 'visitor'
-        except Exception:
-            pass
+        match = request.resolver_match
+        if match and match.url_name in STOREFRONT_VIEWS:
+            nav_state = 'visitor'
 
     else:
         nav_state = 'visitor'
 
     return {
-        'system_settings': settings,
-        'css_version': '9.2.5', # Bump version for Meta Pixel integration
         'nav_state': nav_state,
         'active_store': active_store,
         'user_stores_count': user_stores_count,
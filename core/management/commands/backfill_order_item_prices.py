@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import OrderItem
+from core.utils.offer_utils import get_active_offers_map
+
+
+class Command(BaseCommand):
+    help = 'Snapshot unit price, discounted price and discount percentage on order items created before price snapshots existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Order items processed per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+
+        while True:
+            items = list(
+                OrderItem.objects.filter(unit_price__isnull=True, id__gt=last_id)
+                .select_related('product', 'order')
+                .order_by('id')[:batch_size]
+            )
+            if not items:
+                break
+            last_id = items[-1].id
+
+            # Use the offer that was active on the day each order was placed
+            items_by_date = defaultdict(list)
+            for item in items:
+                items_by_date[item.order.created_at.date()].append(item)
+
+            for order_date, date_items in items_by_date.items():
+                offers_map = get_active_offers_map([item.product_id for item in date_items], on_date=order_date)
+                for item in date_items:
+                    item.snapshot_prices(offer=offers_map.get(item.product_id), resolve_offer=False)
+
+            with transaction.atomic():
+                updated += OrderItem.objects.bulk_update(
+                    items, ['unit_price', 'discounted_unit_price', 'discount_percentage']
+                )
+
+            self.stdout.write(f'Processed order items up to #{last_id} ({updated} updated so far)')
+
+        self.stdout.write(self.style.SUCCESS(f'Finished snapshotting prices for {updated} order items.'))
@@ -0,0 +1,64 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Order, OrderItem
+from core.utils.order_stats_utils import rebuild_order_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill Order.supplier from the order items for orders created before the field existed '
+        '(migration 0096 does it once; this catches up rows written by older code). An order mixing '
+        'stores goes to the store of its first item, as Order.get_supplier() did.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders processed per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        skipped = 0
+        touched_suppliers = set()
+
+        while True:
+            order_ids = list(
+                Order.objects.filter(supplier__isnull=True, id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+            last_id = order_ids[-1]
+
+            # One query resolves the supplier (first item's store) of every order in the batch
+            supplier_by_order = {}
+            for order_id, supplier_id in (
+                OrderItem.objects.filter(order_id__in=order_ids)
+                .order_by('order_id', 'id').values_list('order_id', 'product__supplier_id')
+            ):
+                supplier_by_order.setdefault(order_id, supplier_id)
+            orders_by_supplier = defaultdict(list)
+            for order_id in order_ids:
+                supplier_id = supplier_by_order.get(order_id)
+                if supplier_id:
+                    orders_by_supplier[supplier_id].append(order_id)
+                else:
+                    skipped += 1
+
+            with transaction.atomic():
+                for supplier_id, ids in orders_by_supplier.items():
+                    updated += Order.objects.filter(id__in=ids).update(supplier_id=supplier_id)
+                    touched_suppliers.add(supplier_id)
+
+            self.stdout.write(f'Processed orders up to #{last_id} ({updated} updated so far)')
+
+        # Queryset updates skip the signals that keep the daily order stats
+        if touched_suppliers:
+            rebuild_order_stats(supplier_ids=touched_suppliers)
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} orders without items.'))
+        self.stdout.write(self.style.SUCCESS(f'Finished backfilling supplier for {updated} orders.'))
@@ -0,0 +1,121 @@
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from core.utils import user_agent_utils
+from core.utils.user_agent_utils import classify_user_agent, get_user_agent_cache_stats
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(user_agent_utils.__file__), '..', 'data', 'user_agents.txt')
+
+
+def legacy_parse_user_agent(ua_string):
+    """The keyword-scan classifier the middleware used before, kept as the reference."""
+    ua = ua_string.lower()
+
+    bot_keywords = [
+        'bot', 'crawl', 'spider', 'slurp', 'mediapartners', 'headless',
+        'externalhit', 'facebookexternalhit', 'whatsapp', 'twitterbot',
+        'linkedinbot', 'googlebot', 'bingbot', 'yandex', 'semrush',
+        'preview', 'fetch', 'scraper', 'curl', 'wget', 'python-requests',
+    ]
+    if any(kw in ua for kw in bot_keywords):
+        return 'bot', '', ''
+
+    operating_system = 'غير معروف'
+    if 'windows' in ua:
+        operating_system = 'Windows'
+    elif 'mac os' in ua or 'macintosh' in ua:
+        operating_system = 'macOS'
+    elif 'iphone' in ua or 'ipad' in ua:
+        operating_system = 'iOS'
+    elif 'android' in ua:
+        operating_system = 'Android'
+    elif 'linux' in ua:
+        operating_system = 'Linux'
+
+    device_type = 'desktop'
+    if 'ipad' in ua or 'tablet' in ua:
+        device_type = 'tablet'
+    elif any(kw in ua for kw in ['iphone', 'android', 'mobile', 'phone']):
+        device_type = 'mobile'
+
+    browser = 'غير معروف'
+    if 'edg/' in ua or 'edge/' in ua:
+        browser = 'Edge'
+    elif 'opr/' in ua or 'opera' in ua:
+        browser = 'Opera'
+    elif 'chrome/' in ua and 'chromium' not in ua:
+        browser = 'Chrome'
+    elif 'safari/' in ua and 'chrome' not in ua:
+        browser = 'Safari'
+    elif 'firefox/' in ua:
+        browser = 'Firefox'
+
+    return device_type, browser, operating_system
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the user-agent classifier over a corpus of real UA strings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='UA corpus file ("<weight>\\t<ua>" per line)')
+        parser.add_argument('--requests', type=int, default=100000, help='Simulated requests')
+        parser.add_argument('--unique-ratio', type=float, default=0.01,
+                            help='Share of requests carrying a never-seen UA (cache misses)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        corpus, weights = self._load_corpus(options['corpus'])
+
+        mismatches = [ua for ua in corpus if tuple(classify_user_agent(ua)) != legacy_parse_user_agent(ua)]
+        for ua in mismatches:
+            self.stdout.write(self.style.WARNING(f'Mismatch: {ua!r}'))
+
+        rng = random.Random(options['seed'])
+        traffic = rng.choices(corpus, weights=weights, k=options['requests'])
+        for i in range(len(traffic)):
+            if rng.random() < options['unique_ratio']:
+                traffic[i] = f'{traffic[i]} build/{i}'
+
+        self.stdout.write(f'{len(corpus)} distinct agents, {len(traffic)} requests')
+        legacy = self._time(legacy_parse_user_agent, traffic)
+        compiled = self._time(user_agent_utils._classify, traffic)
+        classify_user_agent.cache_clear()
+        cached = self._time(classify_user_agent, traffic)
+
+        self.stdout.write(f'legacy keyword scan : {legacy:8.3f} us/request')
+        self.stdout.write(f'compiled, uncached  : {compiled:8.3f} us/request ({legacy / compiled:.1f}x)')
+        self.stdout.write(f'compiled + LRU      : {cached:8.3f} us/request ({legacy / cached:.1f}x)')
+        stats = get_user_agent_cache_stats()
+        self.stdout.write(
+            f"cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%}), {stats['size']}/{stats['max_size']} entries"
+        )
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{len(mismatches)} agents classified differently from the legacy parser.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Classification matches the legacy parser on the whole corpus.'))
+
+    @staticmethod
+    def _load_corpus(path):
+        corpus, weights = [], []
+        with open(path, encoding='utf-8') as corpus_file:
+            for line in corpus_file:
+                line = line.rstrip('\n')
+                if line.startswith('#') or not line.strip():
+                    continue
+                weight, sep, ua = line.partition('\t')
+                if not sep or not weight.isdigit():
+                    weight, ua = '1', line
+                corpus.append(ua)
+                weights.append(int(weight))
+        return corpus, weights
+
+    @staticmethod
+    def _time(func, traffic):
+        start = time.perf_counter()
+        for ua in traffic:
+            func(ua)
+        return (time.perf_counter() - start) / len(traffic) * 1e6
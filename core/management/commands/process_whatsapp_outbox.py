@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.utils.notification_utils import dispatch_notifications
+from core.utils.whatsapp_outbox_utils import process_outbox, purge_sent_messages
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispatch due notifications and deliver WhatsApp outbox messages (once, or continuously with --loop), '
+        'after purging old sent messages'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        purged = purge_sent_messages()
+        totals = {}
+        while True:
+            totals['notified'] = totals.get('notified', 0) + dispatch_notifications()
+            counters = process_outbox(batch_size=options['batch_size'])
+            for name, value in counters.items():
+                totals[name] = totals.get(name, 0) + value
+            if counters['claimed'] < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(
+            f"Queued {totals['notified']} notification messages. Sent {totals['sent']}, retrying {totals['retried']}, "
+            f"dead-lettered {totals['dead']}, deferred {totals['deferred']}. Purged {purged} old sent messages."
+        )
+        self.stdout.write(self.style.SUCCESS('WhatsApp outbox processed.'))
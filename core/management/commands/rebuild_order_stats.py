@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.utils.order_stats_utils import rebuild_order_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-store daily order statistics from the orders (reconciles drifted counters)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supplier', type=int, action='append', dest='suppliers', help='Only this store id (repeatable)')
+
+    def handle(self, *args, **options):
+        rows = rebuild_order_stats(supplier_ids=options['suppliers'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily order stats rows.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.utils.search_utils import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index (SearchTerm) from every product'
+
+    def handle(self, *args, **options):
+        rows = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {rows} search terms.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.utils.ranking_utils import refresh_supplier_rankings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the "strongest offers" supplier ranking (run daily, after midnight)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supplier', type=int, action='append', dest='supplier_ids',
+                            help='Only refresh this supplier id (can be repeated)')
+
+    def handle(self, *args, **options):
+        count = refresh_supplier_rankings(options['supplier_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {count} supplier rankings.'))
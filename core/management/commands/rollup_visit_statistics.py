@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.utils.visit_rollup_utils import prune_raw_visits, rollup_new_visits
+
+
+class Command(BaseCommand):
+    help = 'Fold new WebsiteStatistic rows into the hourly/daily rollups and prune old raw rows (run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Raw rows read per query')
+        parser.add_argument(
+            '--retention-days', type=int,
+            default=getattr(settings, 'VISIT_STATISTICS_RETENTION_DAYS', 90),
+            help='Delete rolled-up raw rows older than this many days (0 keeps everything)'
+        )
+
+    def handle(self, *args, **options):
+        processed = rollup_new_visits(batch_size=options['batch_size'])
+        self.stdout.write(f'Rolled up {processed} new visits.')
+
+        if options['retention_days'] > 0:
+            deleted = prune_raw_visits(options['retention_days'], batch_size=options['batch_size'])
+            self.stdout.write(f'Deleted {deleted} raw visits older than {options["retention_days"]} days.')
+
+        self.stdout.write(self.style.SUCCESS('Visit statistics rollup finished.'))
@@ -1,6 +1,10 @@
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from core.models import Supplier
+from core.utils.store_utils import get_request_store, get_store_slug
+from core.utils.user_agent_utils import classify_user_agent
+from core.utils.visit_tracking_utils import visit_buffer
 
 class NavigationMiddleware:
     """
@@ -44,16 +48,13 @@ class NavigationMiddleware:
         """
         Handle context injection based on URL parameters.
         """
-        # Inject Store Context for Storefront Views
-        if 'store_slug' in view_kwargs:
-            try:
-                # Get store by slug
-                store = Supplier.objects.get(store_id=view_kwargs['store_slug'])
+        # Inject Store Context for Storefront Views (both `store_slug` and `store_id` routes);
+        # resolved once per request and shared with the views and visit tracking
+        store_slug = get_store_slug(view_kwargs)
+        if store_slug:
+            store = get_request_store(request, store_slug)
+            if store is not None:
                 request.current_store = store
-            except Supplier.DoesNotExist:
-                # If store not found by slug, it might be a 404
-                # Let the view handle it or raise 404 here
-                pass 
         
         return None
 
@@ -62,6 +63,8 @@ class VisitTrackingMiddleware:
     """
     Middleware to record every page visit into the WebsiteStatistic table.
     Skips static files, media, admin, and AJAX requests for efficiency.
+    Visits are queued in `visit_buffer` and bulk-inserted by a background worker
+    (or written right away with BUFFERED_WRITES_SYNC).
     """
 
     # URL prefixes to ignore (static assets, admin, API internals)
@@ -124,9 +127,7 @@ class VisitTrackingMiddleware:
         return response
 
     def _record_visit(self, request, response):
-        """Create a WebsiteStatistic record for this page visit."""
-        from core.models import WebsiteStatistic, Supplier
-
+        """Queue a WebsiteStatistic record for this page visit (written in batches off the request path)."""
         ua_string = request.META.get('HTTP_USER_AGENT', '')
         device_type, browser, operating_system = self._parse_user_agent(ua_string)
 
@@ -136,7 +137,8 @@ class VisitTrackingMiddleware:
 
         # Determine page type from URL name
         page_type = 'other'
-        supplier = None
+        store_slug = None
+        supplier_id = None
         if request.resolver_match:
             url_name = request.resolver_match.url_name or ''
             page_type = self.PAGE_TYPE_MAP.get(url_name, 'other')
@@ -145,16 +147,13 @@ class VisitTrackingMiddleware:
             if request.path_info.startswith('/dashboard/'):
                 page_type = 'merchant_dashboard'
 
-            # Extract supplier from URL kwargs
-            store_id = (
-                request.resolver_match.kwargs.get('store_id')
-                or request.resolver_match.kwargs.get('store_slug')
-            )
-            if store_id:
-                try:
-                    supplier = Supplier.objects.get(store_id=store_id)
-                except Supplier.DoesNotExist:
-                    pass
+            # Store resolved by NavigationMiddleware; otherwise the buffer worker
+            # resolves the URL's slug
+            current_store = getattr(request, 'current_store', None)
+            if current_store is not None:
+                supplier_id = current_store.pk
+            else:
+                store_slug = get_store_slug(request.resolver_match.kwargs)
 
         # Build absolute URL
         url = request.build_absolute_uri()[:2048]
@@ -171,23 +170,25 @@ class VisitTrackingMiddleware:
             session_key = request.session.session_key
 
         # Get user
-        user = request.user if request.user.is_authenticated else None
-
-        WebsiteStatistic.objects.create(
-            url=url,
-            page_type=page_type,
-            method=request.method,
-            ip_address=ip_address,
-            user_agent=ua_string[:500],
-            device_type=device_type,
-            browser=browser,
-            operating_system=operating_system,
-            referrer=referrer,
-            user=user,
-            session_key=session_key,
-            supplier=supplier,
-            response_status=response.status_code,
-        )
+        user_id = request.user.pk if request.user.is_authenticated else None
+
+        visit_buffer.record({
+            'url': url,
+            'page_type': page_type,
+            'method': request.method,
+            'ip_address': ip_address,
+            'user_agent': ua_string[:500],
+            'device_type': device_type,
+            'browser': browser,
+            'operating_system': operating_system,
+            'referrer': referrer,
+            'user_id': user_id,
+            'session_key': session_key,
+            'supplier_id': supplier_id,
+            'store_slug': store_slug,
+            'response_status': response.status_code,
+            'visited_at': timezone.now(),
+        })
 
     @staticmethod
     def _get_client_ip(request):
@@ -202,6 +203,7 @@ class VisitTrackingMiddleware:
         """
         Parse a user-agent string to extract device type, browser, and OS.
         Lightweight implementation — no external dependencies required.
+        Delegates to the compiled, memoized `classify_user_agent`.
 
         Parameters:
             ua_string: The raw user-agent header string.
@@ -209,49 +211,4 @@ class VisitTrackingMiddleware:
         Returns:
             Tuple of (device_type, browser, operating_system).
         """
-        ua = ua_string.lower()
-
-        # --- Detect Bots ---
-        bot_keywords = [
-            'bot', 'crawl', 'spider', 'slurp', 'mediapartners', 'headless',
-            'externalhit', 'facebookexternalhit', 'whatsapp', 'twitterbot',
-            'linkedinbot', 'googlebot', 'bingbot', 'yandex', 'semrush',
-            'preview', 'fetch', 'scraper', 'curl', 'wget', 'python-requests',
-        ]
-        if any(kw in ua for kw in bot_keywords):
-            return 'bot', '', ''
-
-        # --- Detect OS ---
-        operating_system = 'غير معروف'
-        if 'windows' in ua:
-            operating_system = 'Windows'
-        elif 'mac os' in ua or 'macintosh' in ua:
-            operating_system = 'macOS'
-        elif 'iphone' in ua or 'ipad' in ua:
-            operating_system = 'iOS'
-        elif 'android' in ua:
-            operating_system = 'Android'
-        elif 'linux' in ua:
-            operating_system = 'Linux'
-
-        # --- Detect Device ---
-        device_type = 'desktop'
-        if 'ipad' in ua or 'tablet' in ua:
-            device_type = 'tablet'
-        elif any(kw in ua for kw in ['iphone', 'android', 'mobile', 'phone']):
-            device_type = 'mobile'
-
-        # --- Detect Browser ---
-        browser = 'غير معروف'
-        if 'edg/' in ua or 'edge/' in ua:
-            browser = 'Edge'
-        elif 'opr/' in ua or 'opera' in ua:
-            browser = 'Opera'
-        elif 'chrome/' in ua and 'chromium' not in ua:
-            browser = 'Chrome'
-        elif 'safari/' in ua and 'chrome' not in ua:
-            browser = 'Safari'
-        elif 'firefox/' in ua:
-            browser = 'Firefox'
-
-        return device_type, browser, operating_system
+        return classify_user_agent(ua_string)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0082_order_supplier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='discount_percentage',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='نسبة الخصم'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='discounted_unit_price',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True, verbose_name='سعر الوحدة بعد الخصم'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='سعر الوحدة'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0083_orderitem_price_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierRanking',
+            fields=[
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='core.supplier')),
+                ('is_active', models.BooleanField(default=True, verbose_name='نشط')),
+                ('max_offer_discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='أعلى خصم فعال')),
+                ('offers_count', models.PositiveIntegerField(default=0, verbose_name='عدد العروض الفعالة')),
+                ('priority', models.IntegerField(default=0, verbose_name='الأولوية')),
+                ('ranked_on', models.DateField(verbose_name='تاريخ الاحتساب')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_active', '-max_offer_discount', '-offers_count', '-priority'], name='supplier_ranking_order_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0084_supplier_ranking'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='websitestatistic',
+            name='visited_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='وقت الزيارة'),
+        ),
+    ]
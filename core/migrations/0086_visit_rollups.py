@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0085_websitestatistic_visited_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyVisitRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_type', models.CharField(choices=[('landing', 'الصفحة الرئيسية'), ('product_list', 'قائمة المنتجات'), ('product_detail', 'تفاصيل المنتج'), ('cart', 'سلة التسوق'), ('checkout', 'إتمام الشراء'), ('order_detail', 'تفاصيل الطلب'), ('join_business', 'انضمام تجاري'), ('profile', 'الملف الشخصي'), ('merchant_dashboard', 'لوحة التاجر'), ('other', 'أخرى')], max_length=30, verbose_name='نوع الصفحة')),
+                ('device_type', models.CharField(choices=[('mobile', 'جوال'), ('tablet', 'تابلت'), ('desktop', 'حاسوب'), ('bot', 'روبوت'), ('unknown', 'غير معروف')], max_length=10, verbose_name='نوع الجهاز')),
+                ('browser', models.CharField(blank=True, default='', max_length=100, verbose_name='المتصفح')),
+                ('operating_system', models.CharField(blank=True, default='', max_length=100, verbose_name='نظام التشغيل')),
+                ('visits', models.PositiveIntegerField(default=0, verbose_name='الزيارات')),
+                ('unique_sessions', models.PositiveIntegerField(default=0, verbose_name='الجلسات الفريدة')),
+                ('unique_ips', models.PositiveIntegerField(default=0, verbose_name='عناوين IP الفريدة')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.supplier', verbose_name='المتجر')),
+            ],
+            options={
+                'verbose_name': 'إحصائية زيارات يومية',
+                'verbose_name_plural': 'إحصائيات الزيارات اليومية',
+                'indexes': [models.Index(fields=['date'], name='core_dailyv_date_bcb88e_idx'), models.Index(fields=['supplier', 'date'], name='core_dailyv_supplie_9e0224_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyVisitTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('visits', models.PositiveIntegerField(default=0, verbose_name='الزيارات')),
+                ('unique_sessions', models.PositiveIntegerField(default=0, verbose_name='الجلسات الفريدة')),
+                ('unique_ips', models.PositiveIntegerField(default=0, verbose_name='عناوين IP الفريدة')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_visit_totals', to='core.supplier', verbose_name='المتجر')),
+            ],
+            options={
+                'verbose_name': 'إجمالي زيارات يومي',
+                'verbose_name_plural': 'إجماليات الزيارات اليومية',
+                'indexes': [models.Index(fields=['supplier', 'date'], name='core_dailyv_supplie_cbcca4_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyVisitRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_type', models.CharField(choices=[('landing', 'الصفحة الرئيسية'), ('product_list', 'قائمة المنتجات'), ('product_detail', 'تفاصيل المنتج'), ('cart', 'سلة التسوق'), ('checkout', 'إتمام الشراء'), ('order_detail', 'تفاصيل الطلب'), ('join_business', 'انضمام تجاري'), ('profile', 'الملف الشخصي'), ('merchant_dashboard', 'لوحة التاجر'), ('other', 'أخرى')], max_length=30, verbose_name='نوع الصفحة')),
+                ('device_type', models.CharField(choices=[('mobile', 'جوال'), ('tablet', 'تابلت'), ('desktop', 'حاسوب'), ('bot', 'روبوت'), ('unknown', 'غير معروف')], max_length=10, verbose_name='نوع الجهاز')),
+                ('browser', models.CharField(blank=True, default='', max_length=100, verbose_name='المتصفح')),
+                ('operating_system', models.CharField(blank=True, default='', max_length=100, verbose_name='نظام التشغيل')),
+                ('visits', models.PositiveIntegerField(default=0, verbose_name='الزيارات')),
+                ('unique_sessions', models.PositiveIntegerField(default=0, verbose_name='الجلسات الفريدة')),
+                ('unique_ips', models.PositiveIntegerField(default=0, verbose_name='عناوين IP الفريدة')),
+                ('hour', models.DateTimeField(verbose_name='الساعة')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.supplier', verbose_name='المتجر')),
+            ],
+            options={
+                'verbose_name': 'إحصائية زيارات بالساعة',
+                'verbose_name_plural': 'إحصائيات الزيارات بالساعة',
+                'indexes': [models.Index(fields=['hour'], name='core_hourly_hour_bc3b11_idx'), models.Index(fields=['supplier', 'hour'], name='core_hourly_supplie_ec37df_idx')],
+            },
+        ),
+    ]
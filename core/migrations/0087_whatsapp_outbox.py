@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0086_visit_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppOutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=20, verbose_name='رقم الهاتف')),
+                ('message', models.TextField(verbose_name='الرسالة')),
+                ('status', models.CharField(choices=[('pending', 'بانتظار الإرسال'), ('sending', 'قيد الإرسال'), ('sent', 'تم الإرسال'), ('dead', 'فشل نهائي')], default='pending', max_length=10, verbose_name='الحالة')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='عدد المحاولات')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='موعد المحاولة التالية')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='آخر خطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الإرسال')),
+            ],
+            options={
+                'verbose_name': 'رسالة واتساب صادرة',
+                'verbose_name_plural': 'رسائل واتساب الصادرة',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='wa_outbox_due_idx'), models.Index(fields=['phone', 'sent_at'], name='wa_outbox_phone_sent_idx')],
+            },
+        ),
+    ]
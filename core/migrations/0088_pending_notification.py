@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0087_whatsapp_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('order_placed_customer', 'تأكيد طلب للعميل'), ('order_placed_merchant', 'طلب جديد للتاجر'), ('order_placed_platform', 'طلب جديد للمنصة'), ('order_cancelled_admin', 'إلغاء طلب'), ('merchant_signup_admin', 'تسجيل تاجر جديد'), ('merchant_welcome', 'ترحيب بالتاجر'), ('signup_otp', 'رمز التحقق')], max_length=40, verbose_name='الحدث')),
+                ('phone', models.CharField(max_length=20, verbose_name='رقم المستلم')),
+                ('context', models.JSONField(default=dict, verbose_name='بيانات الرسالة')),
+                ('digest', models.BooleanField(default=True, verbose_name='ضمن الملخص')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الإنشاء')),
+            ],
+            options={
+                'verbose_name': 'إشعار معلق',
+                'verbose_name_plural': 'الإشعارات المعلقة',
+                'indexes': [models.Index(fields=['created_at'], name='pending_notification_age_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_stock_balances(apps, schema_editor):
+    """One adjust movement per product so the ledger sums match the current stock."""
+    Product = apps.get_model('core', 'Product')
+    StockMovement = apps.get_model('core', 'StockMovement')
+
+    movements = [
+        StockMovement(product_id=product_id, kind='adjust', stock_delta=stock, note='رصيد افتتاحي')
+        for product_id, stock in Product.objects.filter(stock__gt=0).values_list('id', 'stock').iterator()
+    ]
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0088_pending_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='محجوز لطلبات مفتوحة'),
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reserve', 'حجز'), ('commit', 'صرف'), ('release', 'إلغاء حجز / إرجاع'), ('adjust', 'تعديل يدوي')], max_length=10, verbose_name='النوع')),
+                ('stock_delta', models.IntegerField(default=0, verbose_name='التغير في المخزون')),
+                ('reserved_delta', models.IntegerField(default=0, verbose_name='التغير في المحجوز')),
+                ('note', models.CharField(blank=True, default='', max_length=255, verbose_name='ملاحظة')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='التاريخ')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='بواسطة')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='core.order', verbose_name='الطلب')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='core.product', verbose_name='المنتج')),
+                ('workflow_step', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.workflowstep', verbose_name='مرحلة سير العمل')),
+            ],
+            options={
+                'verbose_name': 'حركة مخزون',
+                'verbose_name_plural': 'حركات المخزون',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', '-created_at'], name='stock_movement_product_idx'), models.Index(fields=['order', 'product'], name='stock_movement_order_idx')],
+            },
+        ),
+        migrations.RunPython(open_stock_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0089_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pendingnotification',
+            name='event',
+            field=models.CharField(choices=[('order_placed_customer', 'تأكيد طلب للعميل'), ('order_placed_merchant', 'طلب جديد للتاجر'), ('order_placed_platform', 'طلب جديد للمنصة'), ('order_cancelled_admin', 'إلغاء طلب'), ('orders_cancelled_admin', 'إلغاء عدة طلبات'), ('merchant_signup_admin', 'تسجيل تاجر جديد'), ('merchant_welcome', 'ترحيب بالتاجر'), ('signup_otp', 'رمز التحقق')], max_length=40, verbose_name='الحدث'),
+        ),
+    ]
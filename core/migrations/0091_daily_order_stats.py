@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_order_stats(apps, schema_editor):
+    """Initial counters from the existing orders (same query as rebuild_order_stats)."""
+    Order = apps.get_model('core', 'Order')
+    DailyOrderStats = apps.get_model('core', 'DailyOrderStats')
+
+    rows = (
+        Order.objects.filter(supplier__isnull=False)
+        .annotate(date=TruncDate('created_at'))
+        .values('supplier_id', 'date', status_id=F('pipeline_status_id'))
+        .annotate(orders=Count('id'), amount=Sum('total_amount'))
+        .order_by()
+    )
+    DailyOrderStats.objects.bulk_create([DailyOrderStats(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0090_pending_notification_bulk_cancel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrderStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('orders', models.IntegerField(default=0, verbose_name='عدد الطلبات')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='إجمالي المبالغ')),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.orderstatus', verbose_name='الحالة')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_order_stats', to='core.supplier', verbose_name='المتجر')),
+            ],
+            options={
+                'verbose_name': 'إحصائية طلبات يومية',
+                'verbose_name_plural': 'إحصائيات الطلبات اليومية',
+                'unique_together': {('supplier', 'date', 'status')},
+            },
+        ),
+        migrations.RunPython(build_order_stats, migrations.RunPython.noop),
+    ]
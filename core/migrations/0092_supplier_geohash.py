@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+GEOHASH_PRECISION = 9
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Copy of core.utils.geo_utils.encode_geohash as of this migration."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def fill_geohashes(apps, schema_editor):
+    Supplier = apps.get_model('core', 'Supplier')
+    suppliers = list(Supplier.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for supplier in suppliers:
+        supplier.geohash = encode_geohash(supplier.latitude, supplier.longitude)
+    Supplier.objects.bulk_update(suppliers, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0091_daily_order_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12, verbose_name='الترميز الجغرافي'),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
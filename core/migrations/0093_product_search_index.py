@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copy of the core.utils.search_utils term building as of this migration
+DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)},
+})
+WORD = re.compile(r'\w+')
+ARTICLE = 'ال'
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+MAX_DESCRIPTION_TERMS = 200
+FIELD_WEIGHTS = {'n': 8, 'c': 4, 's': 2, 'd': 1}
+
+
+def tokenize(text):
+    words = []
+    for word in WORD.findall(DIACRITICS.sub('', text or '').translate(FOLDING).casefold()):
+        word = word[:MAX_TERM_LENGTH]
+        if len(word) >= MIN_TERM_LENGTH and word not in words:
+            words.append(word)
+    return words
+
+
+def index_forms(word):
+    if word.startswith(ARTICLE) and len(word) - len(ARTICLE) >= MIN_TERM_LENGTH:
+        return (word, word[len(ARTICLE):])
+    return (word,)
+
+
+def build_terms(name, description, category_names, store_name):
+    sources = [
+        ('n', tokenize(name)),
+        ('c', tokenize(' '.join(category_names))),
+        ('s', tokenize(store_name)),
+        ('d', tokenize(description)[:MAX_DESCRIPTION_TERMS]),
+    ]
+    terms = {}
+    for field, words in sources:
+        for word in words:
+            for form in index_forms(word):
+                terms[form, field] = FIELD_WEIGHTS[field]
+    return terms
+
+
+def build_search_index(apps, schema_editor):
+    """Initial index of the existing products (same terms as index_products)."""
+    Product = apps.get_model('core', 'Product')
+    SearchTerm = apps.get_model('core', 'SearchTerm')
+
+    rows = []
+    for product in Product.objects.select_related('category__category', 'supplier').iterator(chunk_size=500):
+        category = product.category
+        terms = build_terms(
+            product.name, product.description,
+            [category.name, category.category.name] if category else [],
+            product.supplier.name if product.supplier else '',
+        )
+        rows.extend(
+            SearchTerm(product_id=product.pk, term=term, field=field, weight=weight)
+            for (term, field), weight in terms.items()
+        )
+        if len(rows) >= 5000:
+            SearchTerm.objects.bulk_create(rows, batch_size=1000)
+            rows = []
+    SearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0092_supplier_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='الكلمة')),
+                ('field', models.CharField(choices=[('n', 'اسم المنتج'), ('c', 'الفئة'), ('s', 'اسم المتجر'), ('d', 'الوصف')], max_length=1, verbose_name='الحقل')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='الوزن')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='core.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'كلمة بحث',
+                'verbose_name_plural': 'فهرس البحث',
+                'indexes': [models.Index(fields=['term', 'product'], name='search_term_idx')],
+                'unique_together': {('product', 'term', 'field')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
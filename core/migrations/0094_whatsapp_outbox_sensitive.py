@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+import re
+
+from django.db import migrations, models
+
+PASSWORD_LINE = re.compile(r'^(🔹 \*كلمة المرور:\*).*$', re.MULTILINE)
+OTP_PREFIX = 'رمز التحقق الخاص بك هو:'
+
+
+def redact_credentials(apps, schema_editor):
+    """Wipe the passwords and codes already stored in queued and sent messages."""
+    Outbox = apps.get_model('core', 'WhatsAppOutboxMessage')
+    PendingNotification = apps.get_model('core', 'PendingNotification')
+
+    for message in Outbox.objects.filter(message__contains='*كلمة المرور:*').only('message'):
+        message.message = PASSWORD_LINE.sub(r'\1 التي اخترتها عند التسجيل', message.message)
+        message.save(update_fields=['message'])
+    Outbox.objects.filter(message__startswith=OTP_PREFIX).exclude(
+        status__in=['pending', 'sending'],
+    ).update(message='[redacted]', sensitive=True)
+    Outbox.objects.filter(message__startswith=OTP_PREFIX, status__in=['pending', 'sending']).update(sensitive=True)
+
+    for notification in PendingNotification.objects.filter(event='merchant_welcome'):
+        if notification.context.pop('password', None) is not None:
+            notification.save(update_fields=['context'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0093_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappoutboxmessage',
+            name='sensitive',
+            field=models.BooleanField(default=False, verbose_name='محتوى حساس'),
+        ),
+        migrations.RunPython(redact_credentials, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+import re
+
+from django.db import migrations, models
+
+# Copy of the core.utils.search_utils normalization as of this migration
+DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)},
+})
+WORD = re.compile(r'\w+')
+ARTICLE = 'ال'
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    words = []
+    for word in WORD.findall(DIACRITICS.sub('', text or '').translate(FOLDING).casefold()):
+        word = word[:MAX_TERM_LENGTH]
+        if len(word) >= MIN_TERM_LENGTH and word not in words:
+            words.append(word)
+    return words
+
+
+def index_forms(word):
+    if word.startswith(ARTICLE) and len(word) - len(ARTICLE) >= MIN_TERM_LENGTH:
+        return (word, word[len(ARTICLE):])
+    return (word,)
+
+
+def store_search_name(name):
+    return ' '.join(form for word in tokenize(name) for form in index_forms(word))[:255]
+
+
+def fill_search_names(apps, schema_editor):
+    Supplier = apps.get_model('core', 'Supplier')
+    suppliers = list(Supplier.objects.only('name'))
+    for supplier in suppliers:
+        supplier.search_name = store_search_name(supplier.name)
+    Supplier.objects.bulk_update(suppliers, ['search_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0094_whatsapp_outbox_sensitive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='الاسم للبحث'),
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+BATCH_SIZE = 1000
+
+
+def backfill_order_supplier(apps, schema_editor):
+    """
+    Set Order.supplier on the orders created before the field existed, so
+    merchant lists and stats (which filter on it) see them. Same rule as
+    `manage.py backfill_order_supplier`: the store of the order's first item
+    (lowest item id), which is what Order.get_supplier() returned for them;
+    orders mixing stores go to that store only.
+    """
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    DailyOrderStats = apps.get_model('core', 'DailyOrderStats')
+
+    touched = set()
+    last_id = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(supplier__isnull=True, id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not order_ids:
+            break
+        last_id = order_ids[-1]
+
+        first_supplier = {}
+        for order_id, supplier_id in (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .order_by('order_id', 'id').values_list('order_id', 'product__supplier_id')
+        ):
+            first_supplier.setdefault(order_id, supplier_id)
+        orders_by_supplier = defaultdict(list)
+        for order_id, supplier_id in first_supplier.items():
+            orders_by_supplier[supplier_id].append(order_id)
+        for supplier_id, ids in orders_by_supplier.items():
+            Order.objects.filter(id__in=ids).update(supplier_id=supplier_id)
+        touched.update(orders_by_supplier)
+
+    # Queryset updates skip the signals: recount the stores that gained orders
+    if touched:
+        DailyOrderStats.objects.filter(supplier_id__in=touched).delete()
+        rows = (
+            Order.objects.filter(supplier_id__in=touched)
+            .annotate(date=TruncDate('created_at'))
+            .values('supplier_id', 'date', status_id=F('pipeline_status_id'))
+            .annotate(orders=Count('id'), amount=Sum('total_amount'))
+            .order_by()
+        )
+        DailyOrderStats.objects.bulk_create([DailyOrderStats(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0095_supplier_search_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_supplier, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from decimal import Decimal
 from django.utils import timezone
-import math
 import os
 import uuid
 
@@ -111,6 +110,10 @@ class Supplier(models.Model):
     workflow = models.ForeignKey(OrderWorkflow, on_delete=models.SET_NULL, null=True, blank=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Derived from latitude/longitude on save, indexed for "stores near me" (see core.utils.geo_utils)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False, verbose_name="الترميز الجغرافي")
+    # Normalized words of the name, set on save, matched by core.utils.search_utils.search_suppliers
+    search_name = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name="الاسم للبحث")
     delivery_fee_ratio = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name="نسبة رسوم التوصيل لكل كم")
     enable_delivery_fees = models.BooleanField(default=False, verbose_name="تفعيل رسوم التوصيل")
     show_order_amounts = models.BooleanField(default=True, verbose_name="عرض مبالغ الطلبات")
@@ -139,21 +142,29 @@ class Supplier(models.Model):
                 # Deactivating supplier: deactivate ads
                 self.supplier_ads.all().update(is_active=False)
                 PlatformOfferAd.objects.filter(product__supplier=self).update(is_approved=False)
+        from core.utils.search_utils import store_search_name
+        self.geohash = self.compute_geohash()
+        self.search_name = store_search_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'search_name'}
         super().save(*args, **kwargs)
+
+    def compute_geohash(self):
+        from core.utils.geo_utils import encode_geohash
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return encode_geohash(self.latitude, self.longitude)
     
     def get_total_sales_for_current_month(self):
-        orders = Order.objects.filter(
-            order_items__product__supplier=self,
-            pipeline_status__slug='confirmed', 
-            created_at__month=timezone.now().month
-        ).distinct()
-        return sum([order.get_total_amount() for order in orders])
+        from core.utils.order_stats_utils import get_order_stats
+        return get_order_stats(self)['confirmed_revenue_this_month']
 
     def get_total_sales_count(self):
-        return Order.objects.filter(
-            order_items__product__supplier=self,
-            pipeline_status__slug='confirmed'
-        ).distinct().count()
+        from core.utils.order_stats_utils import get_order_stats
+        return get_order_stats(self, statuses=['confirmed'])['confirmed_orders']
 
     def get_average_rating(self):
         from core.models import Review
@@ -161,6 +172,33 @@ class Supplier(models.Model):
         avg_rating = Review.objects.filter(product__supplier=self).aggregate(Avg('rating'))['rating__avg']
         return round(float(avg_rating), 1) if avg_rating is not None else 0.0
 
+
+class SupplierRanking(models.Model):
+    """
+    Precomputed "strongest offers" position of a supplier in the stores list.
+    Kept up to date by `core.utils.ranking_utils.refresh_supplier_rankings`
+    (offer/supplier signals and the daily `refresh_supplier_rankings` command).
+    """
+    supplier = models.OneToOneField(Supplier, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    is_active = models.BooleanField(default=True, verbose_name="نشط")
+    max_offer_discount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="أعلى خصم فعال")
+    offers_count = models.PositiveIntegerField(default=0, verbose_name="عدد العروض الفعالة")
+    priority = models.IntegerField(default=0, verbose_name="الأولوية")
+    ranked_on = models.DateField(verbose_name="تاريخ الاحتساب")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['is_active', '-max_offer_discount', '-offers_count', '-priority'],
+                name='supplier_ranking_order_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.supplier_id} | {self.max_offer_discount} | {self.offers_count}"
+
+
 class SupplierAdPlatfrom(models.Model):
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, null=True, blank=True)
     title = models.CharField(max_length=200, null=True, blank=True, verbose_name="العنوان")
@@ -200,50 +238,60 @@ class Product(models.Model):
     is_new = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     views_count = models.PositiveIntegerField(default=0, verbose_name="عدد المشاهدات")
+    # Materialized balances of the StockMovement ledger (see core.utils.stock_utils)
     stock = models.PositiveIntegerField(default=0, verbose_name="المخزون")
+    reserved = models.PositiveIntegerField(default=0, editable=False, verbose_name="محجوز لطلبات مفتوحة")
     
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Stock balances only move through the ledger (core.utils.stock_utils):
+        # saving a loaded product must not write back the copy it was read with
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('stock', 'reserved')
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def available_stock(self):
+        """Units that can still be sold: on hand minus what open orders hold."""
+        return max(self.stock - self.reserved, 0)
+
+
+    def get_active_offer(self):
+        """
+        Return today's active ProductOffer (or None).
+        Uses the offer pre-resolved by `core.utils.offer_utils.resolve_active_offers`
+        when present, otherwise runs one query and memoizes it on the instance.
+        """
+        if not hasattr(self, '_active_offer'):
+            today = timezone.now().date()
+            self._active_offer = ProductOffer.objects.filter(
+                product=self,
+                is_active=True,
+                from_date__lte=today,
+                to_date__gte=today
+            ).order_by('id').first()
+        return self._active_offer
 
     def get_price_with_offer(self):
-        today = timezone.now().date()
-
-        offers = ProductOffer.objects.filter(
-            product=self,
-            is_active=True,
-            from_date__lte=today,
-            to_date__gte=today
-        )       
-        if offers.exists():
-            return offers.first().get_price_with_discount()
-        else:
-            return self.price
-        
+        offer = self.get_active_offer()
+        if offer:
+            return self.price - (self.price * offer.discount_precentage)
+        return self.price
+
     def has_discount(self):
-        today = timezone.now().date()
-        offers = ProductOffer.objects.filter(
-            product=self,
-            is_active=True,
-            from_date__lte=today,
-            to_date__gte=today
-        )       
-        return offers.exists()
-    
+        return self.get_active_offer() is not None
+
     def get_discount_precentage(self):
-        today = timezone.now().date()
-        offers = ProductOffer.objects.filter(
-            product=self,
-            is_active=True,
-            from_date__lte=today,
-            to_date__gte=today
-        ).first()    
-        return round(offers.get_discount_percentage_offer())
-        
-            
-        
-        
-    
+        offer = self.get_active_offer()
+        if not offer:
+            return 0
+        return round(offer.get_discount_percentage_offer())
+
 
     def get_average_rating(self):
         reviews = self.review_set.all()
@@ -316,26 +364,28 @@ class Cart(models.Model):
         return f"Cart for {self.user.username}"
     
     
+    def get_pricing_summary(self, refresh=False, address=None):
+        """Items, offers and delivery fee computed once and cached for this request."""
+        if refresh or not hasattr(self, '_pricing_summary'):
+            from core.utils.pricing_utils import build_cart_summary
+            self._pricing_summary = build_cart_summary(self, address=address)
+        return self._pricing_summary
+
     def get_total_items(self):
-        return sum([item.quantity for item in self.cart_items.all()])
+        return self.get_pricing_summary().item_count
     
 
     def get_total_amount(self):
-        return sum([item.get_subtotal() for item in self.cart_items.all()])
+        return self.get_pricing_summary().gross
     
     def get_total_ammout_with_discout(self):
-        total_with_discount = sum([item.get_subtotal_with_discount() for item in self.cart_items.all()])
-        return self.get_total_amount() - total_with_discount
+        return self.get_pricing_summary().discount
     
     def get_total_after_discount(self):
-        return sum([item.get_subtotal_with_discount() for item in self.cart_items.all()])
+        return self.get_pricing_summary().net
     
     def has_discount(self):
-        cart_items = self.cart_items.all()
-        for cart_item in cart_items:
-            if cart_item.has_discount():
-                return True
-        return False
+        return self.get_pricing_summary().has_discount
         
         
 class CartItem(models.Model):
@@ -364,6 +414,7 @@ class CartItem(models.Model):
     
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders', verbose_name="المتجر")
     items = models.ManyToManyField(Product, through='OrderItem')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -371,33 +422,43 @@ class Order(models.Model):
     is_stock_decreased = models.BooleanField(default=False, verbose_name="تم تقليل المخزون")
     cancellation_reason = models.TextField(blank=True, null=True, verbose_name="سبب الإلغاء")
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['supplier', '-created_at']),
+        ]
     
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
     
     def get_payment_total(self):
         """Calculate total amount recorded in payment references"""
+        if 'paid_total' in self.__dict__:
+            # Annotated by the queryset (bulk status updates)
+            return self.paid_total or 0
         return self.payment_references.aggregate(total=models.Sum('amount'))['total'] or 0
     
     def is_fully_paid(self):
         """Check if total payment references meet or exceed order total"""
         return self.get_payment_total() >= self.total_amount
     
-    def get_current_workflow_step(self):
+    def get_workflow_graph(self):
+        """The supplier's WorkflowGraph (in memory, see core.utils.workflow_utils), or None."""
+        from core.utils.workflow_utils import get_workflow_graph
         supplier = self.get_supplier()
-        if not supplier or not supplier.workflow or not self.pipeline_status:
+        return get_workflow_graph(supplier.workflow_id) if supplier else None
+
+    def get_current_workflow_step(self):
+        graph = self.get_workflow_graph()
+        if not graph or not self.pipeline_status_id:
             return None
-        return WorkflowStep.objects.filter(workflow=supplier.workflow, status=self.pipeline_status).first()
+        return graph.step_for(self.pipeline_status_id)
 
     def get_next_step(self):
-        current_step = self.get_current_workflow_step()
-        if not current_step:
+        graph = self.get_workflow_graph()
+        if not graph or not self.pipeline_status_id:
             return None
-        
-        return WorkflowStep.objects.filter(
-            workflow=current_step.workflow,
-            priority__gt=current_step.priority
-        ).order_by('priority').first()
+        return graph.next_step(self.pipeline_status_id)
 
     def get_next_status(self):
         next_step = self.get_next_step()
@@ -407,70 +468,91 @@ class Order(models.Model):
         if not self.pipeline_status:
             # We use a lazy import or just call the model since it is in the same file
             self.pipeline_status = OrderStatus.objects.filter(slug='pending').first()
-        super().save(*args, **kwargs)
+        # Atomic with the DailyOrderStats counters updated by the save signals
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-    def update_status(self, new_status, reason=None, user=None):
+    def update_status(self, new_status, reason=None, user=None, notify_admin=True):
         """Update status and handle workflow logic (payment, stock)"""
         if not new_status:
             return False, "حالة غير صالحة."
 
-        supplier = self.get_supplier()
-        
         # Handle Cancellation Logic
         if new_status.slug == 'cancelled':
             if not reason:
                  return False, "يجب إدخال سبب الإلغاء."
             self.cancellation_reason = reason
             
-            # Notify Admin via WhatsApp
-            from core.utils.whatsapp_utils import send_whatsapp_message
-            from core.models import SystemSettings
-            settings = SystemSettings.objects.first()
-            if settings and settings.whatsapp_number:
-                performer_name = user.username if user else "المسؤول"
-                customer_name = self.user.get_full_name() or self.user.username
-                admin_msg = (
-                    f"⚠️ *تنبيه إلغاء طلب*\n\n"
-                    f"تم إلغاء الطلب: *#{self.id}*\n"
-                    f"من قبل: *{performer_name}*\n"
-                    f"العميل: {customer_name}\n"
-                    f"السبب: {reason}"
-                )
-                send_whatsapp_message(settings.whatsapp_number, admin_msg)
-
-        if not supplier or not supplier.workflow:
-            self.pipeline_status = new_status
-            self.save()
+            # Notify Admin via WhatsApp (digested with other cancellations;
+            # bulk updates send one notification for the whole batch instead)
+            if notify_admin:
+                from core.utils.notification_utils import ADMIN_RECIPIENT, notify
+                notify('order_cancelled_admin', [ADMIN_RECIPIENT], {
+                    'order_id': self.id,
+                    'performer_name': user.username if user else "المسؤول",
+                    'customer_name': self.user.get_full_name() or self.user.username,
+                    'reason': reason,
+                })
+
+        graph = self.get_workflow_graph()
+        if not graph:
+            with transaction.atomic():
+                if new_status.slug == 'cancelled':
+                    self.release_stock(user)
+                elif new_status.is_terminal:
+                    self.release_holds(user)
+                self.pipeline_status = new_status
+                self.save()
             return True, f"تم تحديث الحالة إلى {new_status.name}"
 
         # Get relevant workflow steps
-        current_step = self.get_current_workflow_step()
-        next_step = WorkflowStep.objects.filter(workflow=supplier.workflow, status=new_status).first()
+        current_step = graph.step_for(self.pipeline_status_id)
+        next_step = graph.step_for(new_status.id)
 
         # Check conditions if moving forward in priority (AND NOT CANCELLING)
-        if new_status.slug != 'cancelled' and current_step and next_step and next_step.priority > current_step.priority:
+        if new_status.slug != 'cancelled' and graph.is_forward(self.pipeline_status_id, new_status.id):
             # Check payment requirement on CURRENT step before moving
             if current_step.requires_payment and not self.is_fully_paid():
                 return False, f"لا يمكن الانتقال: يتوجب سداد كامل المبلغ ({self.total_amount}) للطلب أولاً."
 
         # Handle stock reduction on NEW step if moving to a step that requires it (AND NOT CANCELLING)
-        if new_status.slug != 'cancelled' and next_step and next_step.decrease_stock and not self.is_stock_decreased:
-            # 1. Check if we have enough stock for all items
-            for item in self.order_items.all():
-                if item.product.stock < item.quantity:
-                    return False, f"لا يوجد مخزون كافٍ للمنتج: {item.product.name} (المتوفر: {item.product.stock})"
-
-            # 2. Perform reduction
-            for item in self.order_items.all():
-                item.product.stock -= item.quantity
-                item.product.save()
-            
-            self.is_stock_decreased = True
+        takes_stock = new_status.slug != 'cancelled' and next_step and next_step.decrease_stock and not self.is_stock_decreased
+        # Done with the order: nothing may stay held for it
+        finishes = new_status.slug != 'cancelled' and (new_status.is_terminal or graph.is_final(new_status.id))
+
+        with transaction.atomic():
+            if takes_stock:
+                from core.utils.stock_utils import InsufficientStock, commit_order_stock
+                # Lock the order row so a concurrent status move can't take the stock twice
+                already_decreased = Order.objects.select_for_update().filter(pk=self.pk).values_list('is_stock_decreased', flat=True).first()
+                if not already_decreased:
+                    try:
+                        # Holds become a real decrement, all items or none
+                        commit_order_stock(self, next_step)
+                    except InsufficientStock as exc:
+                        return False, str(exc)
+                self.is_stock_decreased = True
+            elif new_status.slug == 'cancelled':
+                self.release_stock(user)
+            elif finishes:
+                self.release_holds(user, next_step)
 
-        self.pipeline_status = new_status
-        self.save()
+            self.pipeline_status = new_status
+            self.save()
         return True, f"تم تحديث حالة الطلب إلى: {new_status.name}"
 
+    def release_stock(self, user=None):
+        """Cancelled order: drop its holds and restock what was already taken (inside a transaction)."""
+        from core.utils.stock_utils import release_order_stock
+        already_decreased = Order.objects.select_for_update().filter(pk=self.pk).values_list('is_stock_decreased', flat=True).first()
+        release_order_stock(self, restock=bool(already_decreased), user=user)
+        self.is_stock_decreased = False
+
+    def release_holds(self, user=None, workflow_step=None):
+        """Finished order: drop the holds it still has (its workflow never took the stock)."""
+        from core.utils.stock_utils import release_order_stock
+        release_order_stock(self, workflow_step=workflow_step, user=user)
+
     def move_to_next_status(self):
         next_status = self.get_next_status()
         if not next_status:
@@ -478,68 +560,62 @@ class Order(models.Model):
         
         return self.update_status(next_status)
     
+    def get_shipping_address(self, refresh=False):
+        """The order's (first) shipping address, loaded once per instance (or taken from a prefetch)."""
+        if refresh or not hasattr(self, '_shipping_address'):
+            if not refresh and 'shippingaddress_set' in getattr(self, '_prefetched_objects_cache', {}):
+                addresses = sorted(self.shippingaddress_set.all(), key=lambda address: address.pk)
+                self._shipping_address = addresses[0] if addresses else None
+            else:
+                self._shipping_address = self.shippingaddress_set.order_by('pk').first()
+        return self._shipping_address
+
+    def get_pricing_summary(self, refresh=False):
+        """Items, offers and delivery fee computed once and cached for this request."""
+        if refresh:
+            self.__dict__.pop('_shipping_address', None)
+        if refresh or not hasattr(self, '_pricing_summary'):
+            from core.utils.pricing_utils import build_order_summary
+            self._pricing_summary = build_order_summary(self)
+        return self._pricing_summary
+
     def set_total_amount(self):
-        items_total = sum([item.get_subtotal_with_discount() for item in self.order_items.all()])
-        delivery_fee = self.get_expected_delivery_fee()
-        self.total_amount = items_total + delivery_fee
+        # Items or the shipping address were just written: never trust a cached summary
+        self.total_amount = self.get_pricing_summary(refresh=True).total
         self.save()
 
     def get_expected_delivery_fee(self):
-        supplier = self.get_supplier()
-        if not supplier or not supplier.enable_delivery_fees:
-            return Decimal('0')
-            
-        shipping_address = self.shippingaddress_set.first()
-        if not shipping_address:
-            return Decimal('0')
-            
-        if supplier.latitude and supplier.longitude and shipping_address.latitude and shipping_address.longitude:
-            distance = self.calculate_distance(
-                supplier.latitude, supplier.longitude,
-                shipping_address.latitude, shipping_address.longitude
-            )
-            if distance:
-                fee = float(distance) * float(supplier.delivery_fee_ratio or 0)
-                return Decimal(str(fee)).quantize(Decimal('0.01'))
-        return Decimal('0')
-
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        """Calculate the great circle distance between two points in km"""
-        if not all([lat1, lon1, lat2, lon2]):
-            return None
-        R = 6371  # Earth radius in km
-        phi1, phi2 = math.radians(float(lat1)), math.radians(float(lat2))
-        dphi = math.radians(float(lat2) - float(lat1))
-        dlambda = math.radians(float(lon2) - float(lon1))
-        a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-        return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        return self.get_pricing_summary().delivery_fee
 
     def get_total_amount(self):
-        items_total = sum([item.get_subtotal() for item in self.order_items.all()])
-        return items_total
+        return self.get_pricing_summary().gross
     
     def get_total_ammout_with_discout(self):
-        return sum([item.get_subtotal_with_discount() for item in self.order_items.all()])
+        return self.get_pricing_summary().net
     
     def get_total_after_discount(self):
-        return self.get_total_ammout_with_discout() + self.get_expected_delivery_fee()
+        return self.get_pricing_summary().total
 
     def get_discount_amount(self):
-        items_gross = sum([item.get_subtotal() for item in self.order_items.all()])
-        return items_gross - self.get_total_ammout_with_discout()
+        return self.get_pricing_summary().discount
     
+    def is_owned_by(self, supplier):
+        """True if the order was placed with `supplier`."""
+        if self.supplier_id:
+            return self.supplier_id == supplier.id
+        return self.order_items.filter(product__supplier=supplier).exists()
+
     def get_supplier(self):
-        first_item = self.order_items.first()
+        if self.supplier_id:
+            return self.supplier
+        # Legacy orders not yet backfilled (migration 0096, `manage.py backfill_order_supplier`)
+        first_item = self.order_items.select_related('product__supplier').first()
         if first_item:
             return first_item.product.supplier
         return None
     
     def has_discount(self):
-        order_items = self.order_items.all()
-        for order_item in order_items:
-            if order_item.has_discount():
-                return True
-        return False
+        return self.get_pricing_summary().has_discount
     
     
     
@@ -570,18 +646,55 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Price snapshot taken at checkout so historical orders never drift with live offers
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="سعر الوحدة")
+    discounted_unit_price = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True, verbose_name="سعر الوحدة بعد الخصم")
+    discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name="نسبة الخصم")
     
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in Order {self.order.id}"
 
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.snapshot_prices()
+        super().save(*args, **kwargs)
+
+    def snapshot_prices(self, offer=None, resolve_offer=True):
+        """
+        Copy the product's price and active offer onto the item.
+        By default today's (pre-resolved) offer is used; pass `resolve_offer=False`
+        with an explicit `offer` (or None) to snapshot another date's offer.
+        """
+        product = self.product
+        if offer is None and resolve_offer:
+            offer = product.get_active_offer()
+        self.unit_price = product.price
+        if offer:
+            self.discounted_unit_price = product.price - (product.price * offer.discount_precentage)
+            self.discount_percentage = offer.get_discount_percentage_offer()
+        else:
+            self.discounted_unit_price = product.price
+            self.discount_percentage = 0
+
+    def has_price_snapshot(self):
+        return self.unit_price is not None
+
+    def get_unit_price(self):
+        return self.unit_price if self.has_price_snapshot() else self.product.price
+
+    def get_unit_price_with_discount(self):
+        return self.discounted_unit_price if self.has_price_snapshot() else self.product.get_price_with_offer()
+
     def get_subtotal(self):
-        return self.product.price * self.quantity
+        return self.get_unit_price() * self.quantity
     
     def get_subtotal_with_discount(self):
-        return self.product.get_price_with_offer() * self.quantity
+        return self.get_unit_price_with_discount() * self.quantity
     
     def has_discount(self):
-       return self.product.has_discount()
+        if self.has_price_snapshot():
+            return self.discount_percentage > 0
+        return self.product.has_discount()
 
 
 class OrderNote(models.Model):
@@ -845,7 +958,8 @@ class WebsiteStatistic(models.Model):
     )
 
     # --- Timestamps ---
-    visited_at = models.DateTimeField(auto_now_add=True, verbose_name="وقت الزيارة")
+    # Set by the tracking middleware at request time; rows are inserted later in batches
+    visited_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="وقت الزيارة")
 
     class Meta:
         verbose_name = "إحصائية زيارة"
@@ -866,6 +980,115 @@ class WebsiteStatistic(models.Model):
         return f"{user_label} → {self.page_type} ({self.visited_at:%Y-%m-%d %H:%M})"
 
 
+class VisitRollup(models.Model):
+    """
+    Visit counts of one time bucket for one combination of store, page type
+    and client. Built from WebsiteStatistic by the `rollup_visit_statistics`
+    command; unique counts are exact within a row and must not be summed
+    across rows (use DailyVisitTotal for totals).
+    """
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='+', verbose_name="المتجر"
+    )
+    page_type = models.CharField(max_length=30, choices=WebsiteStatistic.PAGE_TYPE_CHOICES, verbose_name="نوع الصفحة")
+    device_type = models.CharField(max_length=10, choices=WebsiteStatistic.DEVICE_CHOICES, verbose_name="نوع الجهاز")
+    browser = models.CharField(max_length=100, blank=True, default='', verbose_name="المتصفح")
+    operating_system = models.CharField(max_length=100, blank=True, default='', verbose_name="نظام التشغيل")
+    visits = models.PositiveIntegerField(default=0, verbose_name="الزيارات")
+    unique_sessions = models.PositiveIntegerField(default=0, verbose_name="الجلسات الفريدة")
+    unique_ips = models.PositiveIntegerField(default=0, verbose_name="عناوين IP الفريدة")
+
+    class Meta:
+        abstract = True
+
+
+class HourlyVisitRollup(VisitRollup):
+    hour = models.DateTimeField(verbose_name="الساعة")
+
+    class Meta:
+        verbose_name = "إحصائية زيارات بالساعة"
+        verbose_name_plural = "إحصائيات الزيارات بالساعة"
+        indexes = [
+            models.Index(fields=['hour']),
+            models.Index(fields=['supplier', 'hour']),
+        ]
+
+
+class DailyVisitRollup(VisitRollup):
+    date = models.DateField(verbose_name="التاريخ")
+
+    class Meta:
+        verbose_name = "إحصائية زيارات يومية"
+        verbose_name_plural = "إحصائيات الزيارات اليومية"
+        indexes = [
+            models.Index(fields=['date']),
+            models.Index(fields=['supplier', 'date']),
+        ]
+
+
+class DailyVisitTotal(models.Model):
+    """
+    Daily visit totals with exact unique counts, per store and for the
+    whole site (the row with `supplier` NULL).
+    """
+    date = models.DateField(verbose_name="التاريخ")
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='daily_visit_totals', verbose_name="المتجر"
+    )
+    visits = models.PositiveIntegerField(default=0, verbose_name="الزيارات")
+    unique_sessions = models.PositiveIntegerField(default=0, verbose_name="الجلسات الفريدة")
+    unique_ips = models.PositiveIntegerField(default=0, verbose_name="عناوين IP الفريدة")
+
+    class Meta:
+        verbose_name = "إجمالي زيارات يومي"
+        verbose_name_plural = "إجماليات الزيارات اليومية"
+        indexes = [
+            models.Index(fields=['supplier', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} | {self.supplier_id or 'site'} | {self.visits}"
+
+
+class DailyOrderStats(models.Model):
+    """
+    إحصائيات الطلبات اليومية للمتجر.
+    Orders created on `date` that are currently in `status`, per store, and
+    their total amount. Kept up to date by the Order signals (see
+    core.utils.order_stats_utils) and rebuilt by `rebuild_order_stats`.
+    """
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.CASCADE, related_name='daily_order_stats', verbose_name="المتجر"
+    )
+    date = models.DateField(verbose_name="التاريخ")
+    status = models.ForeignKey(
+        OrderStatus, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='+', verbose_name="الحالة"
+    )
+    orders = models.IntegerField(default=0, verbose_name="عدد الطلبات")
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="إجمالي المبالغ")
+
+    class Meta:
+        verbose_name = "إحصائية طلبات يومية"
+        verbose_name_plural = "إحصائيات الطلبات اليومية"
+        unique_together = ['supplier', 'date', 'status']
+
+    def __str__(self):
+        return f"{self.date} | {self.supplier_id} | {self.status_id}: {self.orders}"
+
+
+class RollupWatermark(models.Model):
+    """Highest source row id already folded into a rollup, per rollup job."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
 class WhatsAppInquiryClick(models.Model):
     """Tracks every click on the WhatsApp inquiry button on product detail pages."""
 
@@ -892,3 +1115,173 @@ class WhatsAppInquiryClick(models.Model):
     def __str__(self):
         user_label = self.user.username if self.user else 'زائر'
         return f"{user_label} → {self.product.name} ({self.clicked_at:%Y-%m-%d %H:%M})"
+
+
+class WhatsAppOutboxMessage(models.Model):
+    """
+    رسائل واتساب الصادرة بانتظار الإرسال.
+    Outbound WhatsApp messages, delivered by the outbox workers with retries.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'بانتظار الإرسال'),
+        (STATUS_SENDING, 'قيد الإرسال'),
+        (STATUS_SENT, 'تم الإرسال'),
+        (STATUS_DEAD, 'فشل نهائي'),
+    ]
+
+    phone = models.CharField(max_length=20, verbose_name="رقم الهاتف")
+    message = models.TextField(verbose_name="الرسالة")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="الحالة"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="عدد المحاولات")
+    # Due time while pending; lease expiry while sending (a crashed worker's claim runs out)
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="موعد المحاولة التالية")
+    last_error = models.TextField(blank=True, default='', verbose_name="آخر خطأ")
+    # Verification codes and the like: the body is wiped once sent or dead-lettered
+    sensitive = models.BooleanField(default=False, verbose_name="محتوى حساس")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ الإرسال")
+
+    class Meta:
+        verbose_name = "رسالة واتساب صادرة"
+        verbose_name_plural = "رسائل واتساب الصادرة"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='wa_outbox_due_idx'),
+            models.Index(fields=['phone', 'sent_at'], name='wa_outbox_phone_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.phone} | {self.get_status_display()} | {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class PendingNotification(models.Model):
+    """
+    إشعار بانتظار التجميع والإرسال.
+    A notification event queued for one recipient; the dispatcher renders it
+    (alone or in a digest with the recipient's other pending events) into the
+    WhatsApp outbox and deletes it.
+    """
+
+    EVENT_CHOICES = [
+        ('order_placed_customer', 'تأكيد طلب للعميل'),
+        ('order_placed_merchant', 'طلب جديد للتاجر'),
+        ('order_placed_platform', 'طلب جديد للمنصة'),
+        ('order_cancelled_admin', 'إلغاء طلب'),
+        ('orders_cancelled_admin', 'إلغاء عدة طلبات'),
+        ('merchant_signup_admin', 'تسجيل تاجر جديد'),
+        ('merchant_welcome', 'ترحيب بالتاجر'),
+        ('signup_otp', 'رمز التحقق'),
+    ]
+
+    event = models.CharField(max_length=40, choices=EVENT_CHOICES, verbose_name="الحدث")
+    phone = models.CharField(max_length=20, verbose_name="رقم المستلم")
+    context = models.JSONField(default=dict, verbose_name="بيانات الرسالة")
+    # False: sent on the next dispatch instead of waiting for the digest window
+    digest = models.BooleanField(default=True, verbose_name="ضمن الملخص")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="تاريخ الإنشاء")
+
+    class Meta:
+        verbose_name = "إشعار معلق"
+        verbose_name_plural = "الإشعارات المعلقة"
+        indexes = [
+            models.Index(fields=['created_at'], name='pending_notification_age_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_event_display()} → {self.phone}"
+
+
+class StockMovement(models.Model):
+    """
+    حركة مخزون (سجل إلحاقي فقط).
+    Append-only stock ledger. Product.stock and Product.reserved are the
+    running sums of `stock_delta` and `reserved_delta`.
+    """
+
+    KIND_RESERVE = 'reserve'
+    KIND_COMMIT = 'commit'
+    KIND_RELEASE = 'release'
+    KIND_ADJUST = 'adjust'
+    KIND_CHOICES = [
+        (KIND_RESERVE, 'حجز'),
+        (KIND_COMMIT, 'صرف'),
+        (KIND_RELEASE, 'إلغاء حجز / إرجاع'),
+        (KIND_ADJUST, 'تعديل يدوي'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements', verbose_name="المنتج")
+    order = models.ForeignKey(
+        Order, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='stock_movements', verbose_name="الطلب"
+    )
+    workflow_step = models.ForeignKey(
+        WorkflowStep, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name="مرحلة سير العمل"
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="النوع")
+    stock_delta = models.IntegerField(default=0, verbose_name="التغير في المخزون")
+    reserved_delta = models.IntegerField(default=0, verbose_name="التغير في المحجوز")
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name="بواسطة"
+    )
+    note = models.CharField(max_length=255, blank=True, default='', verbose_name="ملاحظة")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="التاريخ")
+
+    class Meta:
+        verbose_name = "حركة مخزون"
+        verbose_name_plural = "حركات المخزون"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', '-created_at'], name='stock_movement_product_idx'),
+            models.Index(fields=['order', 'product'], name='stock_movement_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} | {self.product_id} | {self.stock_delta:+d} / {self.reserved_delta:+d}"
+
+
+class SearchTerm(models.Model):
+    """
+    فهرس البحث عن المنتجات.
+    Inverted index of the product search: one row per normalized word of a
+    product's name, category, store name or description. Kept up to date by
+    the Product / ProductCategory / Category / Supplier signals (see
+    core.utils.search_utils) and rebuilt by `rebuild_search_index`.
+    """
+    FIELD_NAME = 'n'
+    FIELD_CATEGORY = 'c'
+    FIELD_STORE = 's'
+    FIELD_DESCRIPTION = 'd'
+    FIELD_CHOICES = [
+        (FIELD_NAME, 'اسم المنتج'),
+        (FIELD_CATEGORY, 'الفئة'),
+        (FIELD_STORE, 'اسم المتجر'),
+        (FIELD_DESCRIPTION, 'الوصف'),
+    ]
+    # Score of a match in each field
+    FIELD_WEIGHTS = {FIELD_NAME: 8, FIELD_CATEGORY: 4, FIELD_STORE: 2, FIELD_DESCRIPTION: 1}
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms', verbose_name="المنتج")
+    term = models.CharField(max_length=64, verbose_name="الكلمة")
+    field = models.CharField(max_length=1, choices=FIELD_CHOICES, verbose_name="الحقل")
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name="الوزن")
+
+    class Meta:
+        verbose_name = "كلمة بحث"
+        verbose_name_plural = "فهرس البحث"
+        unique_together = ['product', 'term', 'field']
+        indexes = [
+            # Prefix scans: WHERE term LIKE 'abc%'
+            models.Index(fields=['term', 'product'], name='search_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} | {self.product_id} | {self.field}"
@@ -0,0 +1,352 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.models import (
+    Category, Currency, Order, OrderStatus, PlatformOfferAd, Product, ProductCategory, ProductImage,
+    ProductOffer, StockMovement, Supplier, SupplierAdPlatfrom, SupplierAds, SupplierCategory,
+    SystemSettings, WorkflowStep,
+)
+from core.utils.cache_utils import (
+    CATEGORIES_CONTENT, HOME_CONTENT, bump_content_version, membership_content, store_content,
+)
+from core.utils.order_stats_utils import order_stats_key, record_order_change
+from core.utils.ranking_utils import refresh_supplier_rankings
+from core.utils.search_utils import index_products
+from core.utils.settings_utils import invalidate_system_settings
+from core.utils.stock_utils import order_holds, release_deleted_order_holds
+from core.utils.store_utils import invalidate_store_cache
+from core.utils.workflow_utils import invalidate_workflow_graphs
+
+# Fields bumped on page views; saving only these never changes what is displayed
+COUNTER_FIELDS = {'views_count'}
+
+
+def _is_counter_update(update_fields):
+    return bool(update_fields) and set(update_fields) <= COUNTER_FIELDS
+
+
+def _product_supplier_id(product_id):
+    return Product.objects.filter(pk=product_id).values_list('supplier_id', flat=True).first()
+
+
+# --- Supplier ranking ---
+
+def _refresh_ranking_on_commit(supplier_id):
+    if supplier_id:
+        transaction.on_commit(lambda: refresh_supplier_rankings([supplier_id]))
+
+
+@receiver(post_save, sender=ProductOffer)
+@receiver(post_delete, sender=ProductOffer)
+def refresh_ranking_for_offer(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _refresh_ranking_on_commit(_product_supplier_id(instance.product_id))
+
+
+@receiver(post_delete, sender=Product)
+def refresh_ranking_for_product(sender, instance, **kwargs):
+    # Deleting a product removes its offers; saving one never changes the ranking
+    _refresh_ranking_on_commit(instance.supplier_id)
+
+
+@receiver(post_save, sender=Supplier)
+def refresh_ranking_for_supplier(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Picks up priority / is_active changes. A new store gets its row right
+    # away: the stores list only shows suppliers that have one.
+    if raw or _is_counter_update(update_fields):
+        return
+    if created:
+        refresh_supplier_rankings([instance.pk])
+    else:
+        _refresh_ranking_on_commit(instance.pk)
+
+
+# --- Home payload cache ---
+# Registered after the ranking receivers so the version is bumped once the
+# ranking of the same transaction has been refreshed.
+
+def _bump_home_on_commit():
+    transaction.on_commit(lambda: bump_content_version(HOME_CONTENT))
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=SupplierAdPlatfrom)
+@receiver(post_delete, sender=SupplierAdPlatfrom)
+@receiver(post_save, sender=PlatformOfferAd)
+@receiver(post_delete, sender=PlatformOfferAd)
+@receiver(post_save, sender=ProductOffer)
+@receiver(post_delete, sender=ProductOffer)
+@receiver(post_save, sender=SupplierCategory)
+@receiver(post_delete, sender=SupplierCategory)
+@receiver(post_save, sender=Currency)
+def bump_home_version(sender, raw=False, update_fields=None, **kwargs):
+    if not raw and not _is_counter_update(update_fields):
+        _bump_home_on_commit()
+
+
+@receiver(m2m_changed, sender=Supplier.category.through)
+def bump_home_version_for_categories(sender, action, **kwargs):
+    if action.startswith('post_'):
+        _bump_home_on_commit()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_home_version_for_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or _is_counter_update(update_fields):
+        return
+    # Products only reach the home payload through platform offer ads
+    if PlatformOfferAd.objects.filter(product_id=instance.pk).exists():
+        _bump_home_on_commit()
+
+
+# --- Storefront catalog cache ---
+
+def _bump_store_on_commit(supplier_id):
+    if supplier_id:
+        transaction.on_commit(lambda: bump_content_version(store_content(supplier_id)))
+
+
+@receiver(post_save, sender=Supplier)
+def bump_store_version_for_supplier(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Deactivating a store switches its ads off with a queryset update
+    if not raw and not _is_counter_update(update_fields):
+        _bump_store_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_store_version_for_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and not _is_counter_update(update_fields):
+        _bump_store_on_commit(instance.supplier_id)
+
+
+@receiver(post_save, sender=ProductOffer)
+@receiver(post_delete, sender=ProductOffer)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def bump_store_version_for_product_child(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_store_on_commit(_product_supplier_id(instance.product_id))
+
+
+@receiver(post_save, sender=SupplierAds)
+@receiver(post_delete, sender=SupplierAds)
+def bump_store_version_for_ads(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_store_on_commit(instance.supplier_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def bump_categories_version(sender, raw=False, **kwargs):
+    # Categories are shared by every store
+    if not raw:
+        transaction.on_commit(lambda: bump_content_version(CATEGORIES_CONTENT))
+
+
+# --- Store lookup cache (slug -> Supplier) ---
+
+@receiver(pre_save, sender=Supplier)
+def remember_previous_supplier_keys(sender, instance, raw=False, update_fields=None, **kwargs):
+    # A renamed store must also drop the entry cached under its old slug, and
+    # a store handed to another owner changes both owners' membership
+    if raw or not instance.pk or (update_fields and not {'store_id', 'user'} & set(update_fields)):
+        return
+    previous = Supplier.objects.filter(pk=instance.pk).values_list('store_id', 'user_id').first()
+    if previous:
+        instance._previous_store_id, instance._previous_user_id = previous
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def invalidate_store_lookup(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or _is_counter_update(update_fields):
+        return
+    slugs = (instance.store_id, getattr(instance, '_previous_store_id', None))
+    transaction.on_commit(lambda: invalidate_store_cache(*slugs))
+
+
+# --- System settings singleton ---
+
+@receiver(post_save, sender=SystemSettings)
+@receiver(post_delete, sender=SystemSettings)
+def invalidate_system_settings_cache(sender, **kwargs):
+    transaction.on_commit(invalidate_system_settings)
+
+
+# --- Store membership (owned / managed stores kept in the session) ---
+
+def _bump_membership_on_commit(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if user_ids:
+        transaction.on_commit(
+            lambda: [bump_content_version(membership_content(user_id)) for user_id in user_ids]
+        )
+
+
+@receiver(post_save, sender=Supplier)
+def bump_membership_for_owner(sender, instance, created=False, raw=False, **kwargs):
+    previous_user_id = getattr(instance, '_previous_user_id', None)
+    if not raw and (created or (previous_user_id and previous_user_id != instance.user_id)):
+        _bump_membership_on_commit([instance.user_id, previous_user_id])
+
+
+@receiver(pre_delete, sender=Supplier)
+def bump_membership_for_deleted_store(sender, instance, **kwargs):
+    managers = list(instance.managing_users.values_list('id', flat=True))
+    _bump_membership_on_commit([instance.user_id, *managers])
+
+
+@receiver(m2m_changed, sender=Supplier.managing_users.through)
+def bump_membership_for_managers(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Stores added to / removed from a user
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _bump_membership_on_commit([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        _bump_membership_on_commit(pk_set or ())
+    elif action == 'pre_clear':
+        _bump_membership_on_commit(instance.managing_users.values_list('id', flat=True))
+
+
+# --- Stock ledger ---
+
+@receiver(pre_save, sender=Product)
+def remember_previous_stock(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and 'stock' not in update_fields):
+        return
+    previous = None
+    if instance.pk:
+        previous = Product.objects.filter(pk=instance.pk).values_list('stock', 'reserved').first()
+    if previous:
+        # `reserved` only moves through the ledger; never write back a stale copy
+        instance._previous_stock, instance.reserved = previous
+    else:
+        instance._previous_stock = 0
+
+
+@receiver(post_save, sender=Product)
+def record_stock_edit(sender, instance, created=False, raw=False, **kwargs):
+    """
+    A new product's stock is recorded as its opening balance. Edits of an
+    existing product go through `stock_utils.adjust_stock`; generic saves
+    leave `stock` out (see Product.save).
+    """
+    previous = instance.__dict__.pop('_previous_stock', None)
+    if raw or previous is None or instance.stock == previous:
+        return
+    StockMovement.objects.create(
+        product=instance, kind=StockMovement.KIND_ADJUST,
+        stock_delta=instance.stock - previous, note='رصيد افتتاحي' if created else 'تعديل المنتج',
+    )
+
+
+@receiver(pre_delete, sender=Order)
+def release_holds_of_deleted_order(sender, instance, **kwargs):
+    # The ledger keeps the order's movements (order set to NULL), but nothing
+    # would ever release what it still holds. Applied after the delete, when
+    # products deleted in the same cascade are gone.
+    holds = order_holds(instance)
+    if holds:
+        order_id = instance.pk
+        transaction.on_commit(lambda: release_deleted_order_holds(order_id, holds))
+
+
+# --- Workflow graphs ---
+
+@receiver(pre_save, sender=WorkflowStep)
+def remember_previous_workflow(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._previous_workflow_id = (
+            WorkflowStep.objects.filter(pk=instance.pk).values_list('workflow_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=WorkflowStep)
+@receiver(post_delete, sender=WorkflowStep)
+def invalidate_workflow_for_step(sender, instance, **kwargs):
+    previous_workflow_id = instance.__dict__.pop('_previous_workflow_id', None)
+    transaction.on_commit(lambda: invalidate_workflow_graphs([instance.workflow_id, previous_workflow_id]))
+
+
+@receiver(post_save, sender=OrderStatus)
+def invalidate_workflows_for_status(sender, instance, raw=False, **kwargs):
+    """Graphs hold the statuses of their steps (names, slugs)."""
+    if raw:
+        return
+    workflow_ids = list(WorkflowStep.objects.filter(status=instance).values_list('workflow_id', flat=True))
+    if workflow_ids:
+        transaction.on_commit(lambda: invalidate_workflow_graphs(workflow_ids))
+
+
+# --- Daily order stats ---
+
+@receiver(pre_save, sender=Order)
+def remember_previous_order_stats(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    previous = (
+        Order.objects.filter(pk=instance.pk)
+        .values_list('supplier_id', 'created_at', 'pipeline_status_id', 'total_amount').first()
+    )
+    if previous:
+        supplier_id, created_at, status_id, amount = previous
+        before = Order(supplier_id=supplier_id, created_at=created_at, pipeline_status_id=status_id)
+        instance._previous_order_stats = (order_stats_key(before), amount)
+
+
+@receiver(post_save, sender=Order)
+def update_order_stats(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_order_stats', None)
+    if not raw:
+        record_order_change(previous, (order_stats_key(instance), instance.total_amount))
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_stats(sender, instance, **kwargs):
+    record_order_change((order_stats_key(instance), instance.total_amount), None)
+
+
+# --- Product search index ---
+
+# Product fields that feed the search terms
+SEARCH_FIELDS = {'name', 'description', 'category', 'supplier'}
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not SEARCH_FIELDS & set(update_fields)):
+        return
+    index_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductCategory)
+def index_category_products(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        index_products(instance.products.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def index_parent_category_products(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        index_products(Product.objects.filter(category__category=instance).values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender=Supplier)
+def remember_previous_supplier_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.pk or (update_fields and 'name' not in update_fields):
+        return
+    instance._previous_name = Supplier.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Supplier)
+def index_renamed_supplier_products(sender, instance, raw=False, **kwargs):
+    previous_name = instance.__dict__.pop('_previous_name', None)
+    if not raw and previous_name is not None and previous_name != instance.name:
+        index_products(instance.products.values_list('pk', flat=True))
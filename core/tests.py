@@ -1,3 +1,887 @@
-from django.test import TestCase
+import importlib
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from allauth.socialaccount.models import SocialApp
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.forms import ProductForm
+from core.models import (
+    Category, DailyOrderStats, Order, OrderItem, OrderStatus, OrderWorkflow, PendingNotification,
+    Product, ProductCategory, SearchTerm, ShippingAddress, StockMovement, Supplier, SupplierRanking, SystemSettings,
+    WebsiteStatistic, WhatsAppOutboxMessage, WorkflowStep,
+)
+from core.utils.cache_utils import bump_content_version, get_content_version
+from core.utils.delivery_utils import attach_delivery_fees, get_delivery_fee
+from core.utils.geo_utils import encode_geohash, get_nearby_suppliers
+from core.utils.merchant_utils import MEMBERSHIP_TTL, can_manage_supplier
+from core.utils.notification_utils import dispatch_notifications, notify
+from core.utils.order_stats_utils import get_order_stats, rebuild_order_stats
+from core.utils.order_utils import BULK_STATUS_LIMIT, bulk_update_order_status, parse_order_ids
+from core.utils.pagination_utils import DEFAULT_PAGE_SIZE, paginate_by_cursor
+from core.utils.ranking_utils import (
+    RANKING_DATE_CACHE_KEY, _upsert_options, get_ranked_suppliers, refresh_supplier_rankings,
+)
+from core.utils.search_utils import normalize_text, search_products, search_suppliers, store_search_name
+from core.utils.stock_utils import InsufficientStock, adjust_stock, decrease_stock, reserve_order_stock
+from core.utils.store_utils import STORE_CACHE_TIMEOUT, get_store_by_slug
+from core.utils.view_counter_utils import VIEWED_LIMIT, count_view, view_counters
+from core.utils.visit_tracking_utils import visit_buffer
+from core.utils.whatsapp_outbox_utils import (
+    BACKOFF_BASE, MAX_ATTEMPTS, REDACTED_MESSAGE, SENT_RETENTION, claim_due_messages, process_outbox,
+    purge_sent_messages,
+)
+from core.utils.workflow_utils import GRAPH_TTL, get_workflow_graph
+from core.views.edit_product import _save_product
+
+
+def create_store(stock=10, products=1):
+    # Row ids are reused between tests: drop content versions (workflow graphs) cached by earlier ones
+    cache.clear()
+    owner = User.objects.create(username='owner')
+    supplier = Supplier.objects.create(
+        user=owner, name='Store', store_id='store', phone='777777777',
+        city='Sanaa', country='Yemen',
+    )
+    category = ProductCategory.objects.create(category=Category.objects.create(name='c'), name='pc')
+    items = [
+        Product.objects.create(
+            supplier=supplier, category=category, name=f'p{i}', description='d',
+            price=Decimal('100'), image='p.png', stock=stock,
+        )
+        for i in range(products)
+    ]
+    return supplier, items
+
+
+class OrderSupplierBackfillTests(TestCase):
+    def test_migration_assigns_legacy_orders_to_their_first_items_store(self):
+        migration = importlib.import_module('core.migrations.0096_backfill_order_supplier')
+        supplier, (product,) = create_store()
+        other = Supplier.objects.create(
+            user=User.objects.create(username='other'), name='Other', store_id='other',
+            phone='777777777', city='Sanaa', country='Yemen',
+        )
+        other_product = Product.objects.create(
+            supplier=other, category=product.category, name='o', description='d', price=Decimal('5'), image='p.png', stock=5,
+        )
+        legacy, mixed = [Order.objects.create(user=supplier.user, total_amount=Decimal('10')) for _ in range(2)]
+        OrderItem.objects.create(order=legacy, product=other_product)
+        OrderItem.objects.create(order=mixed, product=product)
+        OrderItem.objects.create(order=mixed, product=other_product)
+
+        migration.backfill_order_supplier(apps, None)
+        self.assertEqual(
+            list(Order.objects.order_by('pk').values_list('supplier_id', flat=True)), [other.pk, supplier.pk],
+        )
+        self.assertEqual(get_order_stats(other)['total_orders'], 1)
+        self.assertEqual(get_order_stats(supplier)['total_orders'], 1)
+
+
+class SupplierRankingTests(TestCase):
+    def test_refresh_upserts_and_new_stores_are_listed(self):
+        ranked, _ = create_store()
+        self.assertEqual(refresh_supplier_rankings(), 1)
+        # Second run takes the conflict (update) path
+        self.assertEqual(refresh_supplier_rankings(), 1)
+        self.assertEqual(SupplierRanking.objects.count(), 1)
+        cache.set(RANKING_DATE_CACHE_KEY, timezone.now().date().isoformat())
+
+        # Created after today's refresh: its row is written with the store, not on commit
+        late = Supplier.objects.create(
+            user=User.objects.create(username='late'), name='Late', store_id='late',
+            phone='777777777', city='Sanaa', country='Yemen',
+        )
+        self.assertTrue(SupplierRanking.objects.filter(supplier=late).exists())
+        self.assertEqual(list(get_ranked_suppliers()), [ranked, late])
+
+    def test_upsert_has_no_conflict_target_on_mysql(self):
+        features = connection.features
+        with mock.patch.object(features, 'supports_update_conflicts_with_target', False):
+            self.assertEqual(_upsert_options(SupplierRanking), {})
+        with mock.patch.object(features, 'supports_update_conflicts_with_target', True):
+            self.assertEqual(_upsert_options(SupplierRanking), {'unique_fields': ['supplier']})
+
+
+class ContentVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_invalidates(self):
+        version = get_content_version('test')
+        self.assertEqual(get_content_version('test'), version)
+        bump_content_version('test')
+        self.assertNotEqual(get_content_version('test'), version)
+
+    @override_settings(CONTENT_VERSION_TIMEOUT=60)
+    def test_per_process_cache_versions_expire(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add, \
+                mock.patch.object(cache, 'set', wraps=cache.set) as set_:
+            get_content_version('test')
+            bump_content_version('test')
+        add.assert_called_once_with('content_version:test', mock.ANY, 60)
+        set_.assert_called_once_with('content_version:test', mock.ANY, 60)
+
+
+@override_settings(BUFFERED_WRITES_SYNC=True)
+class VisitTrackingTests(TestCase):
+    def test_visits_are_written_synchronously_in_tests(self):
+        supplier, _ = create_store()
+        before = visit_buffer.stats()
+        self.assertTrue(visit_buffer.record({
+            'url': 'http://testserver/store/', 'page_type': 'store_home', 'store_slug': supplier.store_id,
+            'visited_at': timezone.now(),
+        }))
+        self.assertIsNone(visit_buffer._worker)
+        self.assertEqual(WebsiteStatistic.objects.get().supplier, supplier)
+        after = visit_buffer.stats()
+        self.assertEqual(after['written'] - before['written'], 1)
+        self.assertEqual(after['pending'], 0)
+
+
+class StoreMembershipTests(TestCase):
+    def test_removed_manager_loses_access_once_the_membership_expires(self):
+        supplier, _ = create_store()
+        manager = User.objects.create(username='manager')
+        supplier.managing_users.add(manager)
+        session = {}
+
+        def request():
+            return type('Request', (), {'user': manager, 'session': session})()
+
+        self.assertTrue(can_manage_supplier(request(), supplier.pk))
+        # The version bump runs on commit: this worker never sees it
+        supplier.managing_users.remove(manager)
+        with self.assertNumQueries(0):
+            self.assertTrue(can_manage_supplier(request(), supplier.pk))
+        with mock.patch('core.utils.merchant_utils.time.time', return_value=time.time() + MEMBERSHIP_TTL + 1):
+            self.assertFalse(can_manage_supplier(request(), supplier.pk))
+
+
+class StoreCacheTests(TestCase):
+    def test_per_process_cache_entries_expire_with_the_content_versions(self):
+        supplier, _ = create_store()
+        for version_timeout, expected in ((None, STORE_CACHE_TIMEOUT), (60, 60)):
+            cache.clear()
+            with override_settings(CONTENT_VERSION_TIMEOUT=version_timeout), \
+                    mock.patch.object(cache, 'set', wraps=cache.set) as set_:
+                self.assertEqual(get_store_by_slug(supplier.store_id), supplier)
+            set_.assert_called_once_with(mock.ANY, supplier, expected)
+
+
+class StubWhatsAppAPI(BaseHTTPRequestHandler):
+    """Records the posted messages and answers with the queued status codes (200 once they run out)."""
+    statuses = []
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received.append(json.loads(body))
+        self.send_response(self.statuses.pop(0) if self.statuses else 200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class WhatsAppOutboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubWhatsAppAPI)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        StubWhatsAppAPI.statuses[:] = []
+        StubWhatsAppAPI.received[:] = []
+        SystemSettings.objects.update_or_create(id=1, defaults={
+            'whatsapp_api_url': f'http://127.0.0.1:{self.server.server_port}/send',
+            'whatsapp_api_key': 'key',
+        })
+        self.message = WhatsAppOutboxMessage.objects.create(phone='967777777777', message='hello')
+
+    def make_due(self):
+        WhatsAppOutboxMessage.objects.update(next_attempt_at=timezone.now())
+
+    def test_server_errors_are_retried_with_backoff(self):
+        StubWhatsAppAPI.statuses[:] = [503]
+        self.assertEqual(process_outbox()['retried'], 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), ('pending', 1))
+        self.assertIn('503', self.message.last_error)
+        delay = (self.message.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(BACKOFF_BASE * 0.8 - 5 <= delay <= BACKOFF_BASE * 1.2)
+        # Not due yet
+        self.assertEqual(process_outbox()['claimed'], 0)
+
+        self.make_due()
+        self.assertEqual(process_outbox()['sent'], 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts, self.message.last_error), ('sent', 2, ''))
+
+    def test_rejected_messages_and_exhausted_retries_are_dead_lettered(self):
+        StubWhatsAppAPI.statuses[:] = [400]
+        self.assertEqual(process_outbox()['dead'], 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), ('dead', 1))
+
+        retried = WhatsAppOutboxMessage.objects.create(phone='967777777778', message='again')
+        StubWhatsAppAPI.statuses[:] = [500] * MAX_ATTEMPTS
+        for _ in range(MAX_ATTEMPTS):
+            self.make_due()
+            process_outbox()
+        retried.refresh_from_db()
+        self.assertEqual((retried.status, retried.attempts), ('dead', MAX_ATTEMPTS))
+        self.assertEqual(len(StubWhatsAppAPI.received), 1 + MAX_ATTEMPTS)
+
+    def test_messages_are_claimed_and_delivered_once(self):
+        self.assertEqual(len(claim_due_messages(10)), 1)
+        # Leased to the first worker
+        self.assertEqual(claim_due_messages(10), [])
+        self.make_due()
+        self.assertEqual(process_outbox()['sent'], 1)
+        self.make_due()
+        self.assertEqual(process_outbox()['claimed'], 0)
+        self.assertEqual(StubWhatsAppAPI.received, [{'phone': '967777777777', 'message': 'hello'}])
+
+    def test_codes_are_redacted_once_delivered(self):
+        WhatsAppOutboxMessage.objects.all().delete()
+        notify('signup_otp', ['777777777'], {'otp': '123456'})
+        dispatch_notifications()
+        self.assertFalse(PendingNotification.objects.exists())
+        self.assertEqual(process_outbox()['sent'], 1)
+        self.assertIn('123456', StubWhatsAppAPI.received[0]['message'])
+        message = WhatsAppOutboxMessage.objects.get()
+        self.assertEqual((message.sensitive, message.message), (True, REDACTED_MESSAGE))
+
+    def test_stored_credentials_are_redacted_by_the_migration(self):
+        migration = importlib.import_module('core.migrations.0094_whatsapp_outbox_sensitive')
+        WhatsAppOutboxMessage.objects.filter(pk=self.message.pk).update(
+            message='🔹 *اسم المستخدم:* ali\n🔹 *كلمة المرور:* s3cret\n🔹 *الحالة:* قيد المراجعة', status='sent',
+        )
+        code = WhatsAppOutboxMessage.objects.create(
+            phone='967777777778', message='رمز التحقق الخاص بك هو: 123456', status='dead',
+        )
+        welcome = PendingNotification.objects.create(
+            event='merchant_welcome', phone='967777777777', context={'username': 'ali', 'password': 's3cret'},
+        )
+        migration.redact_credentials(apps, None)
+        self.message.refresh_from_db()
+        code.refresh_from_db()
+        welcome.refresh_from_db()
+        self.assertNotIn('s3cret', self.message.message)
+        self.assertIn('ali', self.message.message)
+        self.assertEqual(code.message, REDACTED_MESSAGE)
+        self.assertEqual(welcome.context, {'username': 'ali'})
+
+    def test_old_sent_messages_are_purged(self):
+        process_outbox()
+        self.assertEqual(purge_sent_messages(), 0)
+        WhatsAppOutboxMessage.objects.update(sent_at=timezone.now() - SENT_RETENTION - timedelta(minutes=1))
+        pending = WhatsAppOutboxMessage.objects.create(phone='967777777778', message='later')
+        self.assertEqual(purge_sent_messages(), 1)
+        self.assertEqual(list(WhatsAppOutboxMessage.objects.all()), [pending])
+
+
+class DecreaseStockTests(TestCase):
+    def test_takes_all_or_nothing(self):
+        _, (first, second) = create_store(stock=5, products=2)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            decrease_stock({first.pk: 2, second.pk: 6})
+
+        self.assertEqual(raised.exception.available, 5)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (5, 5))
+
+        decrease_stock({first.pk: 2, second.pk: 5})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (3, 0))
+
+    def test_update_status_decreases_stock_once(self):
+        supplier, (product,) = create_store(stock=5)
+        workflow = OrderWorkflow.objects.create(name='default')
+        pending = OrderStatus.objects.create(name='pending', slug='pending')
+        confirmed = OrderStatus.objects.create(name='confirmed', slug='confirmed')
+        WorkflowStep.objects.create(workflow=workflow, status=pending, priority=1)
+        WorkflowStep.objects.create(workflow=workflow, status=confirmed, priority=2, decrease_stock=True)
+        supplier.workflow = workflow
+        supplier.save()
+
+        order = Order.objects.create(
+            user=supplier.user, supplier=supplier, pipeline_status=pending, total_amount=Decimal('300'),
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=3)
+
+        self.assertTrue(order.update_status(confirmed)[0])
+        self.assertTrue(order.update_status(confirmed)[0])
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 2)
+        self.assertTrue(Order.objects.get(pk=order.pk).is_stock_decreased)
+
+    def test_update_status_reports_missing_stock(self):
+        supplier, (product,) = create_store(stock=1)
+        workflow = OrderWorkflow.objects.create(name='default')
+        pending = OrderStatus.objects.create(name='pending', slug='pending')
+        confirmed = OrderStatus.objects.create(name='confirmed', slug='confirmed')
+        WorkflowStep.objects.create(workflow=workflow, status=pending, priority=1)
+        WorkflowStep.objects.create(workflow=workflow, status=confirmed, priority=2, decrease_stock=True)
+        supplier.workflow = workflow
+        supplier.save()
+
+        order = Order.objects.create(
+            user=supplier.user, supplier=supplier, pipeline_status=pending, total_amount=Decimal('300'),
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=3)
+
+        success, message = order.update_status(confirmed)
+        self.assertFalse(success)
+        self.assertIn(product.name, message)
+        order.refresh_from_db()
+        self.assertEqual(order.pipeline_status, pending)
+        self.assertFalse(order.is_stock_decreased)
+
+
+class StockLedgerTests(TestCase):
+    def assertLedgerMatches(self, product):
+        product.refresh_from_db()
+        totals = product.stock_movements.aggregate(stock=Sum('stock_delta'), reserved=Sum('reserved_delta'))
+        self.assertEqual((totals['stock'] or 0, totals['reserved'] or 0), (product.stock, product.reserved))
+
+    def test_hold_commit_and_cancel(self):
+        supplier, (product,) = create_store(stock=5)
+        workflow = OrderWorkflow.objects.create(name='default')
+        pending = OrderStatus.objects.create(name='pending', slug='pending')
+        confirmed = OrderStatus.objects.create(name='confirmed', slug='confirmed')
+        cancelled = OrderStatus.objects.create(name='cancelled', slug='cancelled')
+        WorkflowStep.objects.create(workflow=workflow, status=pending, priority=1)
+        WorkflowStep.objects.create(workflow=workflow, status=confirmed, priority=2, decrease_stock=True)
+        WorkflowStep.objects.create(workflow=workflow, status=cancelled, priority=3)
+        supplier.workflow = workflow
+        supplier.save()
+
+        orders = []
+        for quantity in (3, 2):
+            order = Order.objects.create(
+                user=supplier.user, supplier=supplier, pipeline_status=pending, total_amount=Decimal('100'),
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+            reserve_order_stock(order)
+            orders.append(order)
+        first, second = orders
+
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved, product.available_stock), (5, 5, 0))
+
+        # Held units become a real decrement
+        self.assertTrue(first.update_status(confirmed)[0])
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (2, 2))
+
+        # Cancelling drops the open hold, or restocks what was taken
+        self.assertTrue(second.update_status(cancelled, reason='r')[0])
+        self.assertTrue(first.update_status(cancelled, reason='r')[0])
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (5, 0))
+        self.assertFalse(Order.objects.get(pk=first.pk).is_stock_decreased)
+        self.assertLedgerMatches(product)
+
+    def test_finished_and_deleted_orders_release_their_holds(self):
+        supplier, (product,) = create_store(stock=5)
+        pending = OrderStatus.objects.create(name='pending', slug='pending')
+        delivered = OrderStatus.objects.create(name='delivered', slug='delivered', is_terminal=True)
+        cancelled = OrderStatus.objects.create(name='cancelled', slug='cancelled', is_terminal=True)
+
+        def place(quantity):
+            order = Order.objects.create(
+                user=supplier.user, supplier=supplier, pipeline_status=pending, total_amount=Decimal('100'),
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+            reserve_order_stock(order)
+            return order
+
+        # No workflow: the terminal status ends the hold
+        self.assertTrue(place(1).update_status(delivered)[0])
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (5, 0))
+
+        # Last step of a workflow that never takes stock (only cancellation after it)
+        workflow = OrderWorkflow.objects.create(name='default')
+        shipped = OrderStatus.objects.create(name='shipped', slug='shipped')
+        for priority, status in enumerate((pending, shipped, cancelled), 1):
+            WorkflowStep.objects.create(workflow=workflow, status=status, priority=priority)
+        supplier.workflow = workflow
+        supplier.save()
+        self.assertTrue(place(2).update_status(shipped)[0])
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (5, 0))
+
+        # Deleted while still holding
+        order = place(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (5, 0))
+        self.assertLedgerMatches(product)
+
+    def test_product_edits_keep_concurrent_stock_changes(self):
+        supplier, (product,) = create_store(stock=5)
+        opened = Product.objects.get(pk=product.pk)
+        # Sold while the edit form was open
+        adjust_stock(product.pk, 2)
+
+        def submit(stock):
+            form = ProductForm({
+                'name': 'renamed', 'description': 'd', 'price': '100', 'stock': stock,
+                'category': product.category_id,
+            }, instance=opened, supplier=supplier)
+            self.assertTrue(form.is_valid(), form.errors)
+            return _save_product(type('Request', (), {'user': supplier.user})(), form, supplier)
+
+        # The form still shows 5: unchanged, so the sale is kept
+        submit(5)
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.stock), ('renamed', 2))
+
+        submit(8)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 8)
+        self.assertEqual(
+            list(product.stock_movements.order_by('id').values_list('kind', 'stock_delta')),
+            [(StockMovement.KIND_ADJUST, 5), (StockMovement.KIND_ADJUST, -3), (StockMovement.KIND_ADJUST, 6)],
+        )
+        self.assertLedgerMatches(product)
+
+
+class WorkflowGraphTests(TestCase):
+    def test_transitions_are_resolved_in_memory(self):
+        supplier, _ = create_store()
+        workflow = OrderWorkflow.objects.create(name='default')
+        statuses = [OrderStatus.objects.create(name=slug, slug=slug) for slug in ('pending', 'confirmed', 'shipped')]
+        with self.captureOnCommitCallbacks(execute=True):
+            for priority, status in enumerate(statuses[:2], start=1):
+                WorkflowStep.objects.create(workflow=workflow, status=status, priority=priority)
+        supplier.workflow = workflow
+        supplier.save()
+
+        for status in statuses[:2]:
+            Order.objects.create(user=supplier.user, supplier=supplier, pipeline_status=status, total_amount=Decimal('1'))
+        orders = list(Order.objects.select_related('supplier').order_by('id'))
+        orders[0].get_next_status()
+
+        with self.assertNumQueries(0):
+            self.assertEqual([order.get_next_status() for order in orders], [statuses[1], None])
+            self.assertEqual(orders[1].get_current_workflow_step().priority, 2)
+
+        # Adding a step invalidates the graph
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkflowStep.objects.create(workflow=workflow, status=statuses[2], priority=3)
+        self.assertEqual(orders[1].get_next_status(), statuses[2])
+
+    def test_graph_is_rebuilt_after_its_ttl_without_a_version_bump(self):
+        create_store()
+        workflow = OrderWorkflow.objects.create(name='default')
+        pending = OrderStatus.objects.create(name='pending', slug='pending')
+        WorkflowStep.objects.create(workflow=workflow, status=pending, priority=1)
+        self.assertIsNone(get_workflow_graph(workflow.pk).next_step(pending.pk))
+
+        # Bumped in another worker's cache: this one never sees it
+        shipped = OrderStatus.objects.create(name='shipped', slug='shipped')
+        WorkflowStep.objects.create(workflow=workflow, status=shipped, priority=2)
+        self.assertIsNone(get_workflow_graph(workflow.pk).next_step(pending.pk))
+        later = time.monotonic() + GRAPH_TTL + 1
+        with mock.patch('core.utils.workflow_utils.time.monotonic', return_value=later):
+            self.assertEqual(get_workflow_graph(workflow.pk).next_step(pending.pk).status, shipped)
+
+
+class BulkOrderStatusTests(TestCase):
+    def setUp(self):
+        self.supplier, (self.product,) = create_store(stock=4)
+        workflow = OrderWorkflow.objects.create(name='default')
+        self.pending = OrderStatus.objects.create(name='pending', slug='pending')
+        self.confirmed = OrderStatus.objects.create(name='confirmed', slug='confirmed')
+        self.cancelled = OrderStatus.objects.create(name='cancelled', slug='cancelled')
+        WorkflowStep.objects.create(workflow=workflow, status=self.pending, priority=1)
+        WorkflowStep.objects.create(workflow=workflow, status=self.confirmed, priority=2, decrease_stock=True)
+        WorkflowStep.objects.create(workflow=workflow, status=self.cancelled, priority=3)
+        self.supplier.workflow = workflow
+        self.supplier.save()
+
+    def create_order(self, quantity, supplier=None):
+        supplier = supplier or self.supplier
+        order = Order.objects.create(
+            user=supplier.user, supplier=supplier, pipeline_status=self.pending, total_amount=Decimal('100'),
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+        return order
+
+    def test_reports_each_order(self):
+        first, second, short = self.create_order(2), self.create_order(2), self.create_order(1)
+        other_store = Supplier.objects.create(
+            user=User.objects.create(username='other'), name='Other', store_id='other',
+            phone='777777778', city='Sanaa', country='Yemen',
+        )
+        foreign = self.create_order(1, supplier=other_store)
+
+        results = bulk_update_order_status(
+            self.supplier, [first.pk, second.pk, short.pk, foreign.pk], self.confirmed,
+        )
+
+        self.assertEqual([result['success'] for result in results], [True, True, False, False])
+        self.assertEqual(
+            list(Order.objects.filter(pk__in=[first.pk, second.pk, short.pk]).order_by('pk').values_list('pipeline_status__slug', flat=True)),
+            ['confirmed', 'confirmed', 'pending'],
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+
+    def test_cancellations_send_one_notification(self):
+        SystemSettings.objects.create(whatsapp_number='777777777')
+        orders = [self.create_order(1) for _ in range(3)]
+
+        results = bulk_update_order_status(
+            self.supplier, [order.pk for order in orders], self.cancelled, reason='r',
+        )
+
+        self.assertTrue(all(result['success'] for result in results))
+        notification = PendingNotification.objects.get()
+        self.assertEqual(notification.event, 'orders_cancelled_admin')
+        self.assertEqual(notification.context['order_ids'], [order.pk for order in orders])
+
+    def test_order_ids_are_deduplicated_and_parsing_stops_past_the_limit(self):
+        self.assertEqual(parse_order_ids(['3, 1', 3, '', '2,1']), [3, 1, 2])
+        # Never reached: the request is rejected once the limit is exceeded
+        self.assertEqual(len(parse_order_ids([','.join(map(str, range(1, 1000))), 'x'])), BULK_STATUS_LIMIT + 1)
+        with self.assertRaises(ValueError):
+            parse_order_ids('1,x')
+
+
+class CursorPaginationTests(TestCase):
+    def test_walks_ties_in_both_directions(self):
+        supplier, _ = create_store()
+        Order.objects.bulk_create([
+            Order(user=supplier.user, supplier=supplier, total_amount=Decimal('1')) for _ in range(7)
+        ])
+        # Same timestamp everywhere: the id breaks the ties
+        Order.objects.update(created_at=Order.objects.first().created_at)
+        orders = Order.objects.filter(supplier=supplier)
+        expected = list(orders.order_by('-pk').values_list('pk', flat=True))
+
+        pages, page = [], paginate_by_cursor(orders, per_page=3)
+        while True:
+            pages.append([order.pk for order in page])
+            if not page.has_next:
+                break
+            page = paginate_by_cursor(orders, after=page.next_cursor, per_page=3)
+
+        self.assertEqual(pages, [expected[0:3], expected[3:6], expected[6:]])
+        back = paginate_by_cursor(orders, before=page.previous_cursor, per_page=3)
+        self.assertEqual([order.pk for order in back], expected[3:6])
+        with self.assertRaises(ValueError):
+            paginate_by_cursor(orders, after='not-a-cursor')
+
+    def test_mobile_orders_serve_legacy_page_numbers_and_count_from_stats(self):
+        supplier, _ = create_store()
+        pending = OrderStatus.objects.create(name='pending', slug='pending')
+        for _ in range(DEFAULT_PAGE_SIZE + 2):
+            Order.objects.create(user=supplier.user, supplier=supplier, pipeline_status=pending, total_amount=1)
+        client = APIClient()
+        client.force_authenticate(supplier.user)
+        url = f'/api/merchant/orders/?merchant_id={supplier.pk}'
+
+        first = client.get(url).json()
+        second = client.get(f'{url}&page=2').json()
+        self.assertEqual((first['count'], first['num_pages']), (DEFAULT_PAGE_SIZE + 2, 2))
+        self.assertEqual(
+            [order['id'] for order in second['results']],
+            [order['id'] for order in client.get(f"{url}&cursor={first['next_cursor']}").json()['results']],
+        )
+        self.assertEqual((len(second['results']), second['has_next']), (2, False))
+        self.assertEqual(client.get(f'{url}&page=0').status_code, 400)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+
+
+class DailyOrderStatsTests(TestCase):
+    def stats_rows(self):
+        return sorted(DailyOrderStats.objects.filter(orders__gt=0).values_list('date', 'status_id', 'orders', 'amount'))
+
+    def test_counters_follow_orders_and_match_a_rebuild(self):
+        supplier, _ = create_store()
+        pending = OrderStatus.objects.create(name='pending', slug='pending')
+        confirmed = OrderStatus.objects.create(name='confirmed', slug='confirmed')
+        orders = [
+            Order.objects.create(user=supplier.user, supplier=supplier, total_amount=Decimal(amount))
+            for amount in ('10', '20', '30')
+        ]
+        orders[0].pipeline_status = confirmed
+        orders[0].save()
+        orders[1].total_amount = Decimal('25')
+        orders[1].save()
+        orders[2].delete()
+
+        stats = get_order_stats(supplier)
+        self.assertEqual(
+            (stats['total_orders'], stats['pending_orders'], stats['confirmed_orders'], stats['orders_today']),
+            (2, 1, 1, 2),
+        )
+        self.assertEqual(stats['confirmed_revenue'], Decimal('10'))
+        self.assertEqual(stats['amount_this_month'], Decimal('35'))
+
+        live = self.stats_rows()
+        self.assertIn((timezone.localdate(), pending.pk, 1, Decimal('25')), live)
+        rebuild_order_stats()
+        self.assertEqual(self.stats_rows(), live)
+
+
+class DeliveryFeeTests(TestCase):
+    def test_batch_fees_match_single_fees_with_one_query(self):
+        supplier, _ = create_store()
+        supplier.enable_delivery_fees = True
+        supplier.delivery_fee_ratio = Decimal('2.50')
+        supplier.latitude, supplier.longitude = Decimal('15.369445'), Decimal('44.191006')
+        supplier.save()
+        orders = [Order.objects.create(user=supplier.user, supplier=supplier, total_amount=Decimal('0')) for _ in range(3)]
+        for order, (lat, lon) in zip(orders, [('15.400000', '44.200000'), ('15.300000', '44.100000')]):
+            ShippingAddress.objects.create(
+                order=order, phone=777777777, address_line1='a', city='Sanaa', country='Yemen',
+                address_type='Shipping', latitude=Decimal(lat), longitude=Decimal(lon),
+            )
+
+        orders = list(Order.objects.filter(pk__in=[order.pk for order in orders]).order_by('pk'))
+        with self.assertNumQueries(1):
+            attach_delivery_fees(orders, supplier=supplier)
+        with self.assertNumQueries(0):
+            addresses = [order.get_shipping_address() for order in orders]
+
+        self.assertIsNone(addresses[2])
+        self.assertEqual(orders[2].delivery_fee, Decimal('0'))
+        for order, address in zip(orders[:2], addresses[:2]):
+            distance, fee = get_delivery_fee(supplier, address)
+            self.assertGreater(fee, 0)
+            self.assertEqual((order.delivery_distance, order.delivery_fee), (distance, fee))
+            self.assertEqual(fee, (Decimal(distance) * supplier.delivery_fee_ratio).quantize(Decimal('0.01')))
+
+
+class NearbyStoresTests(TestCase):
+    def test_prefilter_and_rank_by_distance(self):
+        origin = (15.3694, 44.1910)
+        supplier, _ = create_store()
+        stores = [supplier]
+        for i in range(1, 4):
+            owner = User.objects.create(username=f'owner{i}')
+            stores.append(Supplier.objects.create(
+                user=owner, name=f'Store {i}', store_id=f'store{i}', phone='777777777',
+                city='Sanaa', country='Yemen',
+            ))
+        # ~8 km, ~1 km, ~9 km (in the next geohash cell to the south) and ~50 km away
+        for store, (lat, lon) in zip(stores, [('15.4400', '44.1910'), ('15.3694', '44.2000'),
+                                              ('15.2900', '44.1910'), ('15.8200', '44.1910')]):
+            store.latitude, store.longitude = Decimal(lat), Decimal(lon)
+            store.save()
+        self.assertEqual(stores[1].geohash, encode_geohash(stores[1].latitude, stores[1].longitude))
+
+        nearby = get_nearby_suppliers(*origin, radius_km=10)
+        self.assertNotEqual(stores[2].geohash[:4], stores[0].geohash[:4])
+        self.assertEqual([pk for pk, _ in nearby], [stores[1].pk, stores[0].pk, stores[2].pk])
+
+        response = self.client.get('/api/stores/nearby/', {'lat': origin[0], 'lng': origin[1], 'radius': 60})
+        data = response.json()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual([row['id'] for row in data['results']], [stores[i].pk for i in (1, 0, 2, 3)])
+        self.assertLess(data['results'][0]['distance_km'], data['results'][1]['distance_km'])
+        self.assertEqual(self.client.get('/api/stores/nearby/', {'lat': 'x'}).status_code, 400)
+        for radius in ('nan', 'inf'):
+            response = self.client.get('/api/stores/nearby/', {'lat': origin[0], 'lng': origin[1], 'radius': radius})
+            self.assertEqual(response.status_code, 400)
+
+    def test_migration_fills_the_same_geohashes(self):
+        migration = importlib.import_module('core.migrations.0092_supplier_geohash')
+        supplier, _ = create_store()
+        Supplier.objects.filter(pk=supplier.pk).update(latitude=Decimal('15.3694'), longitude=Decimal('-44.191'))
+        migration.fill_geohashes(apps, None)
+        supplier.refresh_from_db()
+        self.assertEqual(supplier.geohash, encode_geohash(15.3694, -44.191))
+
+
+@override_settings(BUFFERED_WRITES_SYNC=True)
+class ProductSearchTests(TestCase):
+    def names(self, query):
+        _, products = search_products(query)
+        return [product.name for product in products]
+
+    def test_arabic_normalization_ranking_and_incremental_updates(self):
+        self.assertEqual(normalize_text('إِسْـتِشَارَة'), 'استشاره')
+        supplier, (in_name, in_description) = create_store(products=2)
+        in_name.name, in_name.description = 'هاتف ذكي', 'جهاز'
+        in_name.save()
+        in_description.name, in_description.description = 'غطاء', 'حمايه مناسبة لجهاز الهاتف الذكيّ'
+        in_description.save()
+
+        # Name matches rank first; diacritics, ta marbuta and the definite article are folded
+        self.assertEqual(self.names('هاتف'), ['هاتف ذكي', 'غطاء'])
+        self.assertEqual(self.names('الهاتف الذكي'), ['هاتف ذكي', 'غطاء'])
+        self.assertEqual(self.names('ذكي حماية'), ['غطاء'])
+        self.assertEqual(self.names('ذكي شاحن'), [])
+
+        supplier.name = 'مكتبة الأمل'
+        supplier.save()
+        self.assertEqual([store.pk for store in search_suppliers('امل')], [supplier.pk])
+        in_name.name = 'شاحن'
+        in_name.save()
+        self.assertEqual(self.names('هاتف'), ['غطاء'])
+
+        # base.html needs the site settings and the Google login app
+        SystemSettings.objects.create()
+        SocialApp.objects.create(provider='google', name='google', client_id='id', secret='secret').sites.add(
+            Site.objects.get_current()
+        )
+        response = self.client.get('/search/', {'q': 'غطاء'})
+        self.assertContains(response, 'غطاء')
+        data = self.client.get('/api/products/search/', {'q': 'شاحن'}).json()
+        self.assertEqual((data['count'], data['results'][0]['id']), (1, in_name.pk))
+
+    def test_migration_builds_the_same_product_terms(self):
+        migration = importlib.import_module('core.migrations.0093_product_search_index')
+        supplier, (product,) = create_store()
+        product.name, product.description = 'الهاتف الذكيّ ٣', 'غطاء حماية للهاتف'
+        product.save()
+        expected = set(SearchTerm.objects.values_list('term', 'field', 'weight'))
+        SearchTerm.objects.all().delete()
+        migration.build_search_index(apps, None)
+        self.assertEqual(set(SearchTerm.objects.values_list('term', 'field', 'weight')), expected)
+
+
+class StoreSearchTests(TestCase):
+    def test_stores_are_found_by_name_whatever_their_catalogue(self):
+        stores = []
+        for i, name in enumerate(['مكتبة الأملاك', 'مكتبة الأمل', 'متجر النور']):
+            stores.append(Supplier.objects.create(
+                user=User.objects.create(username=f'owner{i}'), name=name, store_id=f'store{i}',
+                phone='777777777', city='Sanaa', country='Yemen',
+            ))
+        # No products anywhere; the whole word "امل" beats the prefix of "املاك"
+        self.assertEqual([store.pk for store in search_suppliers('الامل')], [stores[1].pk, stores[0].pk])
+        self.assertEqual([store.pk for store in search_suppliers('مكتبه امل')], [stores[1].pk, stores[0].pk])
+        self.assertEqual(search_suppliers('نور مكتبة'), [])
+
+        stores[2].name = 'مكتبة النور'
+        stores[2].save(update_fields=['name'])
+        self.assertEqual([store.pk for store in search_suppliers('نور مكتبة')], [stores[2].pk])
+
+    def test_migration_fills_the_same_search_names(self):
+        migration = importlib.import_module('core.migrations.0095_supplier_search_name')
+        supplier, _ = create_store()
+        Supplier.objects.filter(pk=supplier.pk).update(name='مَكتبة الأمل ٣', search_name='')
+        migration.fill_search_names(apps, None)
+        supplier.refresh_from_db()
+        self.assertEqual(supplier.search_name, store_search_name('مَكتبة الأمل ٣'))
+
+
+@override_settings(BUFFERED_WRITES_SYNC=True)
+class ViewCounterTests(TestCase):
+    def test_views_are_counted_once_per_session(self):
+        supplier, (product,) = create_store()
+        request = type('Request', (), {'session': {'visited_products': [1, 2, 3]}})()
+
+        self.assertTrue(count_view(request, supplier))
+        self.assertTrue(count_view(request, product))
+        self.assertFalse(count_view(request, product))
+        self.assertNotIn('visited_products', request.session)
+        supplier.refresh_from_db()
+        product.refresh_from_db()
+        self.assertEqual((supplier.views_count, product.views_count), (1, 1))
+
+    @override_settings(BUFFERED_WRITES_SYNC=False)
+    def test_buffered_views_are_written_in_one_update_per_model(self):
+        supplier, products = create_store(products=2)
+        # Flushed by hand instead of the worker thread
+        with mock.patch.object(view_counters, '_ensure_worker'):
+            for viewed in (supplier, *products, products[0]):
+                count_view(type('Request', (), {'session': {}})(), viewed)
+        supplier.refresh_from_db()
+        self.assertEqual(supplier.views_count, 0)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(view_counters.flush(), 4)
+        supplier.refresh_from_db()
+        self.assertEqual(supplier.views_count, 1)
+        self.assertEqual(
+            sorted(Product.objects.values_list('views_count', flat=True)), [1, 2],
+        )
+
+    def test_session_list_is_bounded(self):
+        request = type('Request', (), {'session': {}})()
+        for pk in range(1, VIEWED_LIMIT + 11):
+            count_view(request, Product(pk=pk))
+        self.assertEqual(len(request.session['viewed']), VIEWED_LIMIT)
+        self.assertEqual(request.session['viewed'][0], 'p11')
+        # Fell out of the window: counted again
+        self.assertTrue(count_view(request, Product(pk=1)))
+
+
+class ConcurrentStockTests(TransactionTestCase):
+    THREADS = 20
+
+    def test_concurrent_decrements_never_oversell(self):
+        _, (product,) = create_store(stock=7)
+        start = threading.Barrier(self.THREADS)
+        results = []
+        lock = threading.Lock()
+
+        def buy():
+            try:
+                start.wait()
+                outcome = 'failed'
+                for _ in range(200):
+                    try:
+                        decrease_stock({product.pk: 1})
+                        outcome = 'sold'
+                        break
+                    except InsufficientStock:
+                        outcome = 'refused'
+                        break
+                    except OperationalError:
+                        # SQLite fails concurrent writers instead of queueing them
+                        time.sleep(0.005)
+                with lock:
+                    results.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count('sold'), 7)
+        self.assertEqual(results.count('refused'), self.THREADS - 7)
+        self.assertEqual(product.stock, 0)
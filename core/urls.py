@@ -16,6 +16,7 @@ from core.views.AddReview import AddReviewView
 from core.views.ProductListView import product_list
 from core.views.ConvertCartToOrder import checkout_select_address_or_custom_address
 from core.views.SuppliersListView import SuppliersListView
+from core.views.ProductSearchView import product_search
 from core.views.add_to_wish_list import toggle_wishlist, get_wishlist_status
 from core.views.MyMerchant import my_merchant, update_merchant_settings, merchant_products, merchant_marketing, merchant_analytics, merchant_tutorial, quick_update_stock
 from core.views.agree_to_terms import agree_to_terms
@@ -25,7 +26,7 @@ from core.views.add_product_offer import add_product_offer
 from core.views.edit_product_offer import edit_product_offer
 from core.views.add_ads import add_ads
 from core.views.edit_ads import edit_ads
-from core.views.MerchantOrderManagement import merchant_orders, merchant_order_detail, update_order_status, add_order_note, add_payment_reference, merchant_order_quick_view, update_order_status_ajax
+from core.views.MerchantOrderManagement import merchant_orders, merchant_order_detail, update_order_status, add_order_note, add_payment_reference, merchant_order_quick_view, update_order_status_ajax, bulk_update_order_status_ajax
 from core.views.category_views import add_category_ajax
 from core.views.delete_product import toggle_product_status
 from core.views.toggle_ad_status import toggle_ad_status
@@ -55,6 +56,7 @@ urlpatterns = [
     path('products/category/product_list_subcategory/<int:subcategory_id>/<str:store_id>/', product_list, name='product_list_subcategory'),
     path('<str:store_id>/details/<int:pk>/', product_detail, name='product_detail'),
     path('stores', SuppliersListView, name='suppliers_list'),
+    path('search/', product_search, name='product_search'),
     path('join-business/', join_business, name='join_business'),
     path('verify-signup-otp/', verify_signup_otp, name='verify_signup_otp'),
     # ==========================
@@ -157,6 +159,7 @@ urlpatterns = [
     path('add-payment-reference/<int:order_id>/', add_payment_reference, name='add_payment_reference'),
     path('merchant-order-quick-view/<int:order_id>/', merchant_order_quick_view, name='merchant_order_quick_view'),
     path('update-order-status-ajax/<int:order_id>/', update_order_status_ajax, name='update_order_status_ajax'),
+    path('bulk-update-order-status-ajax/', bulk_update_order_status_ajax, name='bulk_update_order_status_ajax'),
 
     # Tour API
     path('api/tour-complete/', mark_tour_complete, name='tour_complete'),
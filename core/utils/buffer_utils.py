@@ -0,0 +1,139 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """
+    Bounded in-process buffer of rows to write, drained by a background
+    thread in batches. Subclasses implement `write(items)`.
+
+    `record()` never blocks the request: when the buffer is full the item is
+    dropped and counted. The worker writes every `batch_size` items or
+    `flush_interval` seconds, whichever comes first, and whatever is left is
+    flushed when the process exits (register `shutdown` with atexit).
+
+    With BUFFERED_WRITES_SYNC (turned on by the tests) no thread is started
+    and each item is written by `record()` itself, on the caller's
+    connection.
+    """
+
+    name = 'write-buffer'
+
+    def __init__(self, max_size=10000, batch_size=200, flush_interval=2.0):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._stop = threading.Event()
+        self._worker = None
+        self._pid = os.getpid()
+        self.counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'flushes': 0}
+
+    def write(self, items):
+        raise NotImplementedError
+
+    def _count(self, counter, amount=1):
+        # Bumped from request threads and the worker alike
+        with self._counters_lock:
+            self.counters[counter] += amount
+            return self.counters[counter]
+
+    def record(self, item):
+        """Queue an item for `write()`. Returns False if it was dropped."""
+        if getattr(settings, 'BUFFERED_WRITES_SYNC', False):
+            self._count('enqueued')
+            self._write([item])
+            return True
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            dropped = self._count('dropped')
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning("%s full (%s items), %s items dropped so far", self.name, self.max_size, dropped)
+            return False
+        self._count('enqueued')
+        return True
+
+    def stats(self):
+        with self._counters_lock:
+            return dict(self.counters, pending=self._queue.qsize())
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked (e.g. gunicorn --preload): the parent's thread didn't survive
+                self._reset()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                # Drop connections that outlived CONN_MAX_AGE or broke since the last flush
+                close_old_connections()
+                self._write(batch)
+        close_old_connections()
+
+    def _collect(self):
+        """Block until a full batch is queued or `flush_interval` has passed."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _write(self, items):
+        try:
+            self.write(items)
+            self._count('written', len(items))
+        except Exception:
+            self._count('failed', len(items))
+            logger.exception("%s failed to write %s buffered items", self.name, len(items))
+        finally:
+            self._count('flushes')
+
+    def flush(self):
+        """Synchronously write everything currently queued. Returns the number of items."""
+        items = self._drain()
+        for start in range(0, len(items), self.batch_size):
+            self._write(items[start:start + self.batch_size])
+        return len(items)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the worker and flush the remaining items (registered with atexit)."""
+        self._stop.set()
+        if self._worker is not None and self._pid == os.getpid():
+            self._worker.join(timeout)
+        self.flush()
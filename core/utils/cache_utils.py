@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+HOME_CONTENT = 'home'
+CATEGORIES_CONTENT = 'categories'
+
+
+def _version_timeout():
+    # None (never expires) on a shared backend, seconds on a per-process one
+    return getattr(settings, 'CONTENT_VERSION_TIMEOUT', None)
+
+
+def _version_key(namespace):
+    return f'content_version:{namespace}'
+
+
+def get_content_version(namespace):
+    """
+    Current version of a cached content namespace. Cache keys built with it
+    go stale as soon as `bump_content_version` is called, or when the
+    version key expires (CONTENT_VERSION_TIMEOUT).
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # Another process may have initialised it in the meantime
+        if not cache.add(key, version, _version_timeout()):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_content_version(namespace):
+    """Invalidate everything cached under `namespace`."""
+    cache.set(_version_key(namespace), time.time_ns(), _version_timeout())
+
+
+def store_content(supplier_id):
+    """Namespace of everything cached for one storefront."""
+    return f'store:{supplier_id}'
+
+
+def membership_content(user_id):
+    """Namespace of a user's store membership (owned and managed stores)."""
+    return f'supplier_membership:{user_id}'
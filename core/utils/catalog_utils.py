@@ -0,0 +1,106 @@
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from core.utils.cache_utils import CATEGORIES_CONTENT, get_content_version, store_content
+from core.utils.offer_utils import resolve_active_offers
+from core.utils.stock_utils import available_stock_q
+
+# Upper bound only: catalog edits bump the store version right away
+STORE_CATALOG_TIMEOUT = 60 * 60 * 6
+
+
+def build_store_catalog(supplier, category_id=None, subcategory_id=None, on_date=None):
+    """
+    Build the user independent part of a storefront page: the partitioned
+    offer/new/other product lists, the category tree and the store ads.
+    """
+    from core.models import Category, ProductCategory, ProductOffer, Product, SupplierAds
+
+    on_date = on_date or timezone.now().date()
+
+    active_offers = ProductOffer.objects.filter(
+        product=OuterRef('pk'),
+        is_active=True,
+        from_date__lte=on_date,
+        to_date__gte=on_date
+    )
+
+    queryset = Product.objects.filter(supplier=supplier, is_active=True).annotate(
+        has_active_offer=Exists(active_offers),
+        max_discount=Subquery(
+            active_offers.order_by('-discount_precentage').values('discount_precentage')[:1]
+        )
+    ).select_related('category').prefetch_related('additional_images')
+
+    # Filter out out-of-stock products if supplier preference is set
+    if not supplier.show_out_of_stock:
+        queryset = queryset.filter(available_stock_q())
+
+    # Filter by category or subcategory
+    if subcategory_id:
+        queryset = queryset.filter(category_id=subcategory_id)
+    elif category_id:
+        queryset = queryset.filter(category__id=category_id)
+
+    products = list(queryset.order_by('-has_active_offer', '-max_discount', '-is_new', '-id'))
+    # Resolve every card's offer/price/percentage in one query
+    resolve_active_offers(products, on_date)
+
+    offer_products = []
+    new_products = []
+    other_products = []
+    for product in products:
+        if product.has_active_offer:
+            offer_products.append(product)
+        elif product.is_new:
+            new_products.append(product)
+        else:
+            other_products.append(product)
+
+    categories = list(
+        Category.objects.filter(productcategory__products__supplier=supplier).distinct()
+        .prefetch_related('productcategory_set')
+    )
+    product_categories = None
+    if category_id:
+        product_categories = list(
+            ProductCategory.objects.filter(category_id=category_id, products__supplier=supplier).distinct()
+        )
+
+    return {
+        'products': products,
+        'offer_products': offer_products,
+        'new_products': new_products,
+        'other_products': other_products,
+        'categories': categories,
+        'product_categories': product_categories,
+        'supplier_ads': list(SupplierAds.objects.filter(supplier=supplier, is_active=True)),
+    }
+
+
+def get_store_catalog(supplier, category_id=None, subcategory_id=None):
+    """
+    Cached `build_store_catalog`. Entries are keyed by the store's content
+    version (bumped by core.signals when its products, offers, images or ads
+    change), the shared category version and the date, since offers start
+    and expire by date.
+
+    Every call returns fresh instances, so callers may decorate them with
+    per-user data (cart quantities...) without affecting other visitors.
+    """
+    today = timezone.now().date()
+    cache_key = 'store_catalog:{}:{}:{}:{}:{}:{}:{}'.format(
+        supplier.pk,
+        get_content_version(store_content(supplier.pk)),
+        get_content_version(CATEGORIES_CONTENT),
+        today.isoformat(),
+        int(supplier.show_out_of_stock),
+        category_id or '',
+        subcategory_id or '',
+    )
+    catalog = cache.get(cache_key)
+    if catalog is None:
+        catalog = build_store_catalog(supplier, category_id, subcategory_id, today)
+        cache.set(cache_key, catalog, STORE_CATALOG_TIMEOUT)
+    return catalog
@@ -0,0 +1,99 @@
+from decimal import Decimal
+from functools import lru_cache
+
+from core.utils.geo_utils import distances_km
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+
+def _coordinates(obj):
+    """(latitude, longitude) of anything with those fields, or None if one is missing."""
+    if obj is None or obj.latitude is None or obj.longitude is None:
+        return None
+    return obj.latitude, obj.longitude
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate the great circle distance between two points in km"""
+    if not all([lat1, lon1, lat2, lon2]):
+        return None
+    return distances_km((float(lat1), float(lon1)), [(float(lat2), float(lon2))])[0]
+
+
+def _fee(distance, ratio):
+    return (Decimal(distance) * ratio).quantize(CENT)
+
+
+@lru_cache(maxsize=4096)
+def _delivery_fee(origin, destination, ratio):
+    # Keyed by the coordinates and the ratio themselves, so an edited store or
+    # address simply misses the cache: nothing to invalidate
+    distance = calculate_distance(*origin, *destination)
+    if not distance:
+        return None, ZERO
+    return distance, _fee(distance, ratio)
+
+
+def get_delivery_fee(supplier, address):
+    """
+    Return (distance_km, fee) for delivering from `supplier` to `address`
+    (anything with latitude/longitude: Address, ShippingAddress).
+    The fee is 0 when delivery fees are disabled or coordinates are missing.
+    Results are memoized per (store, address) coordinates and fee ratio.
+    """
+    if not supplier or not supplier.enable_delivery_fees:
+        return None, ZERO
+    origin, destination = _coordinates(supplier), _coordinates(address)
+    if not origin or not destination:
+        return None, ZERO
+    return _delivery_fee(origin, destination, supplier.delivery_fee_ratio or ZERO)
+
+
+def get_delivery_fees(supplier, addresses):
+    """
+    Batch form of `get_delivery_fee`: (distance_km, fee) for each address,
+    in order, with the store's side of the computation done once.
+    """
+    results = [(None, ZERO)] * len(addresses)
+    origin = _coordinates(supplier) if supplier and supplier.enable_delivery_fees else None
+    if not origin or not all(origin):
+        return results
+
+    located = [(i, _coordinates(address)) for i, address in enumerate(addresses)]
+    located = [(i, point) for i, point in located if point and all(point)]
+    ratio = supplier.delivery_fee_ratio or ZERO
+    origin = (float(origin[0]), float(origin[1]))
+    distances = distances_km(origin, [(float(lat), float(lon)) for _, (lat, lon) in located])
+    for (i, _), distance in zip(located, distances):
+        if distance:
+            results[i] = (distance, _fee(distance, ratio))
+    return results
+
+
+def attach_delivery_fees(orders, supplier=None):
+    """
+    Set `delivery_distance` and `delivery_fee` on each order of a list,
+    loading all their shipping addresses with a single query. The addresses
+    are kept on the orders, so `order.get_shipping_address()` and pricing
+    summaries don't query again. Pass `supplier` when every order belongs
+    to that store, otherwise each order's own store is used.
+    """
+    from core.models import ShippingAddress
+
+    orders = list(orders)
+    addresses = {}
+    for address in ShippingAddress.objects.filter(order__in=orders).order_by('pk'):
+        addresses.setdefault(address.order_id, address)
+
+    by_supplier = {}
+    for order in orders:
+        order._shipping_address = addresses.get(order.pk)
+        by_supplier.setdefault(order.supplier_id, []).append(order)
+
+    for supplier_id, group in by_supplier.items():
+        store = supplier if supplier is not None else (group[0].supplier if supplier_id else None)
+        fees = get_delivery_fees(store, [order._shipping_address for order in group])
+        for order, (distance, fee) in zip(group, fees):
+            order.delivery_distance, order.delivery_fee = distance, fee
+    return orders
@@ -0,0 +1,128 @@
+import math
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32
+
+GEOHASH_PRECISION = 9  # ~5 m cells, stored on Supplier.geohash
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Sorts after every geohash character: `prefix <= geohash < prefix + END` is a prefix match
+GEOHASH_PREFIX_END = '{'
+# Upper bound of geohash prefixes OR-ed into one proximity query
+MAX_PREFIXES = 16
+
+
+def distances_km(origin, destinations):
+    """
+    Great circle distances in km from `origin` to each of `destinations`
+    ((lat, lon) float pairs). The origin's trigonometry is computed once.
+    """
+    lat1, lon1 = math.radians(origin[0]), math.radians(origin[1])
+    cos_lat1 = math.cos(lat1)
+    distances = []
+    for lat, lon in destinations:
+        lat2, lon2 = math.radians(lat), math.radians(lon)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        distances.append(EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
+    return distances
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point; nearby points share a prefix, so a B-tree index can range-scan them."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """(height, width) in degrees of a geohash cell."""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def _steps(low, high, step):
+    """Points from `low` to `high`, at most `step` apart, so every cell in between is sampled."""
+    points = []
+    while low < high:
+        points.append(low)
+        low += step
+    points.append(high)
+    return points
+
+
+def geohash_prefixes(latitude, longitude, radius_km):
+    """
+    Geohash prefixes whose cells cover the bounding box of a circle, at the
+    finest precision that needs no more than MAX_PREFIXES of them.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if dlon >= 180:
+        min_lon, max_lon = -180.0, 180.0
+
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(candidate)
+        rows = math.ceil((max_lat - min_lat) / height) + 1
+        cols = math.ceil((max_lon - min_lon) / width) + 1
+        if rows * cols <= MAX_PREFIXES:
+            precision = candidate
+            break
+
+    height, width = _cell_size(precision)
+    prefixes = set()
+    for lat in _steps(min_lat, max_lat, height):
+        for lon in _steps(min_lon, max_lon, width):
+            # Wrap across the antimeridian
+            prefixes.add(encode_geohash(lat, (lon + 180.0) % 360.0 - 180.0, precision))
+    return sorted(prefixes)
+
+
+def get_nearby_suppliers(latitude, longitude, radius_km, queryset=None):
+    """
+    [(supplier_id, distance_km)] of the stores within `radius_km`, nearest
+    first. Candidates come from a geohash prefix scan of the index (no
+    spatial extension needed); the exact distance then filters and ranks them.
+
+    Each prefix is matched as a range rather than `startswith`, which MySQL
+    compiles to `LIKE BINARY` and can't serve from the column's index.
+    """
+    from django.db.models import Q
+    from core.models import Supplier
+
+    suppliers = Supplier.objects.all() if queryset is None else queryset
+    in_cells = Q()
+    for prefix in geohash_prefixes(latitude, longitude, radius_km):
+        in_cells |= Q(geohash__gte=prefix, geohash__lt=prefix + GEOHASH_PREFIX_END)
+    candidates = list(
+        suppliers.filter(in_cells, latitude__isnull=False, longitude__isnull=False)
+        .values_list('pk', 'latitude', 'longitude').order_by()
+    )
+
+    origin = (float(latitude), float(longitude))
+    distances = distances_km(origin, [(float(lat), float(lon)) for _, lat, lon in candidates])
+    nearby = [
+        (pk, distance)
+        for (pk, _, _), distance in zip(candidates, distances)
+        if distance <= radius_km
+    ]
+    nearby.sort(key=lambda row: (row[1], row[0]))
+    return nearby
@@ -1,8 +1,82 @@
+import time
+
+from django.conf import settings
+from django.db.models import Q
 from core.models import Supplier
+from core.utils.cache_utils import get_content_version, membership_content
 import logging
 
 logger = logging.getLogger("core.utils.merchant_utils")
 
+# Session key of the validated store membership, see get_supplier_membership()
+MEMBERSHIP_SESSION_KEY = 'supplier_membership'
+# Seconds a validated membership is trusted, even if no version bump reached this worker
+MEMBERSHIP_TTL = getattr(settings, 'STORE_MEMBERSHIP_TTL', 60)
+
+
+def get_manageable_suppliers(request):
+    """
+    Stores the user owns or manages, the owned store first.
+    One query, memoized on the request.
+    """
+    if '_manageable_suppliers' not in request.__dict__:
+        user = request.user
+        suppliers = list(
+            Supplier.objects.filter(Q(user=user) | Q(managing_users=user)).distinct().order_by('pk')
+        )
+        suppliers.sort(key=lambda supplier: supplier.user_id != user.pk)
+        request._manageable_suppliers = suppliers
+    return request._manageable_suppliers
+
+
+def get_supplier_membership(request):
+    """
+    Ids of the stores the user can manage: {'ids': [...], 'owned_id': id or None}.
+
+    Validated once and kept in the session; it is rebuilt when the user's
+    membership version changes (ownership or managers edited), and at least
+    every MEMBERSHIP_TTL seconds in case the bump went to another worker's
+    cache.
+    """
+    if '_supplier_membership' in request.__dict__:
+        return request._supplier_membership
+
+    version = get_content_version(membership_content(request.user.pk))
+    membership = request.session.get(MEMBERSHIP_SESSION_KEY)
+    if (
+        not membership
+        or membership.get('version') != version
+        or time.time() - membership.get('checked_at', 0) > MEMBERSHIP_TTL
+    ):
+        suppliers = get_manageable_suppliers(request)
+        membership = {
+            'version': version,
+            'checked_at': time.time(),
+            'ids': [supplier.pk for supplier in suppliers],
+            'owned_id': next((s.pk for s in suppliers if s.user_id == request.user.pk), None),
+        }
+        request.session[MEMBERSHIP_SESSION_KEY] = membership
+
+    request._supplier_membership = membership
+    return membership
+
+
+def can_manage_supplier(request, supplier_id):
+    try:
+        supplier_id = int(supplier_id)
+    except (TypeError, ValueError):
+        return False
+    return request.user.is_superuser or supplier_id in get_supplier_membership(request)['ids']
+
+
+def _get_supplier(request, supplier_id):
+    # Reuse the membership query when this request already ran it
+    for supplier in request.__dict__.get('_manageable_suppliers', ()):
+        if supplier.pk == supplier_id:
+            return supplier
+    return Supplier.objects.filter(id=supplier_id).first()
+
+
 def get_active_supplier(request):
     """
     Get the active supplier for the current request.
@@ -11,10 +85,19 @@ def get_active_supplier(request):
     2. Session active_supplier_id
     3. User's own supplier
     4. User's first managed supplier
+
+    Resolved once per request: the decorator, the view and the context
+    processor share the result.
     """
     if not request.user.is_authenticated:
         return None
 
+    if '_active_supplier' not in request.__dict__:
+        request._active_supplier = _resolve_active_supplier(request)
+    return request._active_supplier
+
+
+def _resolve_active_supplier(request):
     # For superusers checking out a specific supplier
     if request.user.is_superuser:
         supplier_id = request.POST.get('supplier_id') or request.GET.get('supplier_id')
@@ -24,31 +107,22 @@ def get_active_supplier(request):
                 logger.info(f"Superuser {request.user} override: active_supplier set to {supplier.name} via request param")
                 return supplier
 
+    membership = get_supplier_membership(request)
+
     # Check session
     active_supplier_id = request.session.get('active_supplier_id')
-    if active_supplier_id:
-        supplier = Supplier.objects.filter(id=active_supplier_id).first()
+    if active_supplier_id and can_manage_supplier(request, active_supplier_id):
+        supplier = _get_supplier(request, active_supplier_id)
         if supplier:
-            is_owner = getattr(supplier, 'user', None) == request.user
-            is_manager = supplier.managing_users.filter(id=request.user.id).exists()
-            if request.user.is_superuser or is_owner or is_manager:
-                logger.debug(f"Active supplier {supplier.name} resolved from session for user {request.user}")
-                return supplier
+            logger.debug(f"Active supplier {supplier.name} resolved from session for user {request.user}")
+            return supplier
 
-    try:
-        if hasattr(request.user, 'supplier') and request.user.supplier:
-            logger.debug(f"Active supplier {request.user.supplier.name} resolved from user ownership")
-            return request.user.supplier
-    except Supplier.DoesNotExist:
-        pass
-    except AttributeError:
-        pass
-
-    # Fallback to first managed supplier
-    managed_supplier = request.user.managed_suppliers.first()
-    if managed_supplier:
-        logger.debug(f"Active supplier {managed_supplier.name} resolved from first managed_supplier for user {request.user}")
-        return managed_supplier
+    # Own supplier first, then the first managed one
+    for supplier_id in membership['ids']:
+        supplier = _get_supplier(request, supplier_id)
+        if supplier:
+            logger.debug(f"Active supplier {supplier.name} resolved from store membership for user {request.user}")
+            return supplier
 
     logger.debug(f"No active supplier could be resolved for user {request.user}")
     return None
@@ -0,0 +1,128 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.utils.settings_utils import get_system_settings
+from core.utils.whatsapp_outbox_utils import lock_unclaimed
+from core.utils.whatsapp_utils import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# Recipient placeholder resolved to SystemSettings.whatsapp_number
+ADMIN_RECIPIENT = 'admin'
+PLATFORM_SUPPORT_PHONE = '779923330'
+
+# Events that should not wait for the digest window (codes, confirmations)
+IMMEDIATE_EVENTS = frozenset(['order_placed_customer', 'merchant_welcome', 'signup_otp'])
+# Events whose outbox message is redacted once delivered (never digested: see IMMEDIATE_EVENTS)
+SENSITIVE_EVENTS = frozenset(['signup_otp'])
+# How long a recipient's digestible events are collected before one message goes out
+DIGEST_WINDOW = timedelta(seconds=getattr(settings, 'NOTIFICATION_DIGEST_WINDOW', 120))
+DISPATCH_BATCH_SIZE = 500
+
+# Serialises dispatch between the threads of one process (see _claim_lock in the outbox)
+_dispatch_lock = threading.Lock()
+
+
+def _resolve_recipients(recipients):
+    phones = []
+    for recipient in recipients:
+        if recipient == ADMIN_RECIPIENT:
+            system_settings = get_system_settings()
+            recipient = system_settings.whatsapp_number if system_settings else None
+        phone = normalize_phone(recipient) if recipient else None
+        if not phone:
+            logger.warning(f"Notification: skipping invalid recipient '{recipient}'.")
+        elif phone not in phones:
+            phones.append(phone)
+    return phones
+
+
+def notify(event, recipients, context):
+    """
+    Queue `event` for each recipient (phone numbers or ADMIN_RECIPIENT).
+
+    Costs one INSERT: recipients are normalized and deduplicated, and the
+    message is rendered later by the dispatcher from
+    `notifications/<event>.txt`. `context` must be JSON serializable.
+    Returns the number of notifications queued.
+    """
+    from core.models import PendingNotification
+
+    phones = _resolve_recipients(recipients)
+    if not phones:
+        return 0
+
+    digest = event not in IMMEDIATE_EVENTS
+    PendingNotification.objects.bulk_create([
+        PendingNotification(event=event, phone=phone, context=context, digest=digest)
+        for phone in phones
+    ])
+    transaction.on_commit(_wake_dispatcher)
+    return len(phones)
+
+
+def _wake_dispatcher():
+    from core.utils.whatsapp_outbox_utils import wake_outbox_workers
+    wake_outbox_workers()
+
+
+def render_notification(notification):
+    return render_to_string(f'notifications/{notification.event}.txt', notification.context).strip()
+
+
+def render_digest(notifications):
+    if len(notifications) == 1:
+        return render_notification(notifications[0])
+    return render_to_string('notifications/digest.txt', {
+        'messages': [render_notification(notification) for notification in notifications],
+    }).strip()
+
+
+def dispatch_notifications(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Move due notifications into the WhatsApp outbox and delete them.
+
+    Immediate events go out one message each. A recipient's other events
+    wait until the oldest of them is DIGEST_WINDOW old and then go out as
+    a single digest. Returns the number of outbox messages queued.
+    """
+    from core.models import PendingNotification, WhatsAppOutboxMessage
+
+    now = timezone.now()
+    with _dispatch_lock, transaction.atomic():
+        pending = list(
+            lock_unclaimed(PendingNotification.objects.all())
+            .order_by('created_at', 'id')[:batch_size]
+        )
+        by_phone = defaultdict(list)
+        for notification in pending:
+            by_phone[notification.phone].append(notification)
+
+        outbox, dispatched = [], []
+        for phone, notifications in by_phone.items():
+            for notification in notifications:
+                if not notification.digest:
+                    outbox.append(WhatsAppOutboxMessage(
+                        phone=phone, message=render_notification(notification),
+                        sensitive=notification.event in SENSITIVE_EVENTS,
+                    ))
+                    dispatched.append(notification.pk)
+
+            digest = [notification for notification in notifications if notification.digest]
+            if digest and digest[0].created_at <= now - DIGEST_WINDOW:
+                outbox.append(WhatsAppOutboxMessage(phone=phone, message=render_digest(digest)))
+                dispatched.extend(notification.pk for notification in digest)
+
+        if outbox:
+            WhatsAppOutboxMessage.objects.bulk_create(outbox)
+            PendingNotification.objects.filter(pk__in=dispatched).delete()
+            transaction.on_commit(_wake_dispatcher)
+            logger.info(f"Dispatched {len(dispatched)} notifications as {len(outbox)} WhatsApp messages")
+    return len(outbox)
@@ -0,0 +1,62 @@
+from django.utils import timezone
+
+
+def get_active_offers_map(product_ids, on_date=None):
+    """
+    Return a {product_id: ProductOffer} dict of the active offer for each
+    product on `on_date` (defaults to today), using a single query.
+
+    When a product has several active offers the lowest id wins, which is
+    what `ProductOffer.objects.filter(...).first()` used to return.
+    """
+    from core.models import ProductOffer
+
+    product_ids = {pid for pid in product_ids if pid is not None}
+    if not product_ids:
+        return {}
+
+    on_date = on_date or timezone.now().date()
+    offers = ProductOffer.objects.filter(
+        product_id__in=product_ids,
+        is_active=True,
+        from_date__lte=on_date,
+        to_date__gte=on_date
+    ).order_by('product_id', 'id')
+
+    offers_map = {}
+    for offer in offers:
+        offers_map.setdefault(offer.product_id, offer)
+    return offers_map
+
+
+def resolve_active_offers(products, on_date=None):
+    """
+    Pre-resolve the active offer of every product in `products` (a list,
+    any iterable or a QuerySet) with one query.
+
+    The offer is attached to each instance so `Product.get_price_with_offer`,
+    `has_discount` and `get_discount_precentage` (and every template or
+    serializer that calls them) stop querying `ProductOffer` per product.
+    Returns the products as a list.
+    """
+    products = [product for product in products if product is not None]
+    offers_map = get_active_offers_map([product.pk for product in products], on_date)
+
+    for product in products:
+        offer = offers_map.get(product.pk)
+        if offer is not None:
+            # Share the product instance so the offer never reloads it
+            offer.product = product
+        product._active_offer = offer
+
+    return products
+
+
+def resolve_related_offers(objects, attr='product', on_date=None):
+    """
+    Pre-resolve offers for the products hanging off `objects` (cart items,
+    order items, platform ads...) through `attr`. Returns `objects` as a list.
+    """
+    objects = list(objects)
+    resolve_active_offers([getattr(obj, attr, None) for obj in objects], on_date)
+    return objects
@@ -0,0 +1,113 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def order_stats_key(order):
+    """(supplier_id, date, status_id) bucket of an order, or None if it has no store."""
+    if not order.supplier_id or not order.created_at:
+        return None
+    return order.supplier_id, timezone.localdate(order.created_at), order.pipeline_status_id
+
+
+def _apply(key, orders, amount):
+    from core.models import DailyOrderStats
+
+    supplier_id, date, status_id = key
+    bucket = DailyOrderStats.objects.filter(supplier_id=supplier_id, date=date, status_id=status_id)
+    if bucket.update(orders=F('orders') + orders, amount=F('amount') + amount):
+        return
+    try:
+        with transaction.atomic():
+            DailyOrderStats.objects.create(
+                supplier_id=supplier_id, date=date, status_id=status_id, orders=orders, amount=amount
+            )
+    except IntegrityError:
+        # Created by a concurrent order in the meantime
+        bucket.update(orders=F('orders') + orders, amount=F('amount') + amount)
+
+
+def record_order_change(previous, current):
+    """
+    Move an order between stats buckets. `previous` and `current` are
+    (key, amount) pairs, None for an order that didn't / doesn't exist.
+    Runs in the caller's transaction, so the counters commit with the order.
+    """
+    if previous == current:
+        return
+    if previous and previous[0]:
+        _apply(previous[0], -1, -(previous[1] or 0))
+    if current and current[0]:
+        _apply(current[0], 1, current[1] or 0)
+
+
+def rebuild_order_stats(supplier_ids=None):
+    """Recompute DailyOrderStats from the orders (all stores, or `supplier_ids`). Returns the rows written."""
+    from core.models import DailyOrderStats, Order
+
+    orders = Order.objects.filter(supplier__isnull=False)
+    stats = DailyOrderStats.objects.all()
+    if supplier_ids is not None:
+        orders = orders.filter(supplier_id__in=supplier_ids)
+        stats = stats.filter(supplier_id__in=supplier_ids)
+
+    rows = [
+        DailyOrderStats(**row)
+        for row in orders.annotate(date=TruncDate('created_at'))
+        .values('supplier_id', 'date', status_id=F('pipeline_status_id'))
+        .annotate(orders=Count('id'), amount=Sum('total_amount'))
+        .order_by()
+    ]
+    with transaction.atomic():
+        stats.delete()
+        DailyOrderStats.objects.bulk_create(rows, batch_size=1000)
+    logger.info(f"Rebuilt {len(rows)} daily order stats rows")
+    return len(rows)
+
+
+def get_order_stats(supplier, statuses=None, date_from=None, date_to=None):
+    """
+    Order counters of a store from its daily stats rows (one aggregate over
+    at most days x statuses rows, never the orders themselves).
+
+    Returns total/today/month/recent (7 days) order counts, pending and
+    confirmed counts, the amount of all orders this month and the confirmed
+    revenue (overall and this month). `statuses` (slugs) and the date bounds
+    narrow every counter, like the merchant order list filters.
+    """
+    from core.models import DailyOrderStats
+
+    today = timezone.localdate()
+    month_start = today.replace(day=1)
+    rows = DailyOrderStats.objects.filter(supplier=supplier)
+    if statuses:
+        rows = rows.filter(status__slug__in=statuses)
+    if date_from:
+        rows = rows.filter(date__gte=date_from)
+    if date_to:
+        rows = rows.filter(date__lte=date_to)
+
+    pending = Q(status__slug='pending')
+    confirmed = Q(status__slug='confirmed')
+    this_month = Q(date__gte=month_start)
+    stats = rows.aggregate(
+        total_orders=Sum('orders'),
+        orders_today=Sum('orders', filter=Q(date=today)),
+        orders_this_month=Sum('orders', filter=this_month),
+        recent_orders=Sum('orders', filter=Q(date__gt=today - timedelta(days=7))),
+        pending_orders=Sum('orders', filter=pending),
+        confirmed_orders=Sum('orders', filter=confirmed),
+        amount_this_month=Sum('amount', filter=this_month),
+        confirmed_revenue=Sum('amount', filter=confirmed),
+        confirmed_revenue_this_month=Sum('amount', filter=confirmed & this_month),
+    )
+    for name, value in stats.items():
+        stats[name] = value or (Decimal('0') if 'amount' in name or 'revenue' in name else 0)
+    return stats
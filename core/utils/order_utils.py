@@ -1,59 +1,158 @@
 import logging
 import random
+from collections import Counter
 from urllib.parse import quote
-from core.utils.whatsapp_utils import send_whatsapp_message
+from core.utils.notification_utils import ADMIN_RECIPIENT, PLATFORM_SUPPORT_PHONE, notify
 
 logger = logging.getLogger(__name__)
 
+# Orders accepted by one bulk status update
+BULK_STATUS_LIMIT = 100
+
+
+def create_order_items_from_cart(order, cart):
+    """
+    Create the order's items from the cart in one INSERT, snapshotting unit
+    price, discounted price and discount percentage as they are right now.
+    The quantities are held in stock for the order until it takes the stock
+    or is cancelled.
+    """
+    from core.models import OrderItem
+    from core.utils.stock_utils import reserve_order_stock
+
+    order_items = []
+    quantities = Counter()
+    for cart_item in cart.get_pricing_summary().items:
+        order_item = OrderItem(order=order, product=cart_item.product, quantity=cart_item.quantity)
+        order_item.snapshot_prices()
+        order_items.append(order_item)
+        quantities[cart_item.product.id] += cart_item.quantity
+    order_items = OrderItem.objects.bulk_create(order_items)
+    reserve_order_stock(order, quantities)
+    return order_items
+
+def parse_order_ids(values, limit=BULK_STATUS_LIMIT):
+    """
+    Order ids from a list and/or comma separated strings, deduplicated in
+    order; invalid ids raise ValueError.
+
+    Parsing stops at `limit + 1` distinct ids: enough for the caller to
+    reject the request without reading the rest of it.
+    """
+    if isinstance(values, (str, int)):
+        values = [values]
+    order_ids = {}
+    for value in values:
+        for part in str(value).split(','):
+            part = part.strip()
+            if part:
+                order_ids[int(part)] = None
+                if len(order_ids) > limit:
+                    return list(order_ids)
+    return list(order_ids)
+
+
+def bulk_update_order_status(supplier, order_ids, new_status, reason=None, user=None):
+    """
+    Move many of `supplier`'s orders to `new_status` in one transaction.
+
+    Ownership is checked in one query, payments are summed in the same
+    query and items/stock holds are prefetched, so each order only pays for
+    its own writes. Every order runs in its own savepoint: one that can't
+    move (payment, stock) is reported and doesn't roll back the others.
+    Cancellations are reported to the admin in one notification.
+
+    Returns [{'order_id', 'success', 'message'}] in the order of `order_ids`.
+    """
+    from django.db import transaction
+    from django.db.models import Sum
+    from core.models import Order
+
+    orders = {
+        order.id: order
+        for order in Order.objects.filter(supplier=supplier, id__in=order_ids)
+        .select_related('user', 'pipeline_status', 'supplier')
+        .annotate(paid_total=Sum('payment_references__amount'))
+        .prefetch_related('order_items', 'stock_movements')
+    }
+
+    results = []
+    with transaction.atomic():
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                results.append({'order_id': order_id, 'success': False, 'message': 'الطلب غير موجود أو لا يخص هذا المتجر.'})
+                continue
+            try:
+                with transaction.atomic():
+                    success, message = order.update_status(new_status, reason=reason, user=user, notify_admin=False)
+            except Exception as e:
+                logger.exception(f"Bulk status update failed for order #{order_id}")
+                success, message = False, str(e)
+            results.append({'order_id': order_id, 'success': success, 'message': message})
+
+        cancelled = [result['order_id'] for result in results if result['success']]
+        if new_status.slug == 'cancelled' and cancelled:
+            notify('orders_cancelled_admin', [ADMIN_RECIPIENT], {
+                'order_ids': cancelled,
+                'supplier_name': supplier.name,
+                'performer_name': user.username if user else "المسؤول",
+                'reason': reason,
+            })
+    return results
+
+
 def complete_order_and_notify(request, order, cart, shipping_address, supplier):
     """Unified logic for finishing order, notifications, and clearing cart."""
+    # Computes the pricing summary once; every total below reads it
     order.set_total_amount()
     
-    # Send Notifications
+    # Queue Notifications (rendered and sent by the notification dispatcher)
     try:
-        total = order.get_total_after_discount()
         domain = request.get_host()
         
         # 1. User Notification
-        user_msg = (
-            f"شكراً لثقتك بنا! 🎉 تم استلام طلبك بنجاح من متجر {supplier.name}.\n"
-            f"نحن فخورون بخدمتك ونسعى دائماً لتوفير الأفضل لك.\n"
-            f"إجمالي الطلب: {total} {supplier.currency}\n"
-            f"للمزيد من العروض الرائعة، زورونا دائماً: https://{domain}\n"
-            f"في خدمتك دائماً، الدعم الفني: 779923330"
-        )
-        logger.info(f"[WhatsApp] Sending user notification to phone: '{shipping_address.phone}'")
-        send_whatsapp_message(str(shipping_address.phone), str(user_msg))
+        logger.info(f"[WhatsApp] Queueing user notification to phone: '{shipping_address.phone}'")
+        notify('order_placed_customer', [shipping_address.phone], {
+            'supplier_name': supplier.name,
+            'total': str(order.get_total_after_discount()),
+            'currency': str(supplier.currency),
+            'domain': domain,
+            'support_phone': PLATFORM_SUPPORT_PHONE,
+        })
         
         # 2. Supplier Notification
-        location_link = f"https://www.google.com/maps?q={shipping_address.latitude},{shipping_address.longitude}" if shipping_address.latitude and shipping_address.longitude else "غير متوفر"
+        location_link = f"https://www.google.com/maps?q={shipping_address.latitude},{shipping_address.longitude}" if shipping_address.latitude and shipping_address.longitude else ""
         
         # Try to get customer name
         full_name = request.POST.get('full_name', '').strip()
         customer_name = full_name if full_name else (request.user.get_full_name() or request.user.username)
         
-        supp_msg = (
-            f"طلب جديد رقم #{order.id}\n"
-            f"العميل: {customer_name}\n"
-            f"رقم العميل: {shipping_address.phone}\n"
-            f"الموقع: {location_link}\n"
-            f"ملاحظات: {shipping_address.address_line2 or 'لا يوجد'}\n"
-            f"رابط الطلب: https://{domain}/merchant-order/{order.id}/"
-        )
-        send_whatsapp_message(str(supplier.phone), str(supp_msg))
+        notify('order_placed_merchant', [supplier.phone], {
+            'order_id': order.id,
+            'customer_name': customer_name,
+            'customer_phone': str(shipping_address.phone),
+            'location_link': location_link,
+            'notes': shipping_address.address_line2 or '',
+            'domain': domain,
+        })
         
         # 3. Platform Support Notification
-        send_whatsapp_message("779923330", f"طلب جديد رقم #{order.id} من {supplier.name} لصالح العميل {shipping_address.phone}")
+        notify('order_placed_platform', [PLATFORM_SUPPORT_PHONE], {
+            'order_id': order.id,
+            'supplier_name': supplier.name,
+            'customer_phone': str(shipping_address.phone),
+        })
         
     except Exception as e:
-        logger.error(f"Error sending order notifications: {str(e)}")
+        logger.error(f"Error queueing order notifications: {str(e)}")
 
     # Clear Cart
     cart.cart_items.all().delete()
     
     # WhatsApp Redirection Info
     # Construct item list for WhatsApp message
-    items_list = "\n".join([f"- {item.product.name} ({item.quantity})" for item in order.order_items.all()])
+    items_list = "\n".join([f"- {item.product.name} ({item.quantity})" for item in order.get_pricing_summary().items])
     wa_message = f"أريد طلبي من متجركم {supplier.name}\n\nقائمة أصناف الطلب:\n{items_list}"
     
     wa_url = f"https://wa.me/{supplier.phone}?text={quote(wa_message)}"
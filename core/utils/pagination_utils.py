@@ -0,0 +1,87 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def encode_cursor(obj):
+    """Opaque cursor for a row of a list ordered by (-created_at, -id)."""
+    raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) of a cursor made by `encode_cursor`; raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from exc
+
+
+class CursorPage:
+    """One page of a keyset paginated list, newest first."""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous else None
+
+
+def paginate_by_cursor(queryset, after=None, before=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Page through `queryset` newest first on (created_at, id), without COUNT
+    or OFFSET: each page is an index range scan from the cursor, so the
+    last page costs the same as the first.
+
+    `after` continues past a page's `next_cursor`, `before` goes back from
+    a page's `previous_cursor`. Raises ValueError on a malformed cursor.
+    """
+    if before:
+        created_at, pk = decode_cursor(before)
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            .order_by('created_at', 'pk')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        return CursorPage(rows[:per_page][::-1], has_next=True, has_previous=has_previous)
+
+    if after:
+        created_at, pk = decode_cursor(after)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    rows = list(queryset.order_by('-created_at', '-pk')[:per_page + 1])
+    return CursorPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=bool(after))
+
+
+def paginate_by_number(queryset, number, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Page `number` (from 1) of the same newest first list, with OFFSET, for
+    clients that predate cursors. Its `next_cursor` switches them to keyset
+    pages. Raises ValueError on an invalid number.
+    """
+    number = int(number)
+    if number < 1:
+        raise ValueError(f'Invalid page number: {number}')
+    offset = (number - 1) * per_page
+    rows = list(queryset.order_by('-created_at', '-pk')[offset:offset + per_page + 1])
+    return CursorPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=number > 1)
@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from core.utils.delivery_utils import get_delivery_fee
+from core.utils.offer_utils import resolve_related_offers
+
+ZERO = Decimal('0')
+
+
+class PricingSummary:
+    """
+    Totals of a cart or an order computed in a single pass over its items.
+
+    Items are loaded once with their products, and every product's active
+    offer is resolved with one query, so reading `gross`, `net`, `discount`,
+    `item_count` or `delivery_fee` never touches the database again.
+    """
+
+    def __init__(self, items, supplier=None, address=None, resolve_offers=True):
+        self.items = resolve_related_offers(items) if resolve_offers else list(items)
+        self.supplier = supplier
+        self.address = address
+
+        self.gross = ZERO
+        self.net = ZERO
+        self.item_count = 0
+        self.has_discount = False
+        for item in self.items:
+            self.gross += item.get_subtotal()
+            self.net += item.get_subtotal_with_discount()
+            self.item_count += item.quantity
+            self.has_discount = self.has_discount or item.has_discount()
+
+        self.discount = self.gross - self.net
+        self.distance, self.delivery_fee = get_delivery_fee(supplier, address)
+
+    @property
+    def total(self):
+        """Net items total plus the delivery fee."""
+        return self.net + self.delivery_fee
+
+
+def _load_items(instance, related_name):
+    """Reuse prefetched items when available so templates share the resolved products."""
+    if related_name in getattr(instance, '_prefetched_objects_cache', {}):
+        return list(getattr(instance, related_name).all())
+    return list(getattr(instance, related_name).select_related('product', 'product__supplier'))
+
+
+def build_cart_summary(cart, address=None):
+    """Summarize a Cart; the delivery fee is estimated from the user's saved address."""
+    from core.models import Address
+
+    items = _load_items(cart, 'cart_items')
+    supplier = cart.supplier
+    if address is None and supplier.enable_delivery_fees:
+        address = Address.objects.filter(user_id=cart.user_id).first()
+    return PricingSummary(items, supplier=supplier, address=address)
+
+
+def build_order_summary(order):
+    """Summarize an Order; the delivery fee uses the order's shipping address."""
+    items = _load_items(order, 'order_items')
+    supplier = order.get_supplier() if items else None
+    shipping_address = None
+    if supplier and supplier.enable_delivery_fees:
+        shipping_address = order.get_shipping_address()
+    # Snapshotted items carry their own prices; only legacy rows need live offers
+    resolve_offers = any(not item.has_price_snapshot() for item in items)
+    return PricingSummary(items, supplier=supplier, address=shipping_address, resolve_offers=resolve_offers)
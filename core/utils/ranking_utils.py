@@ -0,0 +1,135 @@
+import logging
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Exists, F, Max, OuterRef
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RANKING_DATE_CACHE_KEY = 'supplier_ranking:ranked_on'
+
+
+def _upsert_options(model):
+    """
+    bulk_create() options upserting on the supplier key. MySQL has no
+    conflict target (ON DUPLICATE KEY UPDATE applies to any unique key) and
+    refuses `unique_fields`; SQLite and PostgreSQL require it.
+    """
+    features = connections[model.objects.db].features
+    if features.supports_update_conflicts_with_target:
+        return {'unique_fields': ['supplier']}
+    return {}
+
+
+def refresh_supplier_rankings(supplier_ids=None, on_date=None):
+    """
+    Recompute the SupplierRanking rows of `supplier_ids` (all suppliers when
+    None) for `on_date` (defaults to today) and upsert them.
+
+    The active offers of every supplier are aggregated with one grouped
+    query, so a full refresh costs three queries regardless of the number
+    of stores. Returns the number of rankings written.
+    """
+    from core.models import Supplier, SupplierRanking, ProductOffer
+
+    on_date = on_date or timezone.now().date()
+    suppliers = Supplier.objects.all()
+    offers = ProductOffer.objects.filter(
+        is_active=True,
+        from_date__lte=on_date,
+        to_date__gte=on_date
+    )
+    if supplier_ids is not None:
+        supplier_ids = {sid for sid in supplier_ids if sid is not None}
+        if not supplier_ids:
+            return 0
+        suppliers = suppliers.filter(id__in=supplier_ids)
+        offers = offers.filter(product__supplier_id__in=supplier_ids)
+
+    stats = {
+        row['product__supplier_id']: row
+        for row in offers.values('product__supplier_id').annotate(
+            max_discount=Max('discount_precentage'),
+            count=Count('id')
+        )
+    }
+
+    rankings = []
+    for supplier_id, is_active, priority in suppliers.values_list('id', 'is_active', 'priority'):
+        row = stats.get(supplier_id, {})
+        rankings.append(SupplierRanking(
+            supplier_id=supplier_id,
+            is_active=is_active,
+            max_offer_discount=row.get('max_discount'),
+            offers_count=row.get('count', 0),
+            priority=priority,
+            ranked_on=on_date,
+        ))
+
+    SupplierRanking.objects.bulk_create(
+        rankings,
+        batch_size=500,
+        update_conflicts=True,
+        update_fields=['is_active', 'max_offer_discount', 'offers_count', 'priority', 'ranked_on', 'updated_at'],
+        **_upsert_options(SupplierRanking),
+    )
+    return len(rankings)
+
+
+def ensure_rankings_current():
+    """
+    Make sure every supplier has a ranking computed for today.
+
+    Offers start and expire by date without any row changing, so the first
+    read of the day refreshes stale rankings; the result is remembered in
+    the cache to keep later reads to a single query.
+    """
+    from core.models import Supplier
+
+    today = timezone.now().date()
+    if cache.get(RANKING_DATE_CACHE_KEY) == today.isoformat():
+        return
+
+    if Supplier.objects.exclude(ranking__ranked_on=today).exists():
+        count = refresh_supplier_rankings(on_date=today)
+        logger.info("Refreshed %s stale supplier rankings for %s", count, today)
+    cache.set(RANKING_DATE_CACHE_KEY, today.isoformat(), 60 * 60 * 24)
+
+
+def get_ranked_suppliers(queryset=None, producing_family=False):
+    """
+    Active suppliers ordered by "strongest offers" (highest active discount,
+    then number of active offers, then priority), read from SupplierRanking.
+
+    Filtering and ordering only on the ranking's own columns lets
+    `supplier_ranking_order_idx` serve the query; every store has a ranking
+    row from the moment it is created (see `refresh_ranking_for_supplier`).
+    The producing-family list keeps its original order, which ignores the
+    number of offers.
+
+    Each supplier keeps the `max_offer_discount` and `offers_count`
+    attributes the templates and serializers expect.
+    """
+    from core.models import Supplier
+
+    ensure_rankings_current()
+
+    suppliers = Supplier.objects.all() if queryset is None else queryset
+    if producing_family:
+        suppliers = suppliers.filter(Exists(
+            Supplier.category.through.objects.filter(
+                supplier_id=OuterRef('pk'),
+                suppliercategory__producing_family=True
+            )
+        ))
+
+    if producing_family:
+        ordering = ('-ranking__max_offer_discount', '-ranking__priority', 'pk')
+    else:
+        ordering = ('-ranking__max_offer_discount', '-ranking__offers_count', '-ranking__priority', 'pk')
+
+    return suppliers.filter(is_active=True, ranking__is_active=True).annotate(
+        max_offer_discount=F('ranking__max_offer_discount'),
+        offers_count=F('ranking__offers_count'),
+    ).order_by(*ordering)
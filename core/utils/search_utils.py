@@ -0,0 +1,205 @@
+import logging
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, Value, When
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 20
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+# Long descriptions: only their first distinct words are indexed
+MAX_DESCRIPTION_TERMS = 200
+STORE_SEARCH_NAME_LENGTH = 255
+
+# Harakat, Quranic annotation marks, superscript alef and tatweel
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)},
+})
+_WORD = re.compile(r'\w+')
+_ARTICLE = 'ال'
+
+
+def normalize_text(text):
+    """Arabic-aware search form of `text`: no diacritics, folded alef/ya/ta marbuta, lower case."""
+    return _DIACRITICS.sub('', text or '').translate(_FOLDING).casefold()
+
+
+def tokenize(text):
+    """Distinct normalized words of `text`, in order."""
+    words = []
+    for word in _WORD.findall(normalize_text(text)):
+        word = word[:MAX_TERM_LENGTH]
+        if len(word) >= MIN_TERM_LENGTH and word not in words:
+            words.append(word)
+    return words
+
+
+def _index_forms(word):
+    # "الهاتف" is also indexed as "هاتف", so either spelling of the query finds it
+    if word.startswith(_ARTICLE) and len(word) - len(_ARTICLE) >= MIN_TERM_LENGTH:
+        return (word, word[len(_ARTICLE):])
+    return (word,)
+
+
+def store_search_name(name):
+    """Space separated search forms of a store name, stored on Supplier.search_name."""
+    forms = [form for word in tokenize(name) for form in _index_forms(word)]
+    return ' '.join(forms)[:STORE_SEARCH_NAME_LENGTH]
+
+
+def build_terms(name, description, category_names, store_name):
+    """
+    {(term, field): weight} rows of one product. Fields are the SearchTerm
+    FIELD_* codes; a word found in several fields gets one row per field.
+    """
+    from core.models import SearchTerm
+
+    sources = [
+        (SearchTerm.FIELD_NAME, tokenize(name)),
+        (SearchTerm.FIELD_CATEGORY, tokenize(' '.join(category_names))),
+        (SearchTerm.FIELD_STORE, tokenize(store_name)),
+        (SearchTerm.FIELD_DESCRIPTION, tokenize(description)[:MAX_DESCRIPTION_TERMS]),
+    ]
+    terms = {}
+    for field, words in sources:
+        for word in words:
+            for form in _index_forms(word):
+                terms[form, field] = SearchTerm.FIELD_WEIGHTS[field]
+    return terms
+
+
+def _product_terms(product):
+    category = product.category
+    return build_terms(
+        product.name, product.description,
+        [category.name, category.category.name] if category else [],
+        product.supplier.name if product.supplier else '',
+    )
+
+
+def index_products(product_ids):
+    """Replace the search terms of these products (missing ids just lose theirs). Returns the rows written."""
+    from core.models import Product, SearchTerm
+
+    product_ids = list(product_ids)
+    products = Product.objects.filter(pk__in=product_ids).select_related('category__category', 'supplier')
+    rows = [
+        SearchTerm(product_id=product.pk, term=term, field=field, weight=weight)
+        for product in products
+        for (term, field), weight in _product_terms(product).items()
+    ]
+    with transaction.atomic():
+        SearchTerm.objects.filter(product_id__in=product_ids).delete()
+        SearchTerm.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_search_index(batch_size=500):
+    """Reindex every product, in batches. Returns the rows written."""
+    from core.models import Product, SearchTerm
+
+    SearchTerm.objects.all().delete()
+    ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        written += index_products(ids[start:start + batch_size])
+    logger.info(f"Indexed {len(ids)} products into {written} search terms")
+    return written
+
+
+def _query_terms(query):
+    # Every indexed word also has its article-less form: search with that one
+    return [_index_forms(word)[-1] for word in tokenize(query)][:MAX_QUERY_TERMS]
+
+
+def _ranked_matches(terms, group_by, **filters):
+    """
+    Rows of `group_by` whose indexed words start with every query term,
+    with their score (sum of matched field weights), best first.
+
+    Terms are stored lowercased, so `istartswith` matches the same rows; on
+    MySQL it compiles to a plain LIKE that search_term_idx can serve, where
+    `startswith` becomes LIKE BINARY.
+    """
+    from core.models import SearchTerm
+
+    matches = SearchTerm.objects.filter(
+        reduce(or_, [Q(term__istartswith=term) for term in terms]),
+        product__is_active=True, product__supplier__is_active=True, **filters,
+    )
+    # One point per query term found in the group: all of them must be found
+    matched = reduce(lambda total, term: total + term, [
+        Max(Case(When(term__istartswith=term, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for term in terms
+    ])
+    return (
+        matches.values(group_by)
+        .annotate(score=Sum('weight'), matched=matched)
+        .filter(matched=len(terms))
+        .order_by('-score', f'-{group_by}')
+    )
+
+
+def search_products(query, page=1, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Ranked products matching every word of `query` (as word prefixes) in
+    their name, category, store name or description.
+
+    Returns (page, products): the Paginator page of the ranked matches and
+    that page's products in rank order, each with a `search_score`.
+    """
+    from core.models import Product
+
+    terms = _query_terms(query)
+    if not terms:
+        return None, []
+    page = Paginator(_ranked_matches(terms, 'product_id'), per_page).get_page(page)
+    scores = {row['product_id']: row['score'] for row in page.object_list}
+    products = Product.objects.filter(pk__in=scores).select_related('supplier__currency', 'category')
+    products = sorted(products, key=lambda product: (-scores[product.pk], -product.pk))
+    for product in products:
+        product.search_score = scores[product.pk]
+    return page, products
+
+
+def _word_starts_with(term):
+    return Q(search_name__startswith=term) | Q(search_name__contains=f' {term}')
+
+
+def _is_word(term):
+    return (
+        Q(search_name=term) | Q(search_name__startswith=f'{term} ')
+        | Q(search_name__endswith=f' {term}') | Q(search_name__contains=f' {term} ')
+    )
+
+
+def search_suppliers(query, limit=10):
+    """
+    Active stores with a name word starting with every word of `query`,
+    whatever their catalogue. Stores where more query words are whole name
+    words come first, then the stores list order (offers, priority).
+    """
+    from core.models import Supplier
+    from core.utils.ranking_utils import get_ranked_suppliers
+
+    terms = _query_terms(query)
+    if not terms:
+        return []
+    # Short column on a small table: the LIKE scan stays cheap
+    suppliers = get_ranked_suppliers(Supplier.objects.filter(reduce(and_, map(_word_starts_with, terms))))
+    whole_words = reduce(lambda total, term: total + term, [
+        Case(When(_is_word(term), then=Value(1)), default=Value(0), output_field=IntegerField())
+        for term in terms
+    ])
+    suppliers = suppliers.annotate(whole_words=whole_words)
+    return list(suppliers.order_by('-whole_words', *suppliers.query.order_by)[:limit])
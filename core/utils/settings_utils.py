@@ -0,0 +1,32 @@
+from django.core.cache import cache
+
+SYSTEM_SETTINGS_CACHE_KEY = 'system_settings'
+# Safety net only: saving/deleting SystemSettings invalidates the entry right away
+SYSTEM_SETTINGS_CACHE_TIMEOUT = 60 * 60
+
+
+def get_system_settings(request=None):
+    """
+    The SystemSettings singleton (or None), served from the cache.
+
+    With a request the instance is also memoized on it, so every template
+    render and helper of that request shares one object.
+    """
+    from core.models import SystemSettings
+
+    if request is not None and '_system_settings' in request.__dict__:
+        return request._system_settings
+
+    settings = cache.get(SYSTEM_SETTINGS_CACHE_KEY)
+    if settings is None:
+        settings = SystemSettings.objects.first()
+        if settings is not None:
+            cache.set(SYSTEM_SETTINGS_CACHE_KEY, settings, SYSTEM_SETTINGS_CACHE_TIMEOUT)
+
+    if request is not None:
+        request._system_settings = settings
+    return settings
+
+
+def invalidate_system_settings():
+    cache.delete(SYSTEM_SETTINGS_CACHE_KEY)
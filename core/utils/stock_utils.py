@@ -0,0 +1,226 @@
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from core.utils.cache_utils import bump_content_version, store_content
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """A product doesn't have the requested quantity; nothing was taken out of stock."""
+
+    def __init__(self, product_name, available):
+        self.product_name = product_name
+        self.available = available
+        super().__init__(f"لا يوجد مخزون كافٍ للمنتج: {product_name} (المتوفر: {available})")
+
+
+def _prefetched(order, name):
+    return getattr(order, '_prefetched_objects_cache', {}).get(name)
+
+
+def order_quantities(order):
+    """{product_id: quantity} for the order's items, in one query (none if prefetched)."""
+    items = _prefetched(order, 'order_items')
+    if items is not None:
+        rows = [(item.product_id, item.quantity) for item in items]
+    else:
+        rows = order.order_items.values_list('product_id', 'quantity')
+    quantities = Counter()
+    for product_id, quantity in rows:
+        quantities[product_id] += quantity
+    return quantities
+
+
+def order_holds(order):
+    """{product_id: quantity} still reserved for the order, from the ledger (or its prefetched movements)."""
+    from core.models import StockMovement
+
+    movements = _prefetched(order, 'stock_movements')
+    if movements is not None:
+        holds = Counter()
+        for movement in movements:
+            holds[movement.product_id] += movement.reserved_delta
+        return {product_id: held for product_id, held in holds.items() if held}
+
+    rows = (
+        StockMovement.objects.filter(order=order)
+        .values('product_id').annotate(held=Sum('reserved_delta'))
+        .values_list('product_id', 'held').order_by()
+    )
+    return {product_id: held for product_id, held in rows if held}
+
+
+def apply_stock_movements(kind, changes, order=None, workflow_step=None, user=None, note='', strict=False):
+    """
+    Move stock and write the ledger in one transaction.
+
+    `changes` is {product_id: (stock_delta, reserved_delta)}. Balances are
+    updated with F() expressions in product id order (so concurrent callers
+    lock rows in the same order). With `strict`, a product whose stock would
+    go below zero raises InsufficientStock and nothing is applied.
+    """
+    from core.models import Product, StockMovement
+
+    changes = {
+        product_id: deltas for product_id, deltas in changes.items() if deltas[0] or deltas[1]
+    }
+    if not changes:
+        return
+
+    with transaction.atomic():
+        for product_id in sorted(changes):
+            stock_delta, reserved_delta = changes[product_id]
+            products = Product.objects.filter(pk=product_id)
+            if strict and stock_delta < 0:
+                products = products.filter(stock__gte=-stock_delta)
+            updated = products.update(
+                stock=F('stock') + stock_delta, reserved=F('reserved') + reserved_delta
+            )
+            if not updated:
+                product = Product.objects.filter(pk=product_id).values('name', 'stock').first()
+                raise InsufficientStock(
+                    product['name'] if product else product_id,
+                    product['stock'] if product else 0,
+                )
+
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=product_id, order=order, workflow_step=workflow_step, kind=kind,
+                stock_delta=stock_delta, reserved_delta=reserved_delta, created_by=user, note=note,
+            )
+            for product_id, (stock_delta, reserved_delta) in changes.items()
+        ])
+
+        # Queryset updates skip the signals that refresh the storefront cache
+        supplier_ids = set(
+            Product.objects.filter(pk__in=changes).values_list('supplier_id', flat=True)
+        )
+        transaction.on_commit(
+            lambda: [bump_content_version(store_content(supplier_id)) for supplier_id in supplier_ids]
+        )
+
+
+def decrease_stock(quantities, order=None, workflow_step=None):
+    """
+    Take `quantities` ({product_id: quantity}) out of stock, all or nothing.
+
+    Each product is decremented by a conditional UPDATE (`stock >= quantity`),
+    so concurrent callers can never oversell: the row lock taken by the
+    UPDATE serialises them and the loser matches no row. Raises
+    InsufficientStock (and rolls everything back) on the first product
+    that is short.
+    """
+    from core.models import StockMovement
+
+    apply_stock_movements(
+        StockMovement.KIND_COMMIT,
+        {product_id: (-quantity, 0) for product_id, quantity in quantities.items() if quantity > 0},
+        order=order, workflow_step=workflow_step, strict=True,
+    )
+
+
+def reserve_order_stock(order, quantities=None):
+    """
+    Hold the order's quantities at checkout.
+
+    Checkout is never refused here (the cart already checked availability);
+    a hold that exceeds what is available is logged as an oversell and
+    shows up as `reserved > stock`.
+    """
+    from core.models import Product, StockMovement
+
+    quantities = quantities if quantities is not None else order_quantities(order)
+    apply_stock_movements(
+        StockMovement.KIND_RESERVE,
+        {product_id: (0, quantity) for product_id, quantity in quantities.items()},
+        order=order,
+    )
+    oversold = list(
+        Product.objects.filter(pk__in=quantities, reserved__gt=F('stock')).values_list('id', flat=True)
+    )
+    if oversold:
+        logger.warning(f"Order #{order.pk} oversold products {oversold}")
+
+
+def commit_order_stock(order, workflow_step=None):
+    """
+    Take the order's items out of stock (workflow step with `decrease_stock`),
+    turning its holds into a real decrement. All or nothing, raises
+    InsufficientStock.
+    """
+    from core.models import StockMovement
+
+    holds = order_holds(order)
+    apply_stock_movements(
+        StockMovement.KIND_COMMIT,
+        {
+            product_id: (-quantity, -holds.get(product_id, 0))
+            for product_id, quantity in order_quantities(order).items()
+        },
+        order=order, workflow_step=workflow_step, strict=True,
+    )
+
+
+def release_order_stock(order, restock=False, workflow_step=None, user=None):
+    """
+    Cancelled order: drop its open holds and, with `restock`, put back the
+    units already taken out of stock.
+    """
+    from core.models import StockMovement
+
+    changes = {product_id: (0, -held) for product_id, held in order_holds(order).items()}
+    if restock:
+        for product_id, quantity in order_quantities(order).items():
+            changes[product_id] = (quantity, changes.get(product_id, (0, 0))[1])
+    apply_stock_movements(
+        StockMovement.KIND_RELEASE, changes, order=order, workflow_step=workflow_step, user=user,
+    )
+
+
+def release_deleted_order_holds(order_id, holds):
+    """
+    Drop the holds (`order_holds()` taken before the delete) of a deleted
+    order, skipping products deleted along with it.
+    """
+    from core.models import Product, StockMovement
+
+    existing = set(Product.objects.filter(pk__in=holds).values_list('pk', flat=True))
+    apply_stock_movements(
+        StockMovement.KIND_RELEASE,
+        {product_id: (0, -held) for product_id, held in holds.items() if product_id in existing},
+        note=f'حذف الطلب #{order_id}',
+    )
+
+
+def adjust_stock(product_id, new_stock, user=None, note=''):
+    """Set a product's stock by hand, recorded as the difference in the ledger."""
+    from core.models import Product, StockMovement
+
+    with transaction.atomic():
+        current = (
+            Product.objects.select_for_update().filter(pk=product_id).values_list('stock', flat=True).first()
+        )
+        if current is None:
+            return
+        apply_stock_movements(
+            StockMovement.KIND_ADJUST, {product_id: (new_stock - current, 0)}, user=user, note=note,
+        )
+
+
+def available_stock_q():
+    """Products that can still be sold: stock above what open orders hold."""
+    return Q(stock__gt=F('reserved'))
+
+
+def get_available_stock(product_ids):
+    """{product_id: units available to sell} for many products in one query."""
+    from core.models import Product
+
+    return {
+        product_id: max(stock - reserved, 0)
+        for product_id, stock, reserved in Product.objects.filter(pk__in=product_ids).values_list('id', 'stock', 'reserved')
+    }
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+# URL kwargs that carry a store slug (Supplier.store_id)
+STORE_URL_KWARGS = ('store_slug', 'store_id')
+# Safety net only: supplier saves/deletes invalidate the entry right away
+STORE_CACHE_TIMEOUT = 60 * 10
+
+
+def _store_cache_key(store_slug):
+    return f'store_by_slug:{store_slug}'
+
+
+def _store_cache_timeout():
+    # A per-process cache only sees the invalidations of its own worker: the
+    # entry expires as quickly as the content versions do (CONTENT_VERSION_TIMEOUT)
+    version_timeout = getattr(settings, 'CONTENT_VERSION_TIMEOUT', None)
+    if version_timeout is None:
+        return STORE_CACHE_TIMEOUT
+    return min(STORE_CACHE_TIMEOUT, version_timeout)
+
+
+def get_store_slug(view_kwargs):
+    """The store slug of a URL, whichever kwarg name the route uses."""
+    for name in STORE_URL_KWARGS:
+        if view_kwargs.get(name):
+            return view_kwargs[name]
+    return None
+
+
+def get_store_by_slug(store_slug):
+    """Supplier with this `store_id`, served from the cache when possible (None if missing)."""
+    from core.models import Supplier
+
+    if not store_slug:
+        return None
+    key = _store_cache_key(store_slug)
+    supplier = cache.get(key)
+    if supplier is None:
+        supplier = Supplier.objects.filter(store_id=store_slug).first()
+        if supplier is not None:
+            cache.set(key, supplier, _store_cache_timeout())
+    return supplier
+
+
+def invalidate_store_cache(*store_slugs):
+    cache.delete_many([_store_cache_key(slug) for slug in store_slugs if slug])
+
+
+def get_request_store(request, store_slug=None):
+    """
+    Resolve a store once per request. Without `store_slug` the store of the
+    resolved URL is used (`store_slug` or `store_id` kwarg).
+
+    The URL's store is also exposed as `request.current_store` so the
+    middleware, views and visit tracking share one instance.
+    """
+    if store_slug is None:
+        match = getattr(request, 'resolver_match', None)
+        store_slug = get_store_slug(match.kwargs) if match else None
+    if not store_slug:
+        return None
+
+    stores = request.__dict__.setdefault('_stores_by_slug', {})
+    if store_slug not in stores:
+        stores[store_slug] = get_store_by_slug(store_slug)
+    return stores[store_slug]
+
+
+def get_store_or_404(request, store_slug, active_only=False):
+    """`get_object_or_404(Supplier, store_id=...)` through the request-scoped store context."""
+    supplier = get_request_store(request, store_slug)
+    if supplier is None or (active_only and not supplier.is_active):
+        raise Http404("No Supplier matches the given query.")
+    return supplier
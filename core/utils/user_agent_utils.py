@@ -0,0 +1,112 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+UserAgentInfo = namedtuple('UserAgentInfo', ['device_type', 'browser', 'operating_system'])
+
+UNKNOWN = 'غير معروف'
+
+BOT_TOKENS = (
+    'bot', 'crawl', 'spider', 'slurp', 'mediapartners', 'headless',
+    'externalhit', 'facebookexternalhit', 'whatsapp', 'twitterbot',
+    'linkedinbot', 'googlebot', 'bingbot', 'yandex', 'semrush',
+    'preview', 'fetch', 'scraper', 'curl', 'wget', 'python-requests',
+)
+
+# Every other token the classification looks at
+CLIENT_TOKENS = (
+    'windows', 'mac os', 'macintosh', 'iphone', 'ipad', 'android', 'linux',
+    'tablet', 'mobile', 'phone',
+    'edg/', 'edge/', 'opr/', 'opera', 'chromium', 'chrome/', 'chrome', 'safari/', 'firefox/',
+)
+
+
+def _trie_pattern(words):
+    """
+    Regex matching any of `words`, factored by common prefix
+    ("chrom(?:e/?|ium)") so the engine tries one branch per character
+    instead of every alternative; greedy optionals keep the longest token.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+_TOKEN_RE = re.compile(_trie_pattern(set(BOT_TOKENS + CLIENT_TOKENS)))
+
+# Checked in order, first match wins
+OS_RULES = (
+    ({'windows'}, 'Windows'),
+    ({'mac os', 'macintosh'}, 'macOS'),
+    ({'iphone', 'ipad'}, 'iOS'),
+    ({'android'}, 'Android'),
+    ({'linux'}, 'Linux'),
+)
+BOT_TOKEN_SET = frozenset(BOT_TOKENS)
+BOT_INFO = UserAgentInfo('bot', '', '')
+
+
+def _classify(ua_string):
+    # One regex pass collects every known token present in the string
+    tokens = set(_TOKEN_RE.findall(ua_string.lower()))
+
+    if tokens & BOT_TOKEN_SET:
+        return BOT_INFO
+
+    operating_system = next((label for keys, label in OS_RULES if tokens & keys), UNKNOWN)
+
+    device_type = 'desktop'
+    if tokens & {'ipad', 'tablet'}:
+        device_type = 'tablet'
+    elif tokens & {'iphone', 'android', 'mobile', 'phone'}:
+        device_type = 'mobile'
+
+    browser = UNKNOWN
+    if 'edg/' in tokens or 'edge/' in tokens:
+        browser = 'Edge'
+    elif 'opr/' in tokens or 'opera' in tokens:
+        browser = 'Opera'
+    elif 'chrome/' in tokens and 'chromium' not in tokens:
+        browser = 'Chrome'
+    elif 'safari/' in tokens and 'chrome' not in tokens and 'chrome/' not in tokens:
+        browser = 'Safari'
+    elif 'firefox/' in tokens:
+        browser = 'Firefox'
+
+    return UserAgentInfo(device_type, browser, operating_system)
+
+
+@lru_cache(maxsize=4096)
+def classify_user_agent(ua_string):
+    """
+    Classify a raw User-Agent header into (device_type, browser, operating_system);
+    bots come back as ('bot', '', '').
+
+    Results are memoized per raw string: traffic is dominated by a few
+    hundred distinct agents, so most calls are a dictionary lookup.
+    """
+    return _classify(ua_string or '')
+
+
+def get_user_agent_cache_stats():
+    info = classify_user_agent.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_rate': info.hits / lookups if lookups else 0.0,
+    }
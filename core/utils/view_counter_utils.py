@@ -0,0 +1,67 @@
+import atexit
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core.utils.buffer_utils import WriteBuffer
+
+# Recently viewed items remembered per session; older ones may be counted again
+VIEWED_SESSION_KEY = 'viewed'
+VIEWED_LIMIT = 50
+# Session lists of the previous implementation, dropped on the next view
+LEGACY_SESSION_KEYS = ('visited_suppliers', 'visited_products')
+
+_COUNTED_MODELS = {'s': 'Supplier', 'p': 'Product'}
+
+
+class ViewCounterBuffer(WriteBuffer):
+    """
+    Views ((kind, pk) pairs) queued like the page visits and written as
+    views_count increments: one UPDATE per model and batch (F() + CASE per row).
+    """
+
+    name = 'view-counter-buffer'
+
+    def write(self, views):
+        from django.apps import apps
+
+        by_model = {}
+        for (kind, pk), count in Counter(views).items():
+            by_model.setdefault(kind, {})[pk] = count
+        for kind, counts in by_model.items():
+            model = apps.get_model('core', _COUNTED_MODELS[kind])
+            increment = Case(
+                *[When(pk=pk, then=Value(count)) for pk, count in counts.items()],
+                default=Value(0), output_field=IntegerField(),
+            )
+            model.objects.filter(pk__in=counts).update(views_count=F('views_count') + increment)
+
+
+view_counters = ViewCounterBuffer(
+    max_size=getattr(settings, 'VIEW_COUNTER_BUFFER_SIZE', 10000),
+    batch_size=getattr(settings, 'VIEW_COUNTER_BATCH_SIZE', 1000),
+    flush_interval=getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 30),
+)
+atexit.register(view_counters.shutdown)
+
+
+def count_view(request, obj):
+    """
+    Count a view of a Supplier or Product once per session (among its last
+    VIEWED_LIMIT views). The increment is buffered, not written right away.
+    """
+    kind = 's' if obj._meta.model_name == 'supplier' else 'p'
+    key = f'{kind}{obj.pk}'
+    session = request.session
+
+    for legacy_key in LEGACY_SESSION_KEYS:
+        session.pop(legacy_key, None)
+
+    viewed = session.get(VIEWED_SESSION_KEY, [])
+    if key in viewed:
+        return False
+    # Fixed size: the session row stays small however much the visitor browses
+    session[VIEWED_SESSION_KEY] = (viewed + [key])[-VIEWED_LIMIT:]
+    view_counters.record((kind, obj.pk))
+    return True
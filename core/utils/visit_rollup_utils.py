@@ -0,0 +1,188 @@
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'website_statistic'
+DIMENSIONS = ('supplier_id', 'page_type', 'device_type', 'browser', 'operating_system')
+# Buckets rebuilt per query, keeps IN lists and result sets bounded
+BUCKET_CHUNK = 200
+
+
+def _visit_counts():
+    return {
+        'visits': Count('id'),
+        'unique_sessions': Count('session_key', distinct=True, filter=~Q(session_key='')),
+        'unique_ips': Count('ip_address', distinct=True),
+    }
+
+
+def _chunks(values):
+    values = sorted(values)
+    for start in range(0, len(values), BUCKET_CHUNK):
+        yield values[start:start + BUCKET_CHUNK]
+
+
+def rebuild_hourly_rollups(hours):
+    """Recompute HourlyVisitRollup for the given hour starts (aware datetimes) from the raw rows."""
+    from core.models import WebsiteStatistic, HourlyVisitRollup
+
+    for chunk in _chunks(hours):
+        wanted = set(chunk)
+        rows = (
+            WebsiteStatistic.objects
+            .filter(visited_at__gte=chunk[0], visited_at__lt=chunk[-1] + timedelta(hours=1))
+            .annotate(hour=TruncHour('visited_at'))
+            .values('hour', *DIMENSIONS)
+            .annotate(**_visit_counts())
+            .order_by()
+        )
+        rollups = [HourlyVisitRollup(**row) for row in rows if row['hour'] in wanted]
+        with transaction.atomic():
+            HourlyVisitRollup.objects.filter(hour__in=chunk).delete()
+            HourlyVisitRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+def rebuild_daily_rollups(dates):
+    """Recompute DailyVisitRollup and DailyVisitTotal for the given dates from the raw rows."""
+    from core.models import WebsiteStatistic, DailyVisitRollup, DailyVisitTotal
+
+    for chunk in _chunks(dates):
+        wanted = set(chunk)
+        # Plain datetime bounds so the visited_at index is used
+        start = timezone.make_aware(datetime.combine(chunk[0], time.min))
+        end = timezone.make_aware(datetime.combine(chunk[-1] + timedelta(days=1), time.min))
+        day_rows = (
+            WebsiteStatistic.objects
+            .filter(visited_at__gte=start, visited_at__lt=end)
+            .annotate(date=TruncDate('visited_at'))
+        )
+        rollups = [
+            DailyVisitRollup(**row)
+            for row in day_rows.values('date', *DIMENSIONS).annotate(**_visit_counts()).order_by()
+            if row['date'] in wanted
+        ]
+        totals = [
+            DailyVisitTotal(**row)
+            for row in day_rows.values('date', 'supplier_id').annotate(**_visit_counts()).order_by()
+            if row['date'] in wanted and row['supplier_id'] is not None
+        ]
+        # Site-wide rows carry supplier NULL
+        totals += [
+            DailyVisitTotal(supplier_id=None, **row)
+            for row in day_rows.values('date').annotate(**_visit_counts()).order_by()
+            if row['date'] in wanted
+        ]
+        with transaction.atomic():
+            DailyVisitRollup.objects.filter(date__in=chunk).delete()
+            DailyVisitTotal.objects.filter(date__in=chunk).delete()
+            DailyVisitRollup.objects.bulk_create(rollups, batch_size=1000)
+            DailyVisitTotal.objects.bulk_create(totals, batch_size=1000)
+
+
+def rollup_new_visits(batch_size=5000):
+    """
+    Fold WebsiteStatistic rows added since the watermark into the rollups.
+
+    New rows are scanned by id to find the hours and days they touch, and
+    only those buckets are rebuilt (unique counts can't be added up, so a
+    touched bucket is recomputed from its raw rows). Returns the number of
+    new rows processed.
+    """
+    from core.models import WebsiteStatistic, RollupWatermark
+
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    last_id = watermark.last_id
+    hours = set()
+    dates = set()
+    processed = 0
+
+    while True:
+        rows = list(
+            WebsiteStatistic.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'visited_at')[:batch_size]
+        )
+        if not rows:
+            break
+        for _, visited_at in rows:
+            visited_at = timezone.localtime(visited_at)
+            hours.add(visited_at.replace(minute=0, second=0, microsecond=0))
+            dates.add(visited_at.date())
+        last_id = rows[-1][0]
+        processed += len(rows)
+
+    if processed:
+        rebuild_hourly_rollups(hours)
+        rebuild_daily_rollups(dates)
+        watermark.last_id = last_id
+        watermark.save(update_fields=['last_id', 'updated_at'])
+        logger.info("Rolled up %s visits (%s hours, %s days)", processed, len(hours), len(dates))
+    return processed
+
+
+def prune_raw_visits(retention_days, batch_size=5000):
+    """
+    Delete raw WebsiteStatistic rows older than `retention_days` that have
+    already been rolled up. Returns the number of rows deleted.
+    """
+    from core.models import WebsiteStatistic, RollupWatermark
+
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+    if not watermark:
+        return 0
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        ids = list(
+            WebsiteStatistic.objects.filter(visited_at__lt=cutoff, id__lte=watermark.last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted += WebsiteStatistic.objects.filter(id__in=ids).delete()[0]
+    return deleted
+
+
+def get_visit_summary(start_date, end_date=None, supplier=None):
+    """
+    Visits between `start_date` and `end_date` (inclusive) read from the
+    rollups, for one store or the whole site.
+
+    `unique_sessions` / `unique_ips` are exact for a single day and the sum
+    of daily uniques over longer ranges.
+    """
+    from core.models import DailyVisitRollup, DailyVisitTotal
+
+    end_date = end_date or start_date
+    totals = DailyVisitTotal.objects.filter(
+        date__gte=start_date, date__lte=end_date, supplier=supplier
+    ).aggregate(
+        visits=Sum('visits'),
+        unique_sessions=Sum('unique_sessions'),
+        unique_ips=Sum('unique_ips'),
+    )
+
+    rollups = DailyVisitRollup.objects.filter(date__gte=start_date, date__lte=end_date)
+    if supplier is not None:
+        rollups = rollups.filter(supplier=supplier)
+
+    def breakdown(field):
+        return dict(
+            rollups.values_list(field).annotate(total=Sum('visits')).values_list(field, 'total').order_by()
+        )
+
+    return {
+        'visits': totals['visits'] or 0,
+        'unique_sessions': totals['unique_sessions'] or 0,
+        'unique_ips': totals['unique_ips'] or 0,
+        'devices': breakdown('device_type'),
+        'page_types': breakdown('page_type'),
+    }
@@ -0,0 +1,40 @@
+import atexit
+
+from django.conf import settings
+
+from core.utils.buffer_utils import WriteBuffer
+
+
+class VisitBuffer(WriteBuffer):
+    """
+    Page visits (dicts of WebsiteStatistic field values), written to
+    WebsiteStatistic with `bulk_create` by the buffer's background thread.
+    """
+
+    name = 'visit-buffer'
+
+    def write(self, visits):
+        from core.models import WebsiteStatistic, Supplier
+
+        # One lookup for the stores visited in this batch
+        store_slugs = {visit['store_slug'] for visit in visits if visit.get('store_slug')}
+        supplier_ids = dict(
+            Supplier.objects.filter(store_id__in=store_slugs).values_list('store_id', 'id')
+        ) if store_slugs else {}
+
+        records = []
+        for visit in visits:
+            store_slug = visit.pop('store_slug', None)
+            if store_slug and not visit.get('supplier_id'):
+                visit['supplier_id'] = supplier_ids.get(store_slug)
+            records.append(WebsiteStatistic(**visit))
+
+        WebsiteStatistic.objects.bulk_create(records, batch_size=self.batch_size)
+
+
+visit_buffer = VisitBuffer(
+    max_size=getattr(settings, 'VISIT_TRACKING_BUFFER_SIZE', 10000),
+    batch_size=getattr(settings, 'VISIT_TRACKING_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'VISIT_TRACKING_FLUSH_INTERVAL', 2.0),
+)
+atexit.register(visit_buffer.shutdown)
@@ -0,0 +1,285 @@
+import logging
+import os
+import random
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from core.utils.settings_utils import get_system_settings
+from core.utils.whatsapp_utils import post_whatsapp_message
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'WHATSAPP_OUTBOX_MAX_ATTEMPTS', 6)
+# Retry n waits BACKOFF_BASE * 2**(n-1) seconds (+/-20% jitter), capped at BACKOFF_MAX
+BACKOFF_BASE = getattr(settings, 'WHATSAPP_OUTBOX_BACKOFF_BASE', 30)
+BACKOFF_MAX = getattr(settings, 'WHATSAPP_OUTBOX_BACKOFF_MAX', 60 * 60)
+# A claimed message goes back to the queue if its worker hasn't finished by then
+SEND_LEASE = timedelta(seconds=120)
+# Messages per number per RATE_WINDOW; the rest are deferred, not failed
+RATE_LIMIT = getattr(settings, 'WHATSAPP_RATE_LIMIT_PER_MINUTE', 6)
+RATE_WINDOW = timedelta(minutes=1)
+# Sent messages are kept this long (for the admin and the rate limit), then purged
+SENT_RETENTION = timedelta(days=getattr(settings, 'WHATSAPP_OUTBOX_SENT_RETENTION_DAYS', 30))
+PURGE_INTERVAL = 60 * 60
+# Body left on sensitive messages once they are done with
+REDACTED_MESSAGE = '[redacted]'
+
+# Serialises claims between the threads of one process; other processes
+# are kept apart by SKIP LOCKED on databases that support it
+_claim_lock = threading.Lock()
+
+
+def lock_unclaimed(queryset):
+    """
+    `select_for_update()` skipping the rows another worker has locked.
+    SKIP LOCKED needs MySQL 8.0.1+ (MariaDB 10.6+); on older servers the
+    query waits for the other worker's transaction instead, which is slower
+    but still hands each row to a single worker.
+    """
+    features = connections[queryset.db].features
+    return queryset.select_for_update(skip_locked=features.has_select_for_update_skip_locked)
+
+
+def retry_delay(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_due_messages(limit):
+    """Lease up to `limit` due messages to the calling worker."""
+    from core.models import WhatsAppOutboxMessage as Outbox
+
+    now = timezone.now()
+    with _claim_lock, transaction.atomic():
+        ids = list(
+            lock_unclaimed(Outbox.objects.all())
+            .filter(status__in=[Outbox.STATUS_PENDING, Outbox.STATUS_SENDING], next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            Outbox.objects.filter(id__in=ids).update(
+                status=Outbox.STATUS_SENDING, next_attempt_at=now + SEND_LEASE
+            )
+    return list(Outbox.objects.filter(id__in=ids).order_by('created_at')) if ids else []
+
+
+def _is_permanent_failure(status_code):
+    # Rejected requests won't succeed on retry; timeouts, throttling and 5xx might
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+def _redact(message):
+    """Wipe a sensitive message's body; returns the extra field to save."""
+    if not message.sensitive:
+        return []
+    message.message = REDACTED_MESSAGE
+    return ['message']
+
+
+def _mark_sent(message):
+    message.status = message.STATUS_SENT
+    message.attempts += 1
+    message.sent_at = timezone.now()
+    message.last_error = ''
+    message.save(update_fields=['status', 'attempts', 'sent_at', 'last_error', *_redact(message)])
+
+
+def _mark_failed(message, error, permanent=False):
+    message.attempts += 1
+    message.last_error = error[:2000]
+    update_fields = ['status', 'attempts', 'last_error', 'next_attempt_at']
+    if permanent or message.attempts >= MAX_ATTEMPTS:
+        message.status = message.STATUS_DEAD
+        update_fields += _redact(message)
+        logger.error(f"WhatsApp to {message.phone} dead-lettered after {message.attempts} attempts: {error}")
+    else:
+        message.status = message.STATUS_PENDING
+        message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+    message.save(update_fields=update_fields)
+
+
+def _defer(message, until):
+    message.status = message.STATUS_PENDING
+    message.next_attempt_at = until
+    message.save(update_fields=['status', 'next_attempt_at'])
+
+
+def process_outbox(batch_size=20):
+    """
+    Deliver one batch of due outbox messages. Returns counters
+    (`claimed`, `sent`, `retried`, `dead`, `deferred`).
+    """
+    from core.models import WhatsAppOutboxMessage as Outbox
+
+    counters = {'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'deferred': 0}
+    messages = claim_due_messages(batch_size)
+    counters['claimed'] = len(messages)
+    if not messages:
+        return counters
+
+    system_settings = get_system_settings()
+    if not system_settings or not system_settings.whatsapp_api_url or not system_settings.whatsapp_api_key:
+        logger.error("WhatsApp API settings are incomplete, outbox delivery postponed.")
+        for message in messages:
+            _defer(message, timezone.now() + timedelta(seconds=BACKOFF_MAX))
+        counters['deferred'] = len(messages)
+        return counters
+
+    # Per-number rate limit: what each number already received in the window, one query
+    now = timezone.now()
+    sent_recently = dict(
+        Outbox.objects.filter(
+            phone__in={message.phone for message in messages},
+            status=Outbox.STATUS_SENT,
+            sent_at__gte=now - RATE_WINDOW,
+        ).values('phone').annotate(count=Count('id')).values_list('phone', 'count').order_by()
+    )
+
+    for message in messages:
+        if sent_recently.get(message.phone, 0) >= RATE_LIMIT:
+            _defer(message, now + RATE_WINDOW)
+            counters['deferred'] += 1
+            continue
+
+        try:
+            response = post_whatsapp_message(
+                system_settings.whatsapp_api_url, system_settings.whatsapp_api_key,
+                message.phone, message.message,
+            )
+        except requests.RequestException as exc:
+            error, permanent = f"{type(exc).__name__}: {exc}", False
+        else:
+            if response.status_code == 200:
+                _mark_sent(message)
+                sent_recently[message.phone] = sent_recently.get(message.phone, 0) + 1
+                counters['sent'] += 1
+                logger.info(f"WhatsApp sent to {message.phone}")
+                continue
+            error = f"{response.status_code} - {response.text[:500]}"
+            permanent = _is_permanent_failure(response.status_code)
+
+        logger.warning(f"WhatsApp attempt {message.attempts + 1} to {message.phone} failed: {error}")
+        _mark_failed(message, error, permanent=permanent)
+        counters['dead' if message.status == Outbox.STATUS_DEAD else 'retried'] += 1
+
+    return counters
+
+
+def purge_sent_messages(older_than=SENT_RETENTION, batch_size=1000):
+    """Delete sent messages older than `older_than`, in batches. Returns the rows deleted."""
+    from core.models import WhatsAppOutboxMessage as Outbox
+
+    cutoff = timezone.now() - older_than
+    deleted = 0
+    while True:
+        ids = list(
+            Outbox.objects.filter(status=Outbox.STATUS_SENT, sent_at__lt=cutoff)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += Outbox.objects.filter(id__in=ids).delete()[0]
+
+
+class OutboxWorkerPool:
+    """
+    Fixed-size pool of daemon threads draining the WhatsApp outbox (and
+    dispatching pending notifications into it).
+
+    `wake()` is called after a message is queued; otherwise the workers
+    poll every `poll_interval` seconds for retries that became due and for
+    messages queued by other processes. The outbox lives in the database,
+    so nothing is lost when the process restarts. Old sent messages are
+    purged about once an hour.
+    """
+
+    def __init__(self, size=2, batch_size=20, poll_interval=15.0):
+        self.size = size
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._workers = []
+        self._pid = os.getpid()
+        self._next_purge = 0
+
+    def wake(self):
+        if self.size <= 0:
+            return
+        self._ensure_workers()
+        self._wakeup.set()
+
+    def _ensure_workers(self):
+        if self._workers and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: the parent's threads didn't survive
+                self._reset()
+            if not self._workers:
+                for index in range(self.size):
+                    worker = threading.Thread(target=self._run, name=f'whatsapp-outbox-{index}', daemon=True)
+                    worker.start()
+                    self._workers.append(worker)
+
+    def _run(self):
+        from core.utils.notification_utils import dispatch_notifications
+
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                # Notifications whose digest window closed feed the outbox first
+                dispatch_notifications()
+            except Exception:
+                logger.exception("Notification dispatch failed")
+            try:
+                claimed = process_outbox(self.batch_size)['claimed']
+                self._purge_if_due()
+            except Exception:
+                logger.exception("WhatsApp outbox worker failed")
+            finally:
+                close_old_connections()
+            if claimed < self.batch_size:
+                # Drained: sleep until woken or the next poll
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _purge_if_due(self):
+        with self._lock:
+            if time.monotonic() < self._next_purge:
+                return
+            self._next_purge = time.monotonic() + PURGE_INTERVAL
+        purged = purge_sent_messages()
+        if purged:
+            logger.info(f"Purged {purged} sent WhatsApp messages")
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wakeup.set()
+        if self._pid == os.getpid():
+            for worker in self._workers:
+                worker.join(timeout)
+
+
+outbox_workers = OutboxWorkerPool(
+    # 0 leaves delivery to the `process_whatsapp_outbox` command
+    size=getattr(settings, 'WHATSAPP_OUTBOX_WORKERS', 2),
+    batch_size=getattr(settings, 'WHATSAPP_OUTBOX_BATCH_SIZE', 20),
+    poll_interval=getattr(settings, 'WHATSAPP_OUTBOX_POLL_INTERVAL', 15.0),
+)
+
+
+def wake_outbox_workers():
+    outbox_workers.wake()
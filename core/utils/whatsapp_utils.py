@@ -2,38 +2,45 @@ import requests
 import logging
 import threading
 
-from django.db import connection
-from core.models import SystemSettings
+from django.conf import settings as django_settings
+from django.db import transaction
+from requests.adapters import HTTPAdapter
+from core.utils.settings_utils import get_system_settings
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) seconds
+WHATSAPP_TIMEOUT = getattr(django_settings, 'WHATSAPP_TIMEOUT', (5, 20))
 
-def _do_send(phone: str, message: str, api_url: str, api_key: str) -> None:
-    """Background thread: send a WhatsApp message."""
-    connection.close()  # avoid inheriting the parent thread's DB connection
-    try:
-        r = requests.post(
-                api_url,
-                headers={"X-API-Key": api_key, "Content-Type": "application/json"},
-                json={"phone": phone, "message": message},
-                timeout=20,
-                verify=False,
-            )
-        if r.status_code == 200:
-            logger.info(f"WhatsApp sent to {phone}")
-            return
-        logger.warning(f"WhatsApp attempt failed: {r.status_code} - {r.text}")
-    except Exception as exc:
-        logger.warning(f"WhatsApp error: {exc}")
+_sessions = threading.local()
 
 
-def send_whatsapp_message(phone: str, message: str) -> bool:
-    """Send a WhatsApp message asynchronously in a background thread."""
-    settings = SystemSettings.objects.first()
-    if not settings or not settings.whatsapp_api_url or not settings.whatsapp_api_key:
-        logger.error("WhatsApp API settings are incomplete.")
-        return False
+def get_http_session():
+    """Keep-alive HTTP session for the WhatsApp API, one per thread."""
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = requests.Session()
+        # Retries are handled by the outbox, not inside one attempt
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions.session = session
+    return session
 
+
+def post_whatsapp_message(api_url: str, api_key: str, phone: str, message: str, verify: bool = False):
+    """POST one message to the WhatsApp API and return the response (raises on connection errors)."""
+    return get_http_session().post(
+        api_url,
+        headers={"X-API-Key": api_key, "Content-Type": "application/json"},
+        json={"phone": phone, "message": message},
+        timeout=WHATSAPP_TIMEOUT,
+        verify=verify,
+    )
+
+
+def normalize_phone(phone) -> str:
+    """Yemeni number in international form ("967XXXXXXXXX"), or None if it isn't one."""
     # Normalise phone number (add Yemen country code 967 if missing)
     phone = str(phone).strip()
     if phone.startswith("0"):
@@ -44,11 +51,28 @@ def send_whatsapp_message(phone: str, message: str) -> bool:
     # skip not yemeni number
     normalized = phone.lstrip("+")
     if not normalized.startswith("967") or len(normalized) != 12:
+        return None
+    return phone
+
+
+def send_whatsapp_message(phone: str, message: str) -> bool:
+    """
+    Queue a WhatsApp message in the outbox. It is delivered by the outbox
+    workers once the current transaction commits, with retries.
+    """
+    from core.models import WhatsAppOutboxMessage
+    from core.utils.whatsapp_outbox_utils import wake_outbox_workers
+
+    settings = get_system_settings()
+    if not settings or not settings.whatsapp_api_url or not settings.whatsapp_api_key:
+        logger.error("WhatsApp API settings are incomplete.")
+        return False
+
+    normalized = normalize_phone(phone)
+    if not normalized:
         logger.warning(f"WhatsApp: skipping non-Yemeni or invalid number '{phone}'.")
         return False
-    threading.Thread(
-        target=_do_send,
-        args=(phone, str(message), settings.whatsapp_api_url, settings.whatsapp_api_key),
-        daemon=True,
-    ).start()
+
+    WhatsAppOutboxMessage.objects.create(phone=normalized, message=str(message))
+    transaction.on_commit(wake_outbox_workers)
     return True
@@ -0,0 +1,88 @@
+import time
+
+from django.conf import settings
+
+from core.utils.cache_utils import bump_content_version, get_content_version
+
+# Seconds a graph is served from process memory before it is rebuilt anyway:
+# bounds staleness when the version bump doesn't reach this process's cache
+GRAPH_TTL = getattr(settings, 'WORKFLOW_GRAPH_TTL', 60)
+
+
+def workflow_content(workflow_id):
+    """Namespace of a workflow's steps (priorities, flags and their statuses)."""
+    return f'workflow:{workflow_id}'
+
+
+class WorkflowGraph:
+    """
+    The steps of one OrderWorkflow in priority order, indexed by status.
+
+    Steps are shared between requests: read them, never modify or save them.
+    """
+
+    def __init__(self, workflow_id, steps):
+        self.workflow_id = workflow_id
+        self.steps = sorted(steps, key=lambda step: step.priority)
+        self._by_status = {step.status_id: step for step in self.steps}
+        self._next = {}
+        for step in self.steps:
+            self._next[step.status_id] = next(
+                (later for later in self.steps if later.priority > step.priority), None
+            )
+
+    def __bool__(self):
+        return bool(self.steps)
+
+    def step_for(self, status_id):
+        """The step of `status_id` in this workflow, or None."""
+        return self._by_status.get(status_id)
+
+    def next_step(self, status_id):
+        """The step after `status_id` by priority, or None at the end (or off the workflow)."""
+        return self._next.get(status_id)
+
+    def is_final(self, status_id):
+        """True if `status_id` is a step of this workflow and only cancellation comes after it."""
+        step = self.step_for(status_id)
+        return bool(step) and all(
+            later.status.slug == 'cancelled' for later in self.steps if later.priority > step.priority
+        )
+
+    def is_forward(self, from_status_id, to_status_id):
+        """True if moving between the two statuses goes up in priority."""
+        current, target = self.step_for(from_status_id), self.step_for(to_status_id)
+        return bool(current and target and target.priority > current.priority)
+
+
+# {workflow_id: (version, built_at, WorkflowGraph)}, per process
+_graphs = {}
+
+
+def get_workflow_graph(workflow_id):
+    """
+    The WorkflowGraph of `workflow_id`, built with one query the first time
+    and then served from process memory until the workflow version is bumped
+    (WorkflowStep / OrderStatus changes, see core.signals) or GRAPH_TTL has
+    passed.
+    """
+    from core.models import WorkflowStep
+
+    if not workflow_id:
+        return None
+
+    version = get_content_version(workflow_content(workflow_id))
+    cached = _graphs.get(workflow_id)
+    if cached and cached[0] == version and time.monotonic() - cached[1] < GRAPH_TTL:
+        return cached[2]
+
+    steps = list(WorkflowStep.objects.filter(workflow_id=workflow_id).select_related('status'))
+    graph = WorkflowGraph(workflow_id, steps)
+    _graphs[workflow_id] = (version, time.monotonic(), graph)
+    return graph
+
+
+def invalidate_workflow_graphs(workflow_ids):
+    for workflow_id in set(workflow_ids):
+        if workflow_id:
+            bump_content_version(workflow_content(workflow_id))
@@ -6,6 +6,7 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 import json
 from core.models import Product, Review, Supplier
+from core.utils.store_utils import get_store_or_404
 
 class AddReviewView(LoginRequiredMixin, View):
     def post(self, request, product_id, store_id):
@@ -21,7 +22,7 @@ class AddReviewView(LoginRequiredMixin, View):
                 return JsonResponse({'success': False, 'message': 'الرجاء كتابة تعليق'}, status=400)
 
             product = get_object_or_404(Product, pk=product_id)
-            supplier = get_object_or_404(Supplier, store_id=store_id)
+            supplier = get_store_or_404(request, store_id)
 
             # Create or update review (one review per user per product)
             review, created = Review.objects.update_or_create(
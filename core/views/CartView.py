@@ -4,7 +4,6 @@ import random
 from urllib.parse import quote
 from django.views.generic import DetailView
 from django.views import View
-import math
 
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
@@ -13,8 +12,9 @@ from django.utils.decorators import method_decorator
 from core.models import Cart, Product, CartItem, Supplier, Order, OrderItem, Address
 from django.contrib.auth.mixins import LoginRequiredMixin
 from core.forms import ShippingAddressForm
+from core.utils.store_utils import get_store_or_404
 from core.utils.whatsapp_utils import send_whatsapp_message
-from core.utils.order_utils import complete_order_and_notify
+from core.utils.order_utils import complete_order_and_notify, create_order_items_from_cart
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +27,7 @@ class CartView(DetailView):
 
     def get_object(self, queryset=None):
         store_id = self.kwargs.get('store_slug') or self.kwargs.get('store_id')
-        supplier = get_object_or_404(Supplier, store_id=store_id)
+        supplier = get_store_or_404(self.request, store_id)
         cart = Cart.objects.filter(user=self.request.user, supplier=supplier).prefetch_related('cart_items__product__additional_images').first()
         if not cart:
             cart = Cart.objects.create(user=self.request.user, supplier=supplier)
@@ -36,35 +36,24 @@ class CartView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         store_id = self.kwargs.get('store_slug') or self.kwargs.get('store_id')
-        supplier = get_object_or_404(Supplier, store_id=store_id)
+        supplier = get_store_or_404(self.request, store_id)
         
         # Checkout Context
         context['supplier'] = supplier
         context['shipping_form'] = ShippingAddressForm()
         context['user_address'] = Address.objects.filter(user=self.request.user).first()
-        context['total_prices'] = [item.product.price * item.quantity for item in self.object.cart_items.all()]
-
-        # Calculate estimated delivery fee
-        user_address = context['user_address']
-        estimated_fee = 0
-        estimated_distance = None
-        if supplier.enable_delivery_fees and user_address and user_address.latitude and user_address.longitude and supplier.latitude and supplier.longitude:
-            R = 6371
-            phi1, phi2 = math.radians(float(supplier.latitude)), math.radians(float(user_address.latitude))
-            dphi = math.radians(float(user_address.latitude) - float(supplier.latitude))
-            dlambda = math.radians(float(user_address.longitude) - float(supplier.longitude))
-            a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-            estimated_distance = R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            estimated_fee = float(estimated_distance) * float(supplier.delivery_fee_ratio or 0)
-        
-        context['estimated_fee'] = estimated_fee
-        context['estimated_distance'] = estimated_distance
+
+        # Totals, offers and estimated delivery fee in a single pass (shared with the template)
+        summary = self.object.get_pricing_summary(address=context['user_address'])
+        context['total_prices'] = [item.get_subtotal() for item in summary.items]
+        context['estimated_fee'] = summary.delivery_fee
+        context['estimated_distance'] = summary.distance
         return context
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
         store_id = self.kwargs.get('store_slug') or self.kwargs.get('store_id')
-        supplier = get_object_or_404(Supplier, store_id=store_id)
+        supplier = get_store_or_404(request, store_id)
         form = ShippingAddressForm(request.POST)
 
         if form.is_valid():
@@ -72,16 +61,12 @@ class CartView(DetailView):
             # Note: Logic adapted from ConvertCartToOrder.checkout_select_address_or_custom_address
             order = Order.objects.create(
                 user=request.user, 
+                supplier=supplier,
                 total_amount=0 # will be calculated in set_total_amount
             )
             
             # Create Order Items
-            for cart_item in self.object.cart_items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity
-                )
+            create_order_items_from_cart(order, self.object)
 
             # Update User Profile with Name if provided
             full_name = request.POST.get('full_name', '').strip()
@@ -102,9 +87,6 @@ class CartView(DetailView):
             address.address_type = 'Shipping'
             address.postal_code = '00000'
             address.save()
-            
-            # Update order total with delivery fees and discounts
-            order.set_total_amount()
 
             # Check if user has a saved address, if not create one
             if not Address.objects.filter(user=request.user).exists():
@@ -150,10 +132,10 @@ def add_to_cart(request, product_id, store_id=None, store_slug=None):
     product = get_object_or_404(Product, pk=product_id)
     
     # Stock Check
-    if product.stock <= 0:
+    if product.available_stock <= 0:
         return JsonResponse({'success': False, 'message': 'عذراً، هذا المنتج غير متوفر حالياً'}, status=400)
         
-    supplier = get_object_or_404(Supplier, store_id=target_store_id)
+    supplier = get_store_or_404(request, target_store_id)
     user_cart, _ = Cart.objects.get_or_create(user=request.user, supplier=supplier)
 
     # Determine quantity to add (default 1)
@@ -175,10 +157,10 @@ def add_to_cart(request, product_id, store_id=None, store_slug=None):
 
     if not item_created:
         # Stock Check for total quantity
-        if cart_item.quantity + quantity_to_add > product.stock:
+        if cart_item.quantity + quantity_to_add > product.available_stock:
             return JsonResponse({
                 'success': False, 
-                'message': f'عذراً، الكمية المطلوبة غير متوفرة. المتوفر فقط: {product.stock}'
+                'message': f'عذراً، الكمية المطلوبة غير متوفرة. المتوفر فقط: {product.available_stock}'
             }, status=400)
             
         # If the item is already in the cart, update the quantity
@@ -186,10 +168,10 @@ def add_to_cart(request, product_id, store_id=None, store_slug=None):
         cart_item.save()
     else:
         # Stock Check for first add
-        if quantity_to_add > product.stock:
+        if quantity_to_add > product.available_stock:
              return JsonResponse({
                 'success': False, 
-                'message': f'عذراً، الكمية المطلوبة غير متوفرة. المتوفر فقط: {product.stock}'
+                'message': f'عذراً، الكمية المطلوبة غير متوفرة. المتوفر فقط: {product.available_stock}'
             }, status=400)
             
         # If the item is not in the cart, create a new cart item
@@ -206,7 +188,7 @@ def add_to_cart(request, product_id, store_id=None, store_slug=None):
 @login_required
 def sub_to_cart(request, product_id, store_id=None, store_slug=None):
     target_store_id = store_slug or store_id
-    supplier = get_object_or_404(Supplier, store_id=target_store_id)
+    supplier = get_store_or_404(request, target_store_id)
     product = get_object_or_404(Product, pk=product_id)
     user_cart = Cart.objects.get(user=request.user, supplier=supplier)
 
@@ -244,15 +226,15 @@ def sub_to_cart(request, product_id, store_id=None, store_slug=None):
 class IncreaseQuantityView(View):
     def post(self, request, item_id, *args, **kwargs):
         store_id = self.kwargs.get('store_slug') or self.kwargs.get('store_id')
-        supplier = get_object_or_404(Supplier, store_id=store_id)
+        supplier = get_store_or_404(request, store_id)
         cart = get_object_or_404(Cart, user=request.user, supplier=supplier)
         cart_item = get_object_or_404(CartItem, pk=item_id, cart=cart)
         
         # Stock Check
-        if cart_item.quantity + 1 > cart_item.product.stock:
+        if cart_item.quantity + 1 > cart_item.product.available_stock:
             return JsonResponse({
                 'success': False, 
-                'message': f'عذراً، لا يمكن إضافة المزيد. المتوفر فقط: {cart_item.product.stock}'
+                'message': f'عذراً، لا يمكن إضافة المزيد. المتوفر فقط: {cart_item.product.available_stock}'
             }, status=400)
 
         # Implement the logic to increase the quantity
@@ -271,7 +253,7 @@ class IncreaseQuantityView(View):
 class DecreaseQuantityView(View):
     def post(self, request, item_id, *args, **kwargs):
         store_id = self.kwargs.get('store_slug') or self.kwargs.get('store_id')
-        supplier = get_object_or_404(Supplier, store_id=store_id)
+        supplier = get_store_or_404(request, store_id)
         cart = get_object_or_404(Cart, user=request.user, supplier=supplier)
         
         cart_item = get_object_or_404(CartItem, pk=item_id, cart__user=request.user)
@@ -298,7 +280,7 @@ class DecreaseQuantityView(View):
 class RemoveItemView(View):
     def post(self, request, item_id, *args, **kwargs):
         store_id = self.kwargs.get('store_slug') or self.kwargs.get('store_id')
-        supplier= get_object_or_404(Supplier, store_id=store_id)
+        supplier = get_store_or_404(request, store_id)
         cart_item = get_object_or_404(CartItem, pk=item_id, cart__user=request.user)
         cart = get_object_or_404(Cart, user=request.user, supplier=supplier)
         # Implement the logic to remove the item
@@ -316,7 +298,7 @@ class RemoveItemView(View):
 @login_required
 def get_cart_status(request, store_id=None, store_slug=None):
     target_store_id = store_slug or store_id
-    supplier = get_object_or_404(Supplier, store_id=target_store_id)
+    supplier = get_store_or_404(request, target_store_id)
     try:
         cart = Cart.objects.get(user=request.user, supplier=supplier)
         items = [
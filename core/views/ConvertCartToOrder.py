@@ -2,13 +2,12 @@ from core.models import *
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 import logging
-import math
-from decimal import Decimal
 from django.contrib.auth.decorators import login_required
 from core.forms import ShippingAddressForm
 from django.contrib import messages
+from core.utils.store_utils import get_store_or_404
 from core.utils.whatsapp_utils import send_whatsapp_message
-from core.utils.order_utils import complete_order_and_notify
+from core.utils.order_utils import complete_order_and_notify, create_order_items_from_cart
 import random
 from urllib.parse import quote
 
@@ -21,27 +20,17 @@ logger = logging.getLogger(__name__)
 
 @login_required
 def checkout_select_address_or_custom_address(request, store_id):
-    supplier = get_object_or_404(Supplier, store_id=store_id)
+    supplier = get_store_or_404(request, store_id)
     cart = Cart.objects.get(user=request.user, supplier=supplier)
     
     order = cart
-    # for cart_item in cart.cartitem_set.all():
-    order_items = CartItem.objects.filter(cart=order)
     user_address = Address.objects.filter(user=request.user).first()
-    
-    # Calculate estimated fee for registered address
-    estimated_fee = Decimal('0')
-    estimated_distance = None
-    if supplier.enable_delivery_fees and user_address and user_address.latitude and user_address.longitude and supplier.latitude and supplier.longitude:
-        # We can use the logic from Order here too if we want, but since we don't have an order yet:
-        R = 6371
-        phi1, phi2 = math.radians(float(supplier.latitude)), math.radians(float(user_address.latitude))
-        dphi = math.radians(float(user_address.latitude) - float(supplier.latitude))
-        dlambda = math.radians(float(user_address.longitude) - float(supplier.longitude))
-        a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-        estimated_distance = R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        fee = float(estimated_distance) * float(supplier.delivery_fee_ratio or 0)
-        estimated_fee = Decimal(str(fee)).quantize(Decimal('0.01'))
+
+    # Items, offers and estimated fee for the registered address in one pass
+    summary = cart.get_pricing_summary(address=user_address)
+    order_items = summary.items
+    estimated_fee = summary.delivery_fee
+    estimated_distance = summary.distance
 
 
 
@@ -50,10 +39,8 @@ def checkout_select_address_or_custom_address(request, store_id):
         if form.is_valid():           
             address = form.save(commit=False)
             
-            created_order = Order.objects.create(user=request.user, total_amount=cart.get_total_amount())
-            for cart_item in cart.cart_items.all():
-                OrderItem.objects.create(order=created_order
-                , product=cart_item.product, quantity=cart_item.quantity)
+            created_order = Order.objects.create(user=request.user, supplier=supplier, total_amount=cart.get_total_amount())
+            create_order_items_from_cart(created_order, cart)
             
             cart.cart_items.all().delete()
             address.order = created_order
@@ -91,11 +78,10 @@ def checkout_select_address_or_custom_address(request, store_id):
   
   
 def existing_address(request, store_id):
-    supplier = get_object_or_404(Supplier, store_id=store_id)
+    supplier = get_store_or_404(request, store_id)
     cart = Cart.objects.get(user=request.user, supplier=supplier) 
-    order = Order.objects.create(user=request.user, total_amount=cart.get_total_after_discount())
-    for cart_item in cart.cart_items.all():
-        OrderItem.objects.create(order=order, product=cart_item.product, quantity=cart_item.quantity)
+    order = Order.objects.create(user=request.user, supplier=supplier, total_amount=cart.get_total_after_discount())
+    create_order_items_from_cart(order, cart)
 
     user_address = Address.objects.get(user = request.user)
 
@@ -1,4 +1,3 @@
-import math
 import logging
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import JsonResponse
@@ -6,30 +5,17 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Sum, Count
 from django.utils import timezone
-from core.models import Supplier, Order, OrderItem, ShippingAddress, OrderStatus, OrderNote, OrderPaymentReference
-from django.core.paginator import Paginator
+from core.models import Supplier, Order, OrderItem, OrderStatus, OrderNote, OrderPaymentReference
+from core.utils.delivery_utils import attach_delivery_fees
 from core.utils.merchant_utils import get_active_supplier
+from core.utils.order_utils import BULK_STATUS_LIMIT, bulk_update_order_status, parse_order_ids
+from core.utils.order_stats_utils import get_order_stats
+from core.utils.pagination_utils import paginate_by_cursor
+from core.utils.workflow_utils import get_workflow_graph
 
 logger = logging.getLogger(__name__)
 
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate the great circle distance between two points in km"""
-    if not all([lat1, lon1, lat2, lon2]):
-        return None
-    
-    R = 6371  # Earth radius in km
-    
-    phi1, phi2 = math.radians(float(lat1)), math.radians(float(lat2))
-    dphi = math.radians(float(lat2) - float(lat1))
-    dlambda = math.radians(float(lon2) - float(lon1))
-    
-    a = math.sin(dphi / 2)**2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-    
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-
 @login_required
 def merchant_orders(request):
     """Display all orders for the merchant's supplier"""
@@ -46,10 +32,8 @@ def merchant_orders(request):
         messages.error(request, 'You are not registered as a supplier.')
         return redirect('suppliers_list')
     
-    # Get all orders that contain products from this supplier
-    orders = Order.objects.filter(
-        order_items__product__supplier=supplier
-    ).distinct().order_by('-created_at')
+    # Get all orders placed with this supplier
+    orders = Order.objects.filter(supplier=supplier).select_related('user', 'pipeline_status').order_by('-created_at')
     
     # Get filter parameters
     status_filter = request.GET.get('status', '')
@@ -75,31 +59,38 @@ def merchant_orders(request):
     if date_to:
         orders = orders.filter(created_at__date__lte=date_to)
     
-    # Pagination
-    paginator = Paginator(orders, 20)  # Show 20 orders per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (created_at, id): no COUNT, no OFFSET
+    try:
+        page_obj = paginate_by_cursor(orders, after=request.GET.get('after'), before=request.GET.get('before'))
+    except ValueError:
+        page_obj = paginate_by_cursor(orders)
+    # Delivery fee of every listed order from one shipping address query
+    attach_delivery_fees(page_obj.object_list, supplier=supplier)
     
     # Calculate statistics
-    total_orders = orders.count()
-    pending_orders = orders.filter(pipeline_status__slug='pending').count()
-    confirmed_orders = orders.filter(pipeline_status__slug='confirmed').count()
-    
-    # Calculate total revenue
-    total_revenue = orders.filter(pipeline_status__slug='confirmed').aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
-    
-    # Get recent orders (last 7 days)
-    recent_orders = orders.filter(
-        created_at__gte=timezone.now() - timezone.timedelta(days=7)
-    ).count()
-    logger.info(orders)
+    if search_query:
+        # Free text search can't be answered from the daily stats: one aggregate over the matches
+        stats = orders.aggregate(
+            total_orders=Count('id'),
+            pending_orders=Count('id', filter=Q(pipeline_status__slug='pending')),
+            confirmed_orders=Count('id', filter=Q(pipeline_status__slug='confirmed')),
+            confirmed_revenue=Sum('total_amount', filter=Q(pipeline_status__slug='confirmed')),
+            recent_orders=Count('id', filter=Q(created_at__gte=timezone.now() - timezone.timedelta(days=7))),
+        )
+    else:
+        stats = get_order_stats(
+            supplier, statuses=[status_filter] if status_filter else None,
+            date_from=date_from or None, date_to=date_to or None,
+        )
+    total_orders = stats['total_orders']
+    pending_orders = stats['pending_orders']
+    confirmed_orders = stats['confirmed_orders']
+    total_revenue = stats['confirmed_revenue'] or 0
+    recent_orders = stats['recent_orders']
     
     # Workflow steps for filter
-    workflow_steps = []
-    if supplier.workflow:
-        workflow_steps = supplier.workflow.steps.all().select_related('status')
+    graph = get_workflow_graph(supplier.workflow_id)
+    workflow_steps = graph.steps if graph else []
 
     context = {
         'supplier': supplier,
@@ -138,24 +129,22 @@ def merchant_order_detail(request, order_id):
     # Get the order and verify it belongs to this supplier
     order = get_object_or_404(Order, id=order_id)
     
-    # Check if this order contains products from the supplier
-    order_items = order.order_items.filter(product__supplier=supplier)
-    if not order_items.exists():
+    # Check if this order was placed with the supplier
+    if not order.is_owned_by(supplier):
         messages.error(request, 'This order does not contain any of your products.')
         return redirect('merchant_orders')
+    summary = order.get_pricing_summary()
+    order_items = summary.items
     
-    # Get shipping address
-    try:
-        shipping_address = ShippingAddress.objects.get(order=order)
-    except ShippingAddress.DoesNotExist:
-        shipping_address = None
+    # Get shipping address (shared with the pricing summary)
+    shipping_address = order.get_shipping_address()
     
     # Customer Insights
     customer = order.user
     customer_orders = Order.objects.filter(
         user=customer,
-        order_items__product__supplier=supplier
-    ).distinct().order_by('-created_at')
+        supplier=supplier
+    ).order_by('-created_at')
     
     customer_stats = {
         'total_spent': sum(o.total_amount for o in customer_orders),
@@ -164,21 +153,12 @@ def merchant_order_detail(request, order_id):
     }
     
     # Workflow steps for visualization
-    workflow_steps = []
-    if supplier.workflow:
-        workflow_steps = supplier.workflow.steps.all().select_related('status')
-    
-    # Calculate Distance and Delivery Fee
-    distance_km = None
-    expected_delivery_fee = 0
-    
-    if supplier.enable_delivery_fees and supplier.latitude and supplier.longitude and shipping_address and shipping_address.latitude and shipping_address.longitude:
-        distance_km = order.calculate_distance(
-            supplier.latitude, supplier.longitude,
-            shipping_address.latitude, shipping_address.longitude
-        )
-        if distance_km:
-            expected_delivery_fee = order.get_expected_delivery_fee()
+    graph = get_workflow_graph(supplier.workflow_id)
+    workflow_steps = graph.steps if graph else []
+    
+    # Distance and delivery fee, already computed by the pricing summary
+    distance_km = summary.distance
+    expected_delivery_fee = summary.delivery_fee
 
     # Internal Notes
     order_notes = order.notes.all().select_related('user').order_by('-created_at')
@@ -188,13 +168,13 @@ def merchant_order_detail(request, order_id):
     
     # Pending Orders for FAB Quick View
     pending_orders = Order.objects.filter(
-        order_items__product__supplier=supplier,
+        supplier=supplier,
         pipeline_status__slug='pending'
-    ).distinct().order_by('-created_at')
+    ).order_by('-created_at')
     
     # Calculate order statistics for this supplier
     supplier_order_total = order.total_amount
-    items_total = sum(item.get_subtotal_with_discount() for item in order_items)
+    items_total = summary.net
     
     context = {
         'supplier': supplier,
@@ -278,9 +258,8 @@ def update_order_status(request, order_id):
         # Get the order and verify it belongs to this supplier
         order = get_object_or_404(Order, id=order_id)
         logger.info(order)
-        # Check if this order contains products from the supplier
-        order_items = order.order_items.filter(product__supplier=supplier)
-        if not order_items.exists():
+        # Check if this order was placed with the supplier
+        if not order.is_owned_by(supplier):
             messages.error(request, 'This order does not contain any of your products.')
             return redirect('merchant_orders')
         
@@ -321,33 +300,29 @@ def merchant_order_quick_view(request, order_id):
     # Get the order and verify it belongs to this supplier
     order = get_object_or_404(Order, id=order_id)
     
-    # Check if this order contains products from the supplier
-    order_items = order.order_items.filter(product__supplier=supplier)
-    if not order_items.exists():
+    # Check if this order was placed with the supplier
+    if not order.is_owned_by(supplier):
         return JsonResponse({'success': False, 'message': 'This order does not contain any of your products.'}, status=403)
+
+    # Stored line prices: no offer lookups for snapshotted orders
+    summary = order.get_pricing_summary()
+    order_items = summary.items
     
-    shipping_address = order.shippingaddress_set.first()
+    shipping_address = order.get_shipping_address()
     
     # Get workflow steps
-    workflow_steps = []
-    current_priority = 0
-    if supplier.workflow:
-        steps = supplier.workflow.steps.all().select_related('status').order_by('priority')
-        for step in steps:
-            workflow_steps.append({
-                'name': step.status.name,
-                'slug': step.status.slug,
-                'priority': step.priority
-            })
-            if order.pipeline_status and order.pipeline_status.slug == step.status.slug:
-                current_priority = step.priority
+    graph = get_workflow_graph(supplier.workflow_id)
+    workflow_steps = [
+        {'name': step.status.name, 'slug': step.status.slug, 'priority': step.priority}
+        for step in (graph.steps if graph else [])
+    ]
+    current_step = graph.step_for(order.pipeline_status_id) if graph else None
+    current_priority = current_step.priority if current_step else 0
 
     # Financial breakdown
-    items_gross = sum([item.get_subtotal() for item in order_items])
-    items_net = sum([item.get_subtotal_with_discount() for item in order_items])
-    discount_amount = items_gross - items_net
-    delivery_fee = order.get_expected_delivery_fee()
-    final_total = float(items_net + delivery_fee)
+    items_gross = summary.gross
+    discount_amount = summary.discount
+    final_total = float(summary.total)
 
     return JsonResponse({
         'success': True,
@@ -357,6 +332,7 @@ def merchant_order_quick_view(request, order_id):
             'total_amount': final_total,
             'subtotal': float(items_gross),
             'discount_amount': float(discount_amount),
+            'delivery_fee': float(summary.delivery_fee),
             'status': order.pipeline_status.name if order.pipeline_status else 'Pending',
             'status_slug': order.pipeline_status.slug if order.pipeline_status else 'pending',
             'cancellation_reason': order.cancellation_reason,
@@ -367,7 +343,7 @@ def merchant_order_quick_view(request, order_id):
                 {
                     'name': item.product.name,
                     'quantity': item.quantity,
-                    'price': float(item.product.get_price_with_offer()),
+                    'price': float(item.get_unit_price_with_discount()),
                     'subtotal': float(item.get_subtotal_with_discount())
                 } for item in order_items
             ],
@@ -399,8 +375,8 @@ def update_order_status_ajax(request, order_id):
     if not supplier:
         return JsonResponse({'success': False, 'message': 'Access denied.'}, status=403)
     
-    # Check if this order contains products from the supplier
-    if not order.order_items.filter(product__supplier=supplier).exists():
+    # Check if this order was placed with the supplier
+    if not order.is_owned_by(supplier):
         return JsonResponse({'success': False, 'message': 'Order not owned by you.'}, status=403)
     
     status_slug = request.POST.get('status')
@@ -424,3 +400,44 @@ def update_order_status_ajax(request, order_id):
         'new_status': new_status.name,
         'new_slug': new_status.slug
     })
+
+
+@login_required
+def bulk_update_order_status_ajax(request):
+    """AJAX view to move many orders to one status (order_ids, status, reason)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid method.'}, status=405)
+
+    # Verify supplier
+    if request.user.is_superuser and request.POST.get('supplier_id'):
+        supplier = get_object_or_404(Supplier, id=request.POST.get('supplier_id'))
+    else:
+        supplier = get_active_supplier(request)
+
+    if not supplier:
+        return JsonResponse({'success': False, 'message': 'Access denied.'}, status=403)
+
+    try:
+        order_ids = parse_order_ids(request.POST.getlist('order_ids'))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid order ids.'}, status=400)
+    if not order_ids:
+        return JsonResponse({'success': False, 'message': 'Missing order ids.'}, status=400)
+    if len(order_ids) > BULK_STATUS_LIMIT:
+        return JsonResponse({'success': False, 'message': f'At most {BULK_STATUS_LIMIT} orders at once.'}, status=400)
+
+    new_status = OrderStatus.objects.filter(slug=request.POST.get('status')).first()
+    if not new_status:
+        return JsonResponse({'success': False, 'message': 'Invalid status.'}, status=400)
+
+    results = bulk_update_order_status(
+        supplier, order_ids, new_status, reason=request.POST.get('reason'), user=request.user
+    )
+    updated = sum(1 for result in results if result['success'])
+    return JsonResponse({
+        'success': updated > 0,
+        'message': f'تم تحديث {updated} من {len(results)} طلبات إلى: {new_status.name}',
+        'new_status': new_status.name,
+        'new_slug': new_status.slug,
+        'results': results,
+    })
@@ -6,8 +6,13 @@ from core.models import Supplier, Product, ProductOffer, Promotion, SupplierAds,
 from core.forms import ProductForm, SupplierSettingsForm
 from django.db.models import Count, Sum, Avg
 from django.utils import timezone
-from core.models import SupplierAdPlatfrom
+from core.models import SupplierAdPlatfrom, WebsiteStatistic
 from core.utils.merchant_utils import get_active_supplier
+from core.utils.offer_utils import resolve_active_offers
+from core.utils.visit_rollup_utils import get_visit_summary
+from core.utils.order_stats_utils import get_order_stats
+from core.utils.stock_utils import adjust_stock
+from datetime import timedelta
 import logging
 
 logger = logging.getLogger("core.views.MyMerchant")
@@ -31,18 +36,12 @@ def my_merchant(request):
         # Should be caught by decorator, but as fallback
         return redirect('join_business')
     
-    # Simple Router Stats
-    orders = Order.objects.filter(order_items__product__supplier=supplier).distinct()
-    pending_orders = orders.filter(pipeline_status__slug='pending').count()
+    # Simple Router Stats (daily order stats rows, not the order history)
+    order_stats = get_order_stats(supplier)
     total_products = Product.objects.filter(supplier=supplier).count()
     
-    # Revenue (Confirmed orders)
-    total_revenue = orders.filter(pipeline_status__slug='confirmed').aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
-    
     # Recent items for widgets
-    recent_orders_list = orders.order_by('-created_at')[:5]
+    recent_orders_list = Order.objects.filter(supplier=supplier).order_by('-created_at')[:5]
     top_selling_products = Product.objects.filter(supplier=supplier).annotate(
         total_sold=Sum('orderitem__quantity')
     ).filter(total_sold__gt=0).order_by('-total_sold')[:5]
@@ -51,10 +50,10 @@ def my_merchant(request):
 
     context = {
         'supplier': supplier,
-        'pending_orders': pending_orders,
-        'total_orders': orders.count(),
+        'pending_orders': order_stats['pending_orders'],
+        'total_orders': order_stats['total_orders'],
         'total_products': total_products,
-        'total_revenue': total_revenue,
+        'total_revenue': order_stats['confirmed_revenue'],
         'recent_orders_list': recent_orders_list,
         'top_selling_products': top_selling_products,
         'avg_rating': avg_rating,
@@ -74,6 +73,7 @@ def merchant_products(request):
         return redirect('suppliers_list')
     
     products = Product.objects.filter(supplier=supplier)
+    resolve_active_offers(products)
     active_offers = ProductOffer.objects.filter(product__supplier=supplier, is_active=True)
     platform_promotions = PlatformOfferAd.objects.filter(product__supplier=supplier).order_by('-id')
     categories = Category.objects.all()
@@ -168,6 +168,15 @@ def merchant_analytics(request):
     
     avg_rating = products.aggregate(avg=Avg('review__rating'))['avg'] or 0
     total_reviews = products.aggregate(total=Count('review'))['total'] or 0
+
+    # Store visits over the last 30 days, from the daily rollups
+    today = timezone.now().date()
+    visit_summary = get_visit_summary(today - timedelta(days=29), today, supplier=supplier)
+    device_labels = dict(WebsiteStatistic.DEVICE_CHOICES)
+    visit_devices = sorted(
+        [(device_labels.get(device, device), count) for device, count in visit_summary['devices'].items()],
+        key=lambda item: -item[1]
+    )
     
     context = {
         'supplier': supplier,
@@ -175,6 +184,8 @@ def merchant_analytics(request):
         'avg_rating': avg_rating,
         'total_reviews': total_reviews,
         'total_products': products.count(),
+        'visit_summary': visit_summary,
+        'visit_devices': visit_devices,
     }
     
     return render(request, template_name, context)
@@ -214,12 +225,14 @@ def quick_update_stock(request, product_id):
         
         if new_stock is not None:
             try:
-                product.stock = int(new_stock)
-                product.save()
+                new_stock = int(new_stock)
+                if new_stock < 0:
+                    raise ValueError(new_stock)
+                adjust_stock(product.id, new_stock, user=request.user, note='تحديث سريع')
                 return JsonResponse({
                     'success': True, 
                     'message': 'تم تحديث المخزون بنجاح',
-                    'new_stock': product.stock
+                    'new_stock': new_stock
                 })
             except ValueError:
                 return JsonResponse({'success': False, 'message': 'قيمة المخزون غير صالحة'}, status=400)
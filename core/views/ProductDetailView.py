@@ -1,5 +1,10 @@
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404
 from core.models import Product, Cart, Supplier
+from core.utils.delivery_utils import get_delivery_fee
+from core.utils.offer_utils import resolve_related_offers
+from core.utils.store_utils import get_store_or_404
+from core.utils.view_counter_utils import count_view
 from django.contrib.auth.decorators import login_required
 
 # @login_required
@@ -18,23 +23,12 @@ def product_detail(request, pk, store_id=None, store_slug=None):
     if not target_slug:
          raise Http404("Store identifier missing")
          
-    if hasattr(request, 'current_store') and request.current_store.store_id == target_slug:
-        supplier = request.current_store
-    else:
-        supplier = get_object_or_404(Supplier, store_id=target_slug, is_active=True)
+    supplier = get_store_or_404(request, target_slug, active_only=True)
         
     store_id = supplier.store_id
     
-    # Visit tracking (session based)
-    if 'visited_products' not in request.session:
-        request.session['visited_products'] = []
-    
-    visited_products = request.session['visited_products']
-    if product.id not in visited_products:
-        product.views_count += 1
-        product.save(update_fields=['views_count'])
-        visited_products.append(product.id)
-        request.session['visited_products'] = visited_products
+    # Visit tracking (once per session, buffered and flushed in batches)
+    count_view(request, product)
 
     user_cart = None
     if request.user.is_authenticated:
@@ -63,30 +57,18 @@ def product_detail(request, pk, store_id=None, store_slug=None):
         from core.models import PlatformOfferAd
         from django.utils import timezone
         today = timezone.now().date()
-        context['platform_ads'] = PlatformOfferAd.objects.filter(
+        context['platform_ads'] = resolve_related_offers(PlatformOfferAd.objects.filter(
             start_date__lte=today,
             end_date__gte=today,
             is_approved=True,
             product__supplier__is_active=True
-        ).order_by('order').select_related('product', 'product__supplier')[:4]
+        ).order_by('order').select_related('product', 'product__supplier')[:4])
 
     # Calculate estimated delivery fee for mobile cart bar
     if request.user.is_authenticated:
         from core.models import Address
-        from decimal import Decimal
-        import math
-        address = Address.objects.filter(user=request.user).first()
-        estimated_fee = Decimal('0')
-        if supplier.enable_delivery_fees and address and address.latitude and address.longitude and supplier.latitude and supplier.longitude:
-            R = 6371
-            phi1, phi2 = math.radians(float(supplier.latitude)), math.radians(float(address.latitude))
-            dphi = math.radians(float(address.latitude) - float(supplier.latitude))
-            dlambda = math.radians(float(address.longitude) - float(supplier.longitude))
-            a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-            estimated_distance = R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            fee = float(estimated_distance) * float(supplier.delivery_fee_ratio or 0)
-            estimated_fee = Decimal(str(fee)).quantize(Decimal('0.01'))
-        context['estimated_fee'] = estimated_fee
+        address = Address.objects.filter(user=request.user).first() if supplier.enable_delivery_fees else None
+        _, context['estimated_fee'] = get_delivery_fee(supplier, address)
     else:
         context['estimated_fee'] = 0
 
@@ -1,18 +1,16 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 import logging
-import math
-from decimal import Decimal
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView
-from django.db.models import Exists, OuterRef, Subquery
 from django.utils import timezone
 from datetime import timedelta
 from django.http import Http404
 
-from core.models import (
-    Product, Category, ProductCategory, Cart, Order, 
-    SupplierAds, Supplier, Address, ProductOffer, CartItem
-)
+from core.models import Product, Cart, Order, Supplier, Address, CartItem
+from core.utils.catalog_utils import get_store_catalog
+from core.utils.delivery_utils import get_delivery_fee
+from core.utils.store_utils import get_store_or_404
+from core.utils.view_counter_utils import count_view
 
 logger = logging.getLogger(__name__)
 
@@ -22,92 +20,36 @@ def product_list(request, store_id=None, store_slug=None, category_id=None, subc
     if not target_slug:
         raise Http404("Store identifier missing")
 
-    # Use middleware-injected store if available and matching
-    if hasattr(request, 'current_store') and request.current_store.store_id == target_slug:
-        supplier = request.current_store
-    else:
-        supplier = get_object_or_404(Supplier, store_id=target_slug, is_active=True)
+    # Same instance NavigationMiddleware resolved for this request
+    supplier = get_store_or_404(request, target_slug, active_only=True)
     
     # Ensure store_id variable is consistent for template
     store_id = supplier.store_id
-    today = timezone.now().date()
-    
-    # Visit tracking (session based)
-    if 'visited_suppliers' not in request.session:
-        request.session['visited_suppliers'] = []
-    
-    visited_suppliers = request.session['visited_suppliers']
-    if supplier.id not in visited_suppliers:
-        supplier.views_count += 1
-        supplier.save(update_fields=['views_count'])
-        visited_suppliers.append(supplier.id)
-        request.session['visited_suppliers'] = visited_suppliers
     
-    # Subquery for active offers
-    active_offers = ProductOffer.objects.filter(
-        product=OuterRef('pk'),
-        is_active=True,
-        from_date__lte=today,
-        to_date__gte=today
-    )
+    # Visit tracking (once per session, buffered and flushed in batches)
+    count_view(request, supplier)
     
-    # Subquery for cart quantity
-    cart_qty = CartItem.objects.filter(
-        cart__user=request.user if request.user.is_authenticated else None,
-        cart__supplier=supplier,
-        product=OuterRef('pk')
-    ).values('quantity')[:1]
-    
-    queryset = Product.objects.filter(supplier=supplier, is_active=True).annotate(
-        has_active_offer=Exists(active_offers),
-        max_discount=Subquery(
-            active_offers.order_by('-discount_precentage').values('discount_precentage')[:1]
-        ),
-        quantity_in_cart=Subquery(cart_qty)
-    ).prefetch_related('additional_images')
-    
-    # Filter out out-of-stock products if supplier preference is set
-    if not supplier.show_out_of_stock:
-        queryset = queryset.filter(stock__gt=0)
+    # Shared catalog (partitioned products, categories, ads), cached per store
+    catalog = get_store_catalog(supplier, category_id, subcategory_id)
 
-    # Filter by category or subcategory
-    if subcategory_id:
-        queryset = queryset.filter(category_id=subcategory_id)
-    elif category_id:
-        queryset = queryset.filter(category__id=category_id)
-    
-    # Sort and Partition logic
-    queryset = queryset.order_by('-has_active_offer', '-max_discount', '-is_new', '-id')
-    
-    # Partition lists
-    offer_products = []
-    new_products = []
-    other_products = []
-    
-    for product in queryset:
-        if product.has_active_offer:
-            offer_products.append(product)
-        elif product.is_new:
-            new_products.append(product)
-        else:
-            other_products.append(product)
-
-    supplier_ads = SupplierAds.objects.filter(supplier=supplier, is_active=True)
+    # Per-user layer: cart quantities on top of the shared product cards
+    cart_quantities = {}
+    if request.user.is_authenticated:
+        cart_quantities = dict(
+            CartItem.objects.filter(cart__user=request.user, cart__supplier=supplier)
+            .values_list('product_id', 'quantity')
+        )
+    for product in catalog['products']:
+        product.quantity_in_cart = cart_quantities.get(product.pk)
 
     # Context dictionary
     context = {
-        'products': queryset,
-        'offer_products': offer_products,
-        'new_products': new_products,
-        'other_products': other_products,
+        **catalog,
         'active_category_id': int(category_id) if category_id else None,
         'active_subcategory_id': int(subcategory_id) if subcategory_id else None,
         'active_store_id': store_id,
         'supplier': supplier,
-        'categories': Category.objects.filter(productcategory__products__supplier=supplier).distinct(),
-        'product_categories': ProductCategory.objects.filter(category_id=category_id, products__supplier=supplier).distinct() if category_id else None,
         'suppliers': Product.objects.values('supplier_id').distinct(),
-        'supplier_ads': supplier_ads,
         'nav_state': 'visitor',  # Force visitor layout (no sidebar) for storefront
     }
 
@@ -122,22 +64,8 @@ def product_list(request, store_id=None, store_slug=None, category_id=None, subc
         context['cart'] = user_cart
         
         # Calculate estimated delivery fee for mobile cart bar
-        address = Address.objects.filter(user=request.user).first()
-        estimated_fee = Decimal('0')
-        if supplier.enable_delivery_fees and address and address.latitude and address.longitude and supplier.latitude and supplier.longitude:
-            try:
-                R = 6371
-                phi1, phi2 = math.radians(float(supplier.latitude)), math.radians(float(address.latitude))
-                dphi = math.radians(float(address.latitude) - float(supplier.latitude))
-                dlambda = math.radians(float(address.longitude) - float(supplier.longitude))
-                a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-                estimated_distance = R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-                fee = float(estimated_distance) * float(supplier.delivery_fee_ratio or 0)
-                estimated_fee = Decimal(str(fee)).quantize(Decimal('0.01'))
-            except (ValueError, TypeError):
-                estimated_fee = Decimal('0')
-                
-        context['estimated_fee'] = estimated_fee
+        address = Address.objects.filter(user=request.user).first() if supplier.enable_delivery_fees else None
+        _, context['estimated_fee'] = get_delivery_fee(supplier, address)
     else:
         context['cart'] = None
         context['pending_orders'] = None
@@ -0,0 +1,22 @@
+from django.shortcuts import render
+
+from core.utils.offer_utils import resolve_active_offers
+from core.utils.search_utils import search_products, search_suppliers
+
+
+def product_search(request):
+    """Server-side product search across every active store, best matches first."""
+    q = request.GET.get('q', '').strip()
+    page_obj, products = search_products(q, page=request.GET.get('page') or 1)
+    resolve_active_offers(products)
+
+    # Matching stores are only listed above the first page of products
+    show_stores = page_obj is None or page_obj.number == 1
+    suppliers = search_suppliers(q) if q and show_stores else []
+
+    return render(request, 'product_search.html', {
+        'q': q,
+        'page_obj': page_obj,
+        'products': products,
+        'suppliers': suppliers,
+    })
@@ -6,8 +6,9 @@ from core.models import Cart, Supplier, SupplierCategory, PlatformOfferAd, Suppl
 from core.models import Order
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Q, Max, Count
 from core.forms import BusinessRequestForm
+from core.utils.offer_utils import resolve_related_offers
+from core.utils.ranking_utils import get_ranked_suppliers
 from django.contrib import messages
 
 
@@ -15,26 +16,8 @@ from django.contrib import messages
 def SuppliersListView(request):
     today = timezone.now().date()
     
-    # Annotate suppliers with max discount and offers count to sort by "strongest offers"
-    suppliers = Supplier.objects.filter(is_active=True).annotate(
-        max_offer_discount=Max(
-            'products__products_offer__discount_precentage',
-            filter=Q(
-                products__products_offer__is_active=True,
-                products__products_offer__from_date__lte=today,
-                products__products_offer__to_date__gte=today
-            )
-        ),
-        offers_count=Count(
-            'products__products_offer',
-            filter=Q(
-                products__products_offer__is_active=True,
-                products__products_offer__from_date__lte=today,
-                products__products_offer__to_date__gte=today
-            ),
-            distinct=True
-        )
-    ).order_by('-max_offer_discount', '-offers_count', '-priority')
+    # Suppliers sorted by "strongest offers" from the precomputed ranking
+    suppliers = get_ranked_suppliers()
     
     # Check if there is only one supplier
     if suppliers.count() == 1:
@@ -66,6 +49,7 @@ def SuppliersListView(request):
         is_approved=True,
         product__supplier__is_active=True
     ).order_by('order').select_related('product', 'product__supplier')
+    platform_ads = resolve_related_offers(platform_ads)
 
     
     if request.user.is_authenticated:
@@ -85,17 +69,8 @@ def SuppliersListView(request):
         
         
     
-    # Fetch producing family suppliers with max discount annotation
-    producing_family_suppliers = Supplier.objects.filter(category__producing_family=True, is_active=True).annotate(
-        max_offer_discount=Max(
-            'products__products_offer__discount_precentage',
-            filter=Q(
-                products__products_offer__is_active=True,
-                products__products_offer__from_date__lte=today,
-                products__products_offer__to_date__gte=today
-            )
-        )
-    ).distinct().order_by('-max_offer_discount', '-priority')
+    # Fetch producing family suppliers, same ranking
+    producing_family_suppliers = get_ranked_suppliers(producing_family=True)
 
     # Handle Business Request Form - Moved to separate view (join_business)
     # Form logic removed from here
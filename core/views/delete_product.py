@@ -4,6 +4,8 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from core.models import Product, Supplier, ProductOffer
 from core.utils.merchant_utils import get_active_supplier
+from core.utils.ranking_utils import refresh_supplier_rankings
+from core.utils.cache_utils import bump_content_version, store_content
 
 @login_required
 @require_POST
@@ -23,6 +25,8 @@ def toggle_product_status(request, product_id):
         # If deactivating, also deactivate related offers
         if not product.is_active:
             ProductOffer.objects.filter(product=product).update(is_active=False)
+            refresh_supplier_rankings([product.supplier_id])
+            bump_content_version(store_content(product.supplier_id))
         
         status_text = "تنشيط" if product.is_active else "تعطيل"
         return JsonResponse({
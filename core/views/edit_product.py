@@ -9,6 +9,17 @@ import json
 from core.forms import ProductForm
 from core.models import Supplier, ProductCategory, Product, Category, ProductImage
 from core.utils.merchant_utils import get_active_supplier
+from core.utils.stock_utils import adjust_stock
+
+
+def _save_product(request, form, supplier):
+    """Save the edited product; a changed stock is applied through the ledger."""
+    product = form.save(commit=False)
+    product.supplier = supplier
+    product.save()
+    if 'stock' in form.changed_data:
+        adjust_stock(product.pk, form.cleaned_data['stock'], user=request.user, note='تعديل المنتج')
+    return product
 
 
 @login_required
@@ -54,9 +65,7 @@ def edit_product(request, product_id):
             try:
                 form = ProductForm(request.POST, request.FILES, instance=product, supplier=supplier)
                 if form.is_valid():
-                    updated_product = form.save(commit=False)
-                    updated_product.supplier = supplier
-                    updated_product.save()
+                    updated_product = _save_product(request, form, supplier)
                     
                     # Handle additional images
                     additional_images = request.FILES.getlist('additional_images')
@@ -97,9 +106,7 @@ def edit_product(request, product_id):
         else:
             form = ProductForm(request.POST, request.FILES, instance=product, supplier=supplier)
             if form.is_valid():
-                updated_product = form.save(commit=False)
-                updated_product.supplier = supplier
-                updated_product.save()
+                updated_product = _save_product(request, form, supplier)
                 messages.success(request, 'تم تحديث المنتج بنجاح!')
                 
                 # If superuser is editing for another merchant, redirect back to that merchant's dashboard
@@ -5,8 +5,8 @@ from django.contrib.auth.models import User
 from django.contrib.auth import login as auth_login
 from django.db import transaction
 from core.forms import MerchantSignupForm
-from core.models import SystemSettings, Supplier, OTPVerification
-from core.utils.whatsapp_utils import send_whatsapp_message
+from core.models import Supplier, OTPVerification
+from core.utils.notification_utils import ADMIN_RECIPIENT, notify
 
 def join_business(request):
     # Redirect authenticated users
@@ -32,8 +32,7 @@ def join_business(request):
             
             # Send OTP via WhatsApp
             try:
-                msg = f"رمز التحقق الخاص بك هو: {otp}"
-                send_whatsapp_message(phone, msg)
+                notify('signup_otp', [phone], {'otp': otp})
                 messages.info(request, "تم إرسال رمز التحقق إلى الواتساب الخاص بك.")
                 return redirect('verify_signup_otp')
             except Exception as e:
@@ -114,32 +113,23 @@ def verify_signup_otp(request):
             
             # Admin Notification
             try:
-                settings = SystemSettings.objects.first()
-                if settings and settings.whatsapp_number:
-                    admin_msg = (
-                        f"*تم إنشاء حساب تاجر جديد وتحقق من هاتفه*\n\n"
-                        f"*اسم النشاط:* {supplier.name}\n"
-                        f"*اسم المالك:* {signup_data['owner_name']}\n"
-                        f"*رقم الهاتف:* {supplier.phone}\n"
-                        f"*البريد الإلكتروني:* {user.email}\n"
-                        f"*نوع النشاط:* {signup_data['business_type']}\n"
-                    )
-                    send_whatsapp_message(settings.whatsapp_number, admin_msg)
+                notify('merchant_signup_admin', [ADMIN_RECIPIENT], {
+                    'supplier_name': supplier.name,
+                    'owner_name': signup_data['owner_name'],
+                    'phone': supplier.phone,
+                    'email': user.email,
+                    'business_type': signup_data['business_type'],
+                })
             except: pass
 
             # User Welcoming Notification
             try:
-                login_url = request.build_absolute_uri('/login/')
-                welcome_msg = (
-                    f"أهلاً بك يا *{signup_data['owner_name']}* في عائلة رواج! 🌟\n\n"
-                    f"لقد تم تفعيل رقمك وإنشاء حسابك لمتجر *({supplier.name})*.\n\n"
-                    f"🔹 *رابط تسجيل الدخول:* {login_url}\n"
-                    f"🔹 *اسم المستخدم:* {user.username}\n"
-                    f"🔹 *كلمة المرور:* {signup_data['password']}\n"
-                    f"🔹 *الحالة:* قيد المراجعة حالياً\n\n"
-                    f"سيقوم فريقنا بتنشيط حسابك قريباً جداً. تصفح لوحة التحكم الآن! 🚀"
-                )
-                send_whatsapp_message(phone, welcome_msg)
+                notify('merchant_welcome', [phone], {
+                    'owner_name': signup_data['owner_name'],
+                    'supplier_name': supplier.name,
+                    'login_url': request.build_absolute_uri('/login/'),
+                    'username': user.username,
+                })
             except: pass
             
             # Log user in (flushes session)
@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from core.models import Supplier
+from core.utils.merchant_utils import can_manage_supplier, get_manageable_suppliers
 import logging
 
 logger = logging.getLogger("core.views.merchant_selection")
@@ -9,35 +10,18 @@ logger = logging.getLogger("core.views.merchant_selection")
 def select_merchant(request):
     if request.method == 'POST':
         supplier_id = request.POST.get('supplier_id')
-        if supplier_id:
+        if supplier_id and can_manage_supplier(request, supplier_id):
             supplier = Supplier.objects.filter(id=supplier_id).first()
             if supplier:
-                is_owner = getattr(supplier, 'user', None) == request.user
-                is_manager = supplier.managing_users.filter(id=request.user.id).exists()
-                
-                if request.user.is_superuser or is_owner or is_manager:
-                    request.session['active_supplier_id'] = supplier.id
-                    logger.info(f"User {request.user} selected merchant {supplier.name}")
-                    return redirect('my_merchant')
+                request.session['active_supplier_id'] = supplier.id
+                logger.info(f"User {request.user} selected merchant {supplier.name}")
+                return redirect('my_merchant')
     
     # Get all available suppliers for the user
     logger.info(f"User {request.user} (is_superuser: {request.user.is_superuser}) is accessing merchant selection")
     
-    # Get stores where user is owner
-    owned_suppliers = list(Supplier.objects.filter(user=request.user))
-    
-    # Get stores where user is manager
-    managed_suppliers = list(request.user.managed_suppliers.all())
-    
-    logger.debug(f"Owned stores: {[s.name for s in owned_suppliers]}, Managed stores: {[s.name for s in managed_suppliers]}")
-    
-    all_suppliers = []
-    for s in owned_suppliers:
-        if s not in all_suppliers:
-            all_suppliers.append(s)
-    for s in managed_suppliers:
-        if s not in all_suppliers:
-            all_suppliers.append(s)
+    # Stores where user is owner or manager (owned first), one query
+    all_suppliers = get_manageable_suppliers(request)
     
     logger.info(f"Total Suppliers Found for user {request.user}: {len(all_suppliers)}")
     
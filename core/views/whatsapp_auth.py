@@ -1,4 +1,3 @@
-import requests
 import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login as auth_login
@@ -8,7 +7,8 @@ from django.http import JsonResponse
 from django.urls import reverse
 from django.conf import settings
 from django.contrib import messages
-from core.models import SystemSettings
+from core.utils.settings_utils import get_system_settings
+from core.utils.whatsapp_utils import post_whatsapp_message
 
 logger = logging.getLogger(__name__)
 
@@ -44,7 +44,7 @@ def send_whatsapp_login_link(request):
     magic_link = request.build_absolute_uri(f"{relative_link}?token={token}&next={next_url}")
 
     # Fetch WhatsApp API settings
-    system_settings = SystemSettings.objects.first()
+    system_settings = get_system_settings(request)
     if not system_settings or not system_settings.whatsapp_api_url or not system_settings.whatsapp_api_key:
         return JsonResponse({'success': False, 'message': 'إعدادات خدمة WhatsApp غير مكتملة'}, status=500)
 
@@ -52,17 +52,13 @@ def send_whatsapp_login_link(request):
     message = f"مرحباً {user.first_name or user.username}،\n\nاستخدم الرابط التالي لتسجيل الدخول إلى حسابك:\n{magic_link}\n\nهذا الرابط صالح لمدة 10 دقائق."
 
     try:
-        response = requests.post(
+        # Sent synchronously: the user is told right away whether the link went out
+        response = post_whatsapp_message(
             system_settings.whatsapp_api_url,
-            headers={
-                'X-API-Key': system_settings.whatsapp_api_key,
-                'Content-Type': 'application/json'
-            },
-            json={
-                'phone': username,
-                'message': message
-            },
-            timeout=20
+            system_settings.whatsapp_api_key,
+            username,
+            message,
+            verify=True,
         )
         
         if response.status_code == 200:
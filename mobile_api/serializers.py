@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import models
+from core.utils import delivery_utils
+from core.utils.offer_utils import resolve_active_offers
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,6 +31,26 @@ from core.models import (
     SupplierAdPlatfrom, PlatformOfferAd, Currency
 )
 
+class ProductListSerializer(serializers.ListSerializer):
+    """Resolve the active offers of every product in the list with one query."""
+
+    def _get_product(self, obj):
+        return obj
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        products = [self._get_product(item) for item in items]
+        resolve_active_offers([p for p in products if p is not None and not hasattr(p, '_active_offer')])
+        return super().to_representation(items)
+
+
+class RelatedProductListSerializer(ProductListSerializer):
+    """Same as ProductListSerializer for rows that point at a product (cart/order items, ads)."""
+
+    def _get_product(self, obj):
+        return getattr(obj, 'product', None)
+
+
 class SupplierAdSerializer(serializers.ModelSerializer):
     supplier = serializers.PrimaryKeyRelatedField(read_only=True)
     class Meta:
@@ -55,6 +78,11 @@ class SupplierSerializer(serializers.ModelSerializer):
         model = Supplier
         fields = '__all__'
 
+class NearbySupplierSerializer(SupplierSerializer):
+    """A store of the "near me" list, with its distance from the caller."""
+    distance_km = serializers.FloatField(read_only=True)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -84,6 +112,7 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        list_serializer_class = ProductListSerializer
 
     def get_video(self, obj):
         """Return an absolute URL for the product video, or None if not present."""
@@ -108,6 +137,7 @@ class PlatformOfferAdSerializer(serializers.ModelSerializer):
     class Meta:
         model = PlatformOfferAd
         fields = '__all__'
+        list_serializer_class = RelatedProductListSerializer
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -118,19 +148,39 @@ class CartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = '__all__'
+        list_serializer_class = RelatedProductListSerializer
 
 class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(source='cart_items', many=True, read_only=True)
+    items = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
         fields = '__all__'
 
+    def get_items(self, obj):
+        """Serialize the items already loaded (with resolved offers) by the pricing summary."""
+        return CartItemSerializer(obj.get_pricing_summary().items, many=True, context=self.context).data
+
+    def get_summary(self, obj):
+        """Gross, net, discount, item count and estimated delivery fee of the cart."""
+        summary = obj.get_pricing_summary()
+        return {
+            'gross': str(summary.gross),
+            'net': str(summary.net),
+            'discount': str(summary.discount),
+            'delivery_fee': str(summary.delivery_fee),
+            'total': str(summary.total),
+            'item_count': summary.item_count,
+            'has_discount': summary.has_discount,
+        }
+
 class OrderItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     class Meta:
         model = OrderItem
         fields = '__all__'
+        list_serializer_class = RelatedProductListSerializer
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
@@ -186,12 +236,22 @@ class MerchantOrderItemSerializer(serializers.ModelSerializer):
     product_image  = serializers.SerializerMethodField()
     product_images = serializers.SerializerMethodField()
     unit_price     = serializers.DecimalField(
-        source='product.price', max_digits=10, decimal_places=2, read_only=True
+        source='get_unit_price', max_digits=10, decimal_places=2, read_only=True
+    )
+    discounted_unit_price = serializers.DecimalField(
+        source='get_unit_price_with_discount', max_digits=12, decimal_places=2, read_only=True
+    )
+    discount_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+    subtotal       = serializers.DecimalField(
+        source='get_subtotal_with_discount', max_digits=12, decimal_places=2, read_only=True
     )
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'product_name', 'product_image', 'product_images', 'quantity', 'unit_price']
+        fields = [
+            'id', 'product_name', 'product_image', 'product_images', 'quantity',
+            'unit_price', 'discounted_unit_price', 'discount_percentage', 'subtotal',
+        ]
 
     def _build_url(self, request, path):
         """Build an absolute URL for an image path."""
@@ -228,12 +288,13 @@ class MerchantOrderSerializer(serializers.ModelSerializer):
     status_name   = serializers.CharField(source='pipeline_status.name', read_only=True, default='غير محدد')
     status_slug   = serializers.CharField(source='pipeline_status.slug', read_only=True, default='')
     shipping      = serializers.SerializerMethodField()
+    delivery_fee  = serializers.SerializerMethodField()
     merchant      = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
         fields = [
-            'id', 'customer_name', 'total_amount', 'created_at', 'updated_at',
+            'id', 'customer_name', 'total_amount', 'delivery_fee', 'created_at', 'updated_at',
             'status_name', 'status_slug', 'merchant', 'items', 'shipping',
         ]
 
@@ -244,17 +305,22 @@ class MerchantOrderSerializer(serializers.ModelSerializer):
     def get_merchant(self, obj):
         """
         Return lightweight merchant info (logo + cover) for the order.
-        Finds the supplier via the first order item's product.
         """
-        try:
-            supplier = obj.order_items.first().product.supplier
-        except AttributeError:
+        supplier = obj.get_supplier()
+        if not supplier:
             return None
         return MerchantMiniSerializer(supplier, context=self.context).data
 
+    def get_delivery_fee(self, obj):
+        """Expected delivery fee (set in batch by `attach_delivery_fees` on lists)."""
+        fee = getattr(obj, 'delivery_fee', None)
+        if fee is None:
+            _, fee = delivery_utils.get_delivery_fee(obj.get_supplier(), obj.get_shipping_address())
+        return str(fee)
+
     def get_shipping(self, obj):
         """Return the first shipping address for the order."""
-        addr = obj.shippingaddress_set.first()
+        addr = obj.get_shipping_address()
         if not addr:
             return None
         return {
@@ -275,14 +341,16 @@ class MerchantProductSerializer(serializers.ModelSerializer):
     extra_images = serializers.SerializerMethodField()
     price_after_discount = serializers.SerializerMethodField()
     has_discount = serializers.SerializerMethodField()
+    available_stock = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'price', 'image', 'video', 
-            'is_new', 'is_active', 'stock', 'extra_images',
+            'is_new', 'is_active', 'stock', 'available_stock', 'extra_images',
             'price_after_discount', 'has_discount'
         ]
+        list_serializer_class = ProductListSerializer
 
     def _build_url(self, request, image_field):
         if not image_field:
@@ -7,7 +7,7 @@ from .views import (
     CategoryViewSet, HomeAPIView, StoreProfileAPIView,
     # Merchant management
     MerchantDashboardAPIView, MerchantSwitchAPIView,
-    MerchantOrdersAPIView, MerchantOrderDetailAPIView,
+    MerchantOrdersAPIView, MerchantOrderDetailAPIView, MerchantOrdersBulkStatusAPIView,
     MerchantProductsAPIView,
 )
 
@@ -37,5 +37,6 @@ urlpatterns = [
     path('merchant/switch/', MerchantSwitchAPIView.as_view(), name='merchant_switch'),
     path('merchant/orders/', MerchantOrdersAPIView.as_view(), name='merchant_orders'),
     path('merchant/orders/<int:order_id>/', MerchantOrderDetailAPIView.as_view(), name='merchant_order_detail'),
+    path('merchant/orders/bulk-status/', MerchantOrdersBulkStatusAPIView.as_view(), name='merchant_orders_bulk_status'),
     path('merchant/products/', MerchantProductsAPIView.as_view(), name='merchant_products'),
 ]
@@ -172,46 +172,105 @@ class UnifiedAuthAPIView(APIView):
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from django.utils import timezone
-from django.db.models import Q, Max, Count, OuterRef, Exists, Subquery
+from django.db.models import Q, Min, OuterRef, Exists, Subquery
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+import hashlib
+import math
+import time
 from .serializers import (
-    SupplierSerializer, ProductSerializer, 
+    SupplierSerializer, NearbySupplierSerializer, ProductSerializer, 
     CartSerializer, OrderSerializer
 )
 from core.models import Supplier, Product, Cart, Order
+from core.utils.geo_utils import get_nearby_suppliers
+from core.utils.offer_utils import resolve_active_offers
+from core.utils.ranking_utils import get_ranked_suppliers
+from core.utils.search_utils import search_products, search_suppliers
+from core.utils.cache_utils import HOME_CONTENT, get_content_version
+from core.utils.stock_utils import available_stock_q
 
 class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = SupplierSerializer
 
     def get_queryset(self):
-        today = timezone.now().date()
-        
-        # Annotate suppliers with max discount and offers count to sort by "strongest offers"
+        # Sorted by "strongest offers" from the precomputed ranking
         # Mirroring SuppliersListView logic
-        suppliers = Supplier.objects.filter(is_active=True).annotate(
-            max_offer_discount=Max(
-                'products__products_offer__discount_precentage',
-                filter=Q(
-                    products__products_offer__is_active=True,
-                    products__products_offer__from_date__lte=today,
-                    products__products_offer__to_date__gte=today
-                )
-            ),
-            offers_count=Count(
-                'products__products_offer',
-                filter=Q(
-                    products__products_offer__is_active=True,
-                    products__products_offer__from_date__lte=today,
-                    products__products_offer__to_date__gte=today
-                ),
-                distinct=True
-            )
-        ).order_by('-max_offer_discount', '-offers_count', '-priority')
-        
-        return suppliers
+        return get_ranked_suppliers()
+
+    NEARBY_DEFAULT_RADIUS_KM = 10
+    NEARBY_MAX_RADIUS_KM = 100
+    NEARBY_PAGE_SIZE = 20
+
+    @action(detail=False, methods=['GET'])
+    def nearby(self, request):
+        """
+        GET /stores/nearby/?lat=<lat>&lng=<lng>&radius=<km>&page=<n> — active stores
+        within `radius` km (default 10, max 100), nearest first, with `distance_km`.
+        """
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', self.NEARBY_DEFAULT_RADIUS_KM))
+            page = max(int(request.query_params.get('page', 1)), 1)
+        except (KeyError, ValueError):
+            return Response({'success': False, 'message': 'lat and lng are required numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(map(math.isfinite, (lat, lng, radius))):
+            return Response({'success': False, 'message': 'lat, lng and radius must be finite numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius <= 0:
+            return Response({'success': False, 'message': 'Invalid coordinates or radius.'}, status=status.HTTP_400_BAD_REQUEST)
+        radius = min(radius, self.NEARBY_MAX_RADIUS_KM)
+
+        # Geohash prefilter in SQL, exact distance ranking on the candidates' coordinates only
+        nearby = get_nearby_suppliers(lat, lng, radius, queryset=get_ranked_suppliers())
+        start = (page - 1) * self.NEARBY_PAGE_SIZE
+        rows = nearby[start:start + self.NEARBY_PAGE_SIZE]
+
+        distances = dict(rows)
+        suppliers = get_ranked_suppliers(
+            Supplier.objects.filter(pk__in=distances).select_related('currency').prefetch_related('category')
+        )
+        suppliers = sorted(suppliers, key=lambda supplier: (distances[supplier.pk], supplier.pk))
+        for supplier in suppliers:
+            supplier.distance_km = round(distances[supplier.pk], 2)
+
+        return Response({
+            'success': True,
+            'count': len(nearby),
+            'page': page,
+            'has_next': start + self.NEARBY_PAGE_SIZE < len(nearby),
+            'results': NearbySupplierSerializer(suppliers, many=True, context={'request': request}).data,
+        })
 
 class HomeAPIView(APIView):
+    # Upper bound for a cached payload; content signals invalidate it sooner
+    cache_timeout = 60 * 60
+
     def get(self, request):
         today = timezone.now().date()
+        version = get_content_version(HOME_CONTENT)
+        # Absolute media URLs in the payload depend on the host the app calls
+        cache_key = f"home_payload:{today.isoformat()}:{version}:{request.scheme}://{request.get_host()}"
+
+        cached = cache.get(cache_key)
+        if cached is None:
+            data, timeout = self._build_payload(request, today)
+            cached = {'data': data, 'built_at': int(time.time())}
+            cache.set(cache_key, cached, timeout)
+
+        etag = '"%s"' % hashlib.md5(f"{cache_key}:{cached['built_at']}".encode()).hexdigest()
+        response = get_conditional_response(request, etag=etag, last_modified=cached['built_at'])
+        if response is None:
+            response = Response(cached['data'])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(cached['built_at'])
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def _build_payload(self, request, today):
+        """Serialize the home screen; returns (data, seconds the data stays valid)."""
+        now = timezone.now()
         
         # 1. Categories
         from core.models import SupplierCategory, SupplierAdPlatfrom, PlatformOfferAd
@@ -221,12 +280,26 @@ class HomeAPIView(APIView):
         categories = SupplierCategory.objects.all()
         
         # 2. Supplier Ads (Full Width Top)
-        supplier_ads = SupplierAdPlatfrom.objects.filter(
+        supplier_ads = list(SupplierAdPlatfrom.objects.filter(
             is_active=True,
             approved=True,
-            start_datetime__lte=timezone.now(),
-            end_datetime__gte=timezone.now()
-        ).select_related('supplier')
+            start_datetime__lte=now,
+            end_datetime__gte=now
+        ).select_related('supplier'))
+
+        # Supplier ads start and end at any minute, so the payload must
+        # expire at the next boundary even if nothing is saved meanwhile
+        boundaries = [ad.end_datetime for ad in supplier_ads]
+        next_start = SupplierAdPlatfrom.objects.filter(
+            is_active=True,
+            approved=True,
+            start_datetime__gt=now
+        ).aggregate(next_start=Min('start_datetime'))['next_start']
+        if next_start:
+            boundaries.append(next_start)
+        timeout = self.cache_timeout
+        if boundaries:
+            timeout = max(1, min(timeout, int((min(boundaries) - now).total_seconds())))
         
         # 3. Platform Offer Ads (Horizontal Scroll)
         platform_ads = PlatformOfferAd.objects.filter(
@@ -237,64 +310,28 @@ class HomeAPIView(APIView):
         ).order_by('order').select_related('product', 'product__supplier')
         
         # 4. Producing Family Suppliers
-        producing_family_suppliers = Supplier.objects.filter(category__producing_family=True, is_active=True).annotate(
-            max_offer_discount=Max(
-                'products__products_offer__discount_precentage',
-                filter=Q(
-                    products__products_offer__is_active=True,
-                    products__products_offer__from_date__lte=today,
-                    products__products_offer__to_date__gte=today
-                )
-            ),
-            offers_count=Count(
-                'products__products_offer',
-                filter=Q(
-                    products__products_offer__is_active=True,
-                    products__products_offer__from_date__lte=today,
-                    products__products_offer__to_date__gte=today
-                ),
-                distinct=True
-            )
-        ).distinct().order_by('-max_offer_discount', '-priority')
+        producing_family_suppliers = get_ranked_suppliers(producing_family=True)
         
         # 5. All Suppliers (Same Logic as SupplierViewSet)
-        all_suppliers = Supplier.objects.filter(is_active=True).annotate(
-            max_offer_discount=Max(
-                'products__products_offer__discount_precentage',
-                filter=Q(
-                    products__products_offer__is_active=True,
-                    products__products_offer__from_date__lte=today,
-                    products__products_offer__to_date__gte=today
-                )
-            ),
-            offers_count=Count(
-                'products__products_offer',
-                filter=Q(
-                    products__products_offer__is_active=True,
-                    products__products_offer__from_date__lte=today,
-                    products__products_offer__to_date__gte=today
-                ),
-                distinct=True
-            )
-        ).order_by('-max_offer_discount', '-offers_count', '-priority')
+        all_suppliers = get_ranked_suppliers()
         
         # Serialize all and return together
-        return Response({
+        return {
             'success': True,
             'categories': SupplierCategorySerializer(categories, many=True, context={'request': request}).data,
             'supplier_ads': SupplierAdSerializer(supplier_ads, many=True, context={'request': request}).data,
             'platform_ads': PlatformOfferAdSerializer(platform_ads, many=True, context={'request': request}).data,
             'producing_families': SupplierSerializer(producing_family_suppliers, many=True, context={'request': request}).data,
             'all_suppliers': SupplierSerializer(all_suppliers, many=True, context={'request': request}).data,
-        })
+        }, timeout
 
 class StoreProfileAPIView(APIView):
     def get(self, request, store_id):
         from core.models import Supplier, Product, SupplierAds, ProductOffer
         from .serializers import SupplierSerializer, ProductSerializer
-        from django.shortcuts import get_object_or_404
+        from core.utils.store_utils import get_store_or_404
         
-        supplier = get_object_or_404(Supplier, store_id=store_id, is_active=True)
+        supplier = get_store_or_404(request, store_id, active_only=True)
         today = timezone.now().date()
         
         # Supplier Ads
@@ -317,7 +354,7 @@ class StoreProfileAPIView(APIView):
         )
         
         if not supplier.show_out_of_stock:
-            products = products.filter(stock__gt=0)
+            products = products.filter(available_stock_q())
             
         products = products.order_by('-has_active_offer', '-max_discount', '-is_new', '-id')
         
@@ -332,6 +369,9 @@ class StoreProfileAPIView(APIView):
                 new_products.append(product)
             else:
                 other_products.append(product)
+
+        # One offer lookup for the three product groups
+        resolve_active_offers(products)
                 
         # Simple serialization for ads
         ads_data = [{'id': ad.id, 'image': request.build_absolute_uri(ad.image.url) if ad.image else None} for ad in supplier_ads]
@@ -362,10 +402,30 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(supplier__store_id=store_id)
         return queryset
 
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        """
+        GET /products/search/?q=<text>&page=<n> — ranked products of every active store
+        matching all words of `q`; the first page also lists the matching stores.
+        """
+        q = request.query_params.get('q', '').strip()
+        page, products = search_products(q, page=request.query_params.get('page') or 1)
+        if page is None:
+            return Response({'success': False, 'message': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        context = self.get_serializer_context()
+        return Response({
+            'success': True,
+            'count': page.paginator.count,
+            'page': page.number,
+            'has_next': page.has_next(),
+            'stores': SupplierSerializer(search_suppliers(q), many=True, context=context).data if page.number == 1 else [],
+            'results': ProductSerializer(products, many=True, context=context).data,
+        })
+
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from core.models import Product, CartItem, Address, ShippingAddress, OrderItem
-from core.utils.order_utils import complete_order_and_notify
+from core.utils.order_utils import complete_order_and_notify, create_order_items_from_cart
 
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
@@ -553,9 +613,8 @@ class CartViewSet(viewsets.ModelViewSet):
         if not user_address:
             return Response({'success': False, 'message': 'لا يوجد عنوان مسجل. يرجى إضافة عنوان جديد.'}, status=status.HTTP_400_BAD_REQUEST)
             
-        order = Order.objects.create(user=request.user, total_amount=cart.get_total_after_discount())
-        for cart_item in cart.cart_items.all():
-            OrderItem.objects.create(order=order, product=cart_item.product, quantity=cart_item.quantity)
+        order = Order.objects.create(user=request.user, supplier=supplier, total_amount=cart.get_total_after_discount())
+        create_order_items_from_cart(order, cart)
             
         address_phone = user_address.phone or getattr(request.user, 'phone_number', None)
         if not address_phone:
@@ -607,9 +666,8 @@ class CartViewSet(viewsets.ModelViewSet):
         if not address_line1 or not phone:
             return Response({'success': False, 'message': 'الموقع ورقم الهاتف مطلوبان'}, status=status.HTTP_400_BAD_REQUEST)
             
-        order = Order.objects.create(user=request.user, total_amount=cart.get_total_after_discount())
-        for cart_item in cart.cart_items.all():
-            OrderItem.objects.create(order=order, product=cart_item.product, quantity=cart_item.quantity)
+        order = Order.objects.create(user=request.user, supplier=supplier, total_amount=cart.get_total_after_discount())
+        create_order_items_from_cart(order, cart)
             
         lat = request.data.get('latitude')
         lng = request.data.get('longitude')
@@ -675,7 +733,9 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
 # ── Merchant Management Views ─────────────────────────────────────────────────
 
 from .serializers import MerchantMiniSerializer, MerchantOrderSerializer
-from django.core.paginator import Paginator
+from core.utils.delivery_utils import attach_delivery_fees
+from core.utils.order_stats_utils import get_order_stats
+from core.utils.pagination_utils import DEFAULT_PAGE_SIZE, paginate_by_cursor, paginate_by_number
 
 
 def _assert_merchant_access(user, merchant_id):
@@ -703,26 +763,15 @@ def _assert_merchant_access(user, merchant_id):
 
 def _build_dashboard_stats(supplier):
     """Compute KPI dashboard stats for a supplier. Returns a dict."""
-    from django.utils import timezone
-    from django.db.models import Sum
-    from core.models import Order, Product
+    from core.models import Product
 
-    today = timezone.now().date()
-    supplier_orders = Order.objects.filter(
-        order_items__product__supplier=supplier
-    ).distinct()
-    revenue = (
-        supplier_orders
-        .filter(created_at__year=today.year, created_at__month=today.month)
-        .aggregate(total=Sum('total_amount'))['total'] or 0
-    )
+    # Order counters come from the daily order stats rows
+    order_stats = get_order_stats(supplier)
     return {
-        'orders_today': supplier_orders.filter(created_at__date=today).count(),
-        'orders_this_month': supplier_orders.filter(
-            created_at__year=today.year, created_at__month=today.month
-        ).count(),
-        'revenue_this_month': str(revenue),
-        'pending_orders': supplier_orders.filter(pipeline_status__slug='pending').count(),
+        'orders_today': order_stats['orders_today'],
+        'orders_this_month': order_stats['orders_this_month'],
+        'revenue_this_month': str(order_stats['amount_this_month']),
+        'pending_orders': order_stats['pending_orders'],
         'total_products': Product.objects.filter(supplier=supplier, is_active=True).count(),
         'low_stock_count': Product.objects.filter(
             supplier=supplier, is_active=True, stock__lt=5
@@ -735,9 +784,8 @@ def _recent_orders_qs(supplier, limit=10):
     from core.models import Order
     return (
         Order.objects
-        .filter(order_items__product__supplier=supplier)
-        .distinct()
-        .select_related('user', 'pipeline_status')
+        .filter(supplier=supplier)
+        .select_related('user', 'pipeline_status', 'supplier')
         .prefetch_related(
             'order_items__product',
             'order_items__product__additional_images',
@@ -797,7 +845,13 @@ class MerchantSwitchAPIView(APIView):
 
 
 class MerchantOrdersAPIView(APIView):
-    """GET /merchant/orders/?merchant_id=<id>&status=<slug>&page=<n> — paginated orders."""
+    """
+    GET /merchant/orders/?merchant_id=<id>&status=<slug>&cursor=<next_cursor> — orders, newest first.
+
+    Keyset paginated: pass the previous response's `next_cursor` to continue.
+    `page=<n>` (without a cursor) is still served for app versions released
+    before cursors.
+    """
 
     permission_classes = [permissions.IsAuthenticated]
 
@@ -812,26 +866,36 @@ class MerchantOrdersAPIView(APIView):
         from core.models import Order
         qs = (
             Order.objects
-            .filter(order_items__product__supplier=supplier)
-            .distinct()
-            .select_related('user', 'pipeline_status')
+            .filter(supplier=supplier)
+            .select_related('user', 'pipeline_status', 'supplier')
             .prefetch_related(
                 'order_items__product',
                 'order_items__product__additional_images',
-                'shippingaddress_set',
             )
-            .order_by('-created_at')
         )
         status_slug = request.query_params.get('status')
         if status_slug:
             qs = qs.filter(pipeline_status__slug=status_slug)
 
-        paginator = Paginator(qs, 20)
-        page = paginator.get_page(request.query_params.get('page', 1))
+        cursor = request.query_params.get('cursor')
+        page_number = request.query_params.get('page')
+        try:
+            if page_number and not cursor:
+                page = paginate_by_number(qs, page_number)
+            else:
+                page = paginate_by_cursor(qs, after=cursor)
+        except ValueError:
+            return Response({'success': False, 'message': 'Invalid cursor or page.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Shipping addresses and delivery fees of the whole page in one query
+        attach_delivery_fees(page.object_list, supplier=supplier)
+        # From the daily stats rows, never a COUNT over the orders
+        count = get_order_stats(supplier, statuses=[status_slug] if status_slug else None)['total_orders']
         return Response({
             'success': True,
-            'count': paginator.count,
-            'num_pages': paginator.num_pages,
+            'count': count,
+            'num_pages': max(-(-count // DEFAULT_PAGE_SIZE), 1),
+            'next_cursor': page.next_cursor,
+            'has_next': page.has_next,
             'results': MerchantOrderSerializer(page.object_list, many=True, context={'request': request}).data,
         })
 
@@ -845,7 +909,7 @@ class MerchantOrderDetailAPIView(APIView):
         from core.models import Order
         from django.shortcuts import get_object_or_404
         order = get_object_or_404(
-            Order.objects.select_related('user', 'pipeline_status')
+            Order.objects.select_related('user', 'pipeline_status', 'supplier')
             .prefetch_related(
                 'order_items__product',
                 'order_items__product__additional_images',
@@ -865,6 +929,51 @@ class MerchantOrderDetailAPIView(APIView):
         })
 
 
+class MerchantOrdersBulkStatusAPIView(APIView):
+    """POST /merchant/orders/bulk-status/  {merchant_id, order_ids, status, reason} — per-order results."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        from core.models import OrderStatus
+        from core.utils.order_utils import BULK_STATUS_LIMIT, bulk_update_order_status, parse_order_ids
+
+        merchant_id = request.data.get('merchant_id')
+        if not merchant_id:
+            return Response({'success': False, 'message': 'merchant_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        supplier, err = _assert_merchant_access(request.user, merchant_id)
+        if err:
+            return err
+
+        # JSON list, or repeated / comma separated form fields
+        if hasattr(request.data, 'getlist'):
+            raw_ids = request.data.getlist('order_ids')
+        else:
+            raw_ids = request.data.get('order_ids') or []
+        try:
+            order_ids = parse_order_ids(raw_ids)
+        except (TypeError, ValueError):
+            return Response({'success': False, 'message': 'order_ids must be a list of ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not order_ids or len(order_ids) > BULK_STATUS_LIMIT:
+            return Response(
+                {'success': False, 'message': f'Send between 1 and {BULK_STATUS_LIMIT} order_ids.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        new_status = OrderStatus.objects.filter(slug=request.data.get('status')).first()
+        if not new_status:
+            return Response({'success': False, 'message': 'Invalid status.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_update_order_status(
+            supplier, order_ids, new_status, reason=request.data.get('reason'), user=request.user
+        )
+        return Response({
+            'success': any(result['success'] for result in results),
+            'status': {'name': new_status.name, 'slug': new_status.slug},
+            'results': results,
+        })
+
+
 class MerchantProductsAPIView(APIView):
     """GET /merchant/products/?merchant_id=X — list all products for the merchant."""
     permission_classes = [permissions.IsAuthenticated]